@@ -0,0 +1,52 @@
+"""
+Benchmark: navigation tree construction and per-page fragment splicing.
+
+Builds a synthetic site of N pages (PAGES_PER_SECTION pages per section,
+sections nested three levels deep), then fills the template for every page
+with its section's nav and breadcrumb fragments. Time per page should stay
+flat as N grows; the script exits non-zero if the 100k run is more than
+twice as expensive per page as the smallest run.
+
+Usage: PYTHONPATH=src python3 benchmarks/bench_navigation.py
+"""
+import sys
+import time
+from navigation import NavTree
+from utils import fill_template
+
+SIZES = (10_000, 25_000, 50_000, 100_000)
+PAGES_PER_SECTION = 50
+TEMPLATE = ("<html><head><title>{{ Title }}</title></head><body>"
+            "<nav>{{ Breadcrumbs }}</nav><aside>{{ Nav }}</aside>"
+            "<article>{{ Content }}</article></body></html>")
+
+
+def synthetic_paths(page_count):
+    for i in range(page_count):
+        section = i // PAGES_PER_SECTION
+        yield f"s{section % 10}/s{section // 10 % 10}/s{section // 100}/page{i}.md"
+
+
+def run(page_count):
+    start = time.perf_counter()
+    tree = NavTree.from_paths(synthetic_paths(page_count))
+    for path in synthetic_paths(page_count):
+        section = tree.section(path.rsplit('/', 1)[0])
+        fill_template(TEMPLATE, path, "<p>body</p>", section.nav_html(), section.breadcrumbs_html())
+    return time.perf_counter() - start
+
+
+def main():
+    per_page = {}
+    for page_count in SIZES:
+        elapsed = run(page_count)
+        per_page[page_count] = elapsed / page_count
+        print(f"{page_count:>7} pages: {elapsed:7.3f}s  {per_page[page_count] * 1e6:6.2f} us/page")
+
+    ratio = per_page[SIZES[-1]] / per_page[SIZES[0]]
+    print(f"per-page cost ratio {SIZES[-1]}/{SIZES[0]}: {ratio:.2f}")
+    return 0 if ratio < 2 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
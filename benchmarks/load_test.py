@@ -0,0 +1,89 @@
+"""
+Load test for the local preview server.
+
+Starts a StaticServer on an ephemeral port (serving public/ by default),
+then runs CONCURRENCY keep-alive clients requesting every file in turn for
+DURATION seconds, and reports requests/s and latency percentiles.
+
+Usage: PYTHONPATH=src python3 benchmarks/load_test.py [DIRECTORY] [--concurrency N] [--duration S]
+"""
+import argparse
+import http.client
+import os
+import threading
+import time
+from pathlib import Path
+from server import StaticServer
+
+
+def collect_paths(root):
+    paths = []
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            if not file_name.endswith(('.gz', '.zst')):
+                relative = Path(dir_path, file_name).relative_to(root).as_posix()
+                paths.append('/' + relative)
+    return sorted(paths)
+
+
+def client(port, paths, deadline, latencies, errors):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as error:
+            errors.append(error)
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory', nargs='?', default=Path(__file__).parent.parent / 'public')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    paths = collect_paths(args.directory)
+    if not paths:
+        parser.error(f"no files to serve in {args.directory}; run a build first")
+
+    with StaticServer(('127.0.0.1', 0), args.directory, quiet=True) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+        deadline = time.perf_counter() + args.duration
+        latencies, errors = [], []
+        clients = [threading.Thread(target=client, args=(port, paths, deadline, latencies, errors))
+                   for _ in range(args.concurrency)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        server.shutdown()
+
+    latencies.sort()
+    print(f"files: {len(paths)}  clients: {args.concurrency}  duration: {args.duration}s")
+    print(f"requests: {len(latencies)}  errors: {len(errors)}")
+    print(f"throughput: {len(latencies) / args.duration:.0f} req/s")
+    if latencies:
+        print(f"latency p50: {percentile(latencies, 0.50) * 1000:.2f} ms  "
+              f"p99: {percentile(latencies, 0.99) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
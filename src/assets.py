@@ -0,0 +1,197 @@
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import tempfile
+from pathlib import Path
+from fingerprint import CSS_URL
+from link_check import resolve_reference
+
+ASSET_CACHE_VERSION = 1
+# Below these sizes an extra request costs more than the bytes it would save
+DEFAULT_CSS_INLINE_THRESHOLD = 8 * 1024
+DEFAULT_IMAGE_INLINE_THRESHOLD = 2 * 1024
+INLINE_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg')
+CSS_TOKEN = re.compile(r'''"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/|\s+|[{};,>:]|[^"'/\s{};,>:]+|/''', re.DOTALL)
+# Whitespace next to these never matters in CSS
+CSS_PUNCTUATION = frozenset('{};,>')
+STYLESHEET_LINK = re.compile(r'<link\b[^>]*>', re.IGNORECASE)
+LINK_ATTRIBUTE = re.compile(r'''\b(rel|href|media)=(["'])([^"']*)\2''', re.IGNORECASE)
+
+
+def minify_css(css: str) -> str:
+    """
+    Strip comments and insignificant whitespace from a stylesheet.
+
+    Strings are kept verbatim. Whitespace is dropped next to `{ } ; , >`,
+    after `:`, and the last `;` of each block goes; elsewhere runs collapse
+    to one space, since spaces can be significant (`a b`, `calc(1px + 2px)`).
+    """
+    output = []
+    pending_space = False
+    for token in CSS_TOKEN.findall(css):
+        if token.isspace() or token.startswith('/*'):
+            pending_space = True
+            continue
+        if token[0] == '}' and output and output[-1] == ';':
+            output.pop()
+        if pending_space and output and output[-1][-1] not in CSS_PUNCTUATION | {':'} \
+                and token[0] not in CSS_PUNCTUATION:
+            output.append(' ')
+        pending_space = False
+        output.append(token)
+    return ''.join(output)
+
+
+class AssetCache:
+    """
+    Results of per-asset work (minified CSS, inline versions), keyed by a
+    hash of the asset's content so they survive across builds.
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = Path(cache_path) if cache_path is not None else None
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if self.cache_path is not None:
+            try:
+                state = json.loads(self.cache_path.read_text())
+            except (FileNotFoundError, ValueError):
+                state = {}
+            if state.get("version") == ASSET_CACHE_VERSION:
+                self.entries = state.get("entries", {})
+        self._dirty = False
+
+    def get(self, kind: str, data: bytes, compute):
+        """Return `compute(data)`, computed only once per asset content and kind."""
+        key = f"{kind}:{hashlib.sha256(data).hexdigest()}"
+        if key in self.entries:
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        value = self.entries[key] = compute(data)
+        self._dirty = True
+        return value
+
+    def save(self):
+        if self.cache_path is None or not self._dirty:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as tmp_file:
+            json.dump({"version": ASSET_CACHE_VERSION, "entries": self.entries}, tmp_file)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+
+
+def minify_stylesheets(public_dir: str, cache: AssetCache) -> dict:
+    """
+    Minify every stylesheet in the output directory in place.
+
+    Returns:
+        dict: Counts of "files", "original_bytes" and "minified_bytes"
+    """
+    stats = {"files": 0, "original_bytes": 0, "minified_bytes": 0}
+    for dir_path, _, file_names in os.walk(public_dir):
+        for file_name in sorted(file_names):
+            if not file_name.endswith('.css'):
+                continue
+            path = Path(dir_path) / file_name
+            data = path.read_bytes()
+            minified = cache.get("minified-css", data, lambda data: minify_css(data.decode())).encode()
+            if minified != data:
+                # Rename over the output rather than writing through it, which
+                # would rewrite the original of a symlink copied from static/
+                tmp_path = path.with_name(f"{file_name}.{os.getpid()}.tmp")
+                tmp_path.write_bytes(minified)
+                os.replace(tmp_path, path)
+            stats["files"] += 1
+            stats["original_bytes"] += len(data)
+            stats["minified_bytes"] += len(minified)
+    cache.save()
+    return stats
+
+
+def _inline_style(data: bytes, css_url: str):
+    css = data.decode()
+    # A stylesheet containing this could close the <style> element early
+    if '</style' in css.lower():
+        return None
+
+    # url() references are relative to the stylesheet, which is no longer where the page is
+    def absolute(match):
+        quote, url = match.groups()
+        resolved = resolve_reference(css_url, url)
+        return f"url({quote}{resolved if resolved is not None else url}{quote})"
+    return f"<style>{CSS_URL.sub(absolute, css)}</style>"
+
+
+def _data_uri(data: bytes, mime_type: str) -> str:
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
+
+
+class AssetInliner:
+    """
+    Page transform (see utils.render_content) inlining small assets.
+
+    Stylesheets linked from the template below `css_threshold` bytes become
+    a `<style>` element in place of the `<link>`, saving a render-blocking
+    request. Images below `image_threshold` bytes become `data:` URIs in the
+    `src` of `<img>` nodes. Every candidate in the output directory is
+    looked at once, up front, so the transform's cache key covers exactly
+    the content it may inline. Should run after AssetFingerprints, so it
+    finds files under their final names.
+    """
+
+    def __init__(self, public_dir: str, cache: AssetCache, inline_css: bool = True,
+                 inline_images: bool = True, css_threshold: int = DEFAULT_CSS_INLINE_THRESHOLD,
+                 image_threshold: int = DEFAULT_IMAGE_INLINE_THRESHOLD):
+        self.styles = {}
+        self.images = {}
+        public_path = Path(public_dir)
+        for dir_path, _, file_names in os.walk(public_path):
+            for file_name in sorted(file_names):
+                path = Path(dir_path) / file_name
+                url = '/' + path.relative_to(public_path).as_posix()
+                size = path.stat().st_size
+                if inline_css and file_name.endswith('.css') and size < css_threshold:
+                    style = cache.get(f"style:{url}", path.read_bytes(),
+                                      lambda data: _inline_style(data, url))
+                    if style is not None:
+                        self.styles[url] = style
+                elif (inline_images and file_name.lower().endswith(INLINE_IMAGE_EXTENSIONS)
+                      and size < image_threshold):
+                    mime_type, _ = mimetypes.guess_type(url)
+                    self.images[url] = cache.get(f"data-uri:{mime_type}", path.read_bytes(),
+                                                 lambda data: _data_uri(data, mime_type))
+        cache.save()
+
+        self.cache_key = "inline:" + hashlib.sha256(
+            json.dumps([self.styles, self.images], sort_keys=True).encode()).hexdigest()
+        self._template_in = None
+        self._template_out = None
+
+    def apply(self, html_node, page_url: str):
+        for node in html_node.walk():
+            if node.tag != "img" or not node.props or "src" not in node.props:
+                continue
+            resolved = resolve_reference(page_url, node.props["src"])
+            if resolved in self.images:
+                node.props["src"] = self.images[resolved]
+
+    def _replace_link(self, match):
+        attributes = {name.lower(): value for name, _, value in LINK_ATTRIBUTE.findall(match.group(0))}
+        if attributes.get("rel", "").lower() != "stylesheet" or attributes.get("media", "all") != "all":
+            return match.group(0)
+        resolved = resolve_reference('/', attributes.get("href", ""))
+        return self.styles.get(resolved, match.group(0))
+
+    def apply_template(self, template: str) -> str:
+        # The template is the same for every page, so rewrite it only once
+        if template is not self._template_in:
+            self._template_out = STYLESHEET_LINK.sub(self._replace_link, template)
+            self._template_in = template
+        return self._template_out
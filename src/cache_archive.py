@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import tarfile
+import tempfile
+from pathlib import Path, PurePosixPath
+from assets import ASSET_CACHE_VERSION
+from deploy import DEPLOY_MANIFEST_NAME, DEPLOY_MANIFEST_VERSION
+from feed import FEED_STATE_VERSION
+from image_optimize import IMAGE_OPTIMIZER_VERSION
+from image_probe import PROBE_CACHE_VERSION
+from render_cache import RENDER_CACHE_VERSION
+from resource_hints import LINK_GRAPH_VERSION
+from sinks import TarSink
+from walk import walk_tree
+
+CACHE_ARCHIVE_VERSION = 1
+# First member of every archive: versions and the SHA-256 of every other member
+CACHE_ARCHIVE_MANIFEST = 'cache-archive.json'
+
+# Path below .cache/ of each cache worth carrying to a fresh machine, and the
+# format version its entries were written with; an entry from an archive
+# whose version differs from this build's is stale and never imported
+CACHE_COMPONENTS = {
+    'render': ('render', RENDER_CACHE_VERSION),
+    'image-dimensions': ('images.json', PROBE_CACHE_VERSION),
+    'optimized-images': ('images', IMAGE_OPTIMIZER_VERSION),
+    # Keyed on the file contents alone, so it has no format to version
+    'compress': ('compress', 1),
+    'assets': ('assets.json', ASSET_CACHE_VERSION),
+    'feeds': ('feeds', FEED_STATE_VERSION),
+    'link-graph': ('link-graph.json', LINK_GRAPH_VERSION),
+    'deploy': (DEPLOY_MANIFEST_NAME, DEPLOY_MANIFEST_VERSION),
+}
+
+
+def _component_of(path: str):
+    """Return the name of the component a relative cache path belongs to, or None."""
+    for name, (component_path, _) in CACHE_COMPONENTS.items():
+        # A .json component is one file, any other a directory of entries
+        if component_path.endswith('.json'):
+            matches = path == component_path
+        else:
+            matches = path.startswith(component_path + '/')
+        if matches:
+            return name
+    return None
+
+
+def _is_safe_path(path: str) -> bool:
+    pure_path = PurePosixPath(path)
+    return (bool(path) and not pure_path.is_absolute() and '..' not in pure_path.parts
+            and '\\' not in path and pure_path.as_posix() == path)
+
+
+def _cache_files(cache_dir: Path):
+    """Yield (relative path, path) for every file of every cache component."""
+    for component_path, _ in CACHE_COMPONENTS.values():
+        path = cache_dir / component_path
+        if path.is_file():
+            yield component_path, path
+        elif path.is_dir():
+            for entry in walk_tree(path, ignore=('*.tmp',)):
+                if not entry.is_dir and not entry.is_symlink:
+                    yield f"{component_path}/{entry.relative}", Path(entry.path)
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open('rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_cache(cache_dir: str, archive_path: str) -> dict:
+    """
+    Pack the build caches below `cache_dir` into one `.tar.gz` archive.
+
+    The archive starts with a manifest holding the archive format version,
+    the version of each cache component and the SHA-256 of every file, so
+    import_cache can reject what this build cannot use before writing it.
+
+    Returns:
+        dict: Counts of "files" and "bytes" exported
+    """
+    cache_dir = Path(cache_dir)
+    files = {relative: (path, _file_digest(path)) for relative, path in _cache_files(cache_dir)}
+    manifest = {
+        "version": CACHE_ARCHIVE_VERSION,
+        "components": {name: version for name, (_, version) in CACHE_COMPONENTS.items()},
+        "files": {relative: digest for relative, (_, digest) in files.items()},
+    }
+    with TarSink(archive_path) as sink:
+        sink.write(CACHE_ARCHIVE_MANIFEST, json.dumps(manifest, indent=1).encode())
+        for relative, (path, _) in files.items():
+            sink.copy(relative, str(path))
+    return {"files": len(files), "bytes": sink.bytes}
+
+
+def _write_entry(path: Path, data: bytes):
+    """Write an imported entry atomically, so a build never reads half of one."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as tmp_file:
+        tmp_file.write(data)
+    os.replace(tmp_path, path)
+
+
+def import_cache(cache_dir: str, archive_path: str) -> dict:
+    """
+    Unpack an archive written by export_cache into `cache_dir`.
+
+    Every file is checked before it is written: its path must be listed in
+    the manifest and lie inside a known cache component, its SHA-256 must
+    match the manifest, and its component must have been written with the
+    version this build uses. Files that fail a check are counted and
+    skipped; files that pass replace the local copy.
+
+    Raises:
+        ValueError: If the file is not a cache archive or was written in a
+            format version this build cannot read, in which case nothing is
+            imported, or if it is cut short
+
+    Returns:
+        dict: Counts of files "imported", "stale" (incompatible component
+        version) and "rejected" (unknown path or checksum mismatch)
+    """
+    cache_dir = Path(cache_dir)
+    stats = {"imported": 0, "stale": 0, "rejected": 0}
+    try:
+        archive = tarfile.open(archive_path, 'r|*')
+    except tarfile.TarError as error:
+        raise ValueError(f"{archive_path} is not a cache archive: {error}")
+
+    with archive:
+        manifest = None
+        try:
+            member = archive.next()
+            if member is not None and member.name == CACHE_ARCHIVE_MANIFEST:
+                manifest = json.loads(archive.extractfile(member).read())
+        except (tarfile.TarError, EOFError, ValueError):
+            pass
+        if not isinstance(manifest, dict):
+            raise ValueError(f"{archive_path} is not a cache archive")
+        if manifest.get("version") != CACHE_ARCHIVE_VERSION:
+            raise ValueError(f"{archive_path} is in cache archive format {manifest.get('version')}, "
+                             f"this build reads format {CACHE_ARCHIVE_VERSION}")
+        checksums = manifest.get("files", {})
+        versions = manifest.get("components", {})
+
+        try:
+            # Iterating the archive itself would yield the manifest again
+            for member in iter(archive.next, None):
+                component = _component_of(member.name)
+                if (not member.isreg() or not _is_safe_path(member.name) or component is None
+                        or member.name not in checksums):
+                    stats["rejected"] += 1
+                    continue
+                if versions.get(component) != CACHE_COMPONENTS[component][1]:
+                    stats["stale"] += 1
+                    continue
+                data = archive.extractfile(member).read()
+                if hashlib.sha256(data).hexdigest() != checksums[member.name]:
+                    stats["rejected"] += 1
+                    continue
+                _write_entry(cache_dir / member.name, data)
+                stats["imported"] += 1
+        except (tarfile.TarError, EOFError) as error:
+            # Entries imported so far passed their checksums and are kept
+            raise ValueError(f"{archive_path} is truncated or corrupt: {error}")
+    return stats
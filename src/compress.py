@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+import os
+import shutil
+from pathlib import Path
+from workers import parallel_map
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+DEFAULT_EXTENSIONS = ('.html', '.css', '.svg')
+# Files smaller than this gain nothing from a precompressed sibling
+DEFAULT_THRESHOLD = 1024
+
+
+def available_encodings() -> dict:
+    """Map sibling suffix to compress function for every encoding this Python supports."""
+    encodings = {'.gz': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if zstd is not None:
+        encodings['.zst'] = lambda data: zstd.compress(data, level=19)
+    return encodings
+
+
+def compress_file(job: tuple) -> tuple:
+    """
+    Worker task: write precompressed siblings next to one file.
+
+    Compressed bodies are cached under `<cache_dir>/<xx>/<sha256><suffix>`,
+    so a file whose content is unchanged since a previous build is copied
+    from the cache instead of being compressed again.
+
+    Returns:
+        tuple: (path, original size, {suffix: compressed size}, reused from cache)
+    """
+    path, cache_dir = job
+    data = Path(path).read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    stat = os.stat(path)
+    sizes = {}
+    reused = True
+
+    for suffix, compress in available_encodings().items():
+        sibling = path + suffix
+        cached = Path(cache_dir, digest[:2], digest + suffix) if cache_dir else None
+        if cached is not None and cached.exists():
+            shutil.copyfile(cached, sibling)
+        else:
+            reused = False
+            Path(sibling).write_bytes(compress(data))
+            if cached is not None:
+                cached.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = cached.with_name(f"{cached.name}.{os.getpid()}.tmp")
+                shutil.copyfile(sibling, tmp_path)
+                os.replace(tmp_path, cached)
+        # Keep siblings in step with the original for Last-Modified
+        os.utime(sibling, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        sizes[suffix] = os.path.getsize(sibling)
+
+    return path, len(data), sizes, reused
+
+
+def iter_compressible(public_dir: str, extensions=DEFAULT_EXTENSIONS, threshold: int = DEFAULT_THRESHOLD):
+    for dir_path, _, file_names in os.walk(public_dir):
+        for file_name in sorted(file_names):
+            path = os.path.join(dir_path, file_name)
+            if file_name.endswith(extensions) and os.path.getsize(path) >= threshold:
+                yield path
+
+
+def compress_outputs(public_dir: str, cache_dir: str = None, workers: int = None,
+                     extensions=DEFAULT_EXTENSIONS, threshold: int = DEFAULT_THRESHOLD) -> dict:
+    """
+    Write `.gz` (and `.zst` when `compression.zstd` is available) siblings for
+    every output file worth compressing, for servers such as nginx's
+    `gzip_static` to send as-is.
+
+    Files are compressed in the worker pool. With a `cache_dir`, files whose
+    content is unchanged since the last build reuse their cached compressed
+    bodies.
+
+    Args:
+        public_dir: Output directory to compress in place
+        cache_dir: Directory for the content-hash keyed compression cache
+        workers: Number of worker processes, defaults to the CPU count
+        extensions: File suffixes to compress
+        threshold: Minimum file size in bytes
+
+    Returns:
+        dict: Counts of "files" and "reused", total "original_bytes", and per
+        encoding the compressed bytes and compression "ratio"
+    """
+    jobs = ((path, str(cache_dir) if cache_dir else None)
+            for path in iter_compressible(public_dir, tuple(extensions), threshold))
+
+    files = 0
+    reused = 0
+    original_bytes = 0
+    compressed_bytes = {}
+    for _, size, sizes, was_reused in parallel_map(compress_file, jobs, workers):
+        files += 1
+        reused += was_reused
+        original_bytes += size
+        for suffix, compressed_size in sizes.items():
+            compressed_bytes[suffix] = compressed_bytes.get(suffix, 0) + compressed_size
+
+    stats = {"files": files, "reused": reused, "original_bytes": original_bytes}
+    for suffix, total in compressed_bytes.items():
+        encoding = suffix.lstrip('.')
+        stats[f"{encoding}_bytes"] = total
+        stats[f"{encoding}_ratio"] = round(total / original_bytes, 4) if original_bytes else None
+    return stats
@@ -0,0 +1,181 @@
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_SOCKET_NAME = 'daemon.sock'
+DAEMON_COMMANDS = ('build', 'status', 'stop')
+
+
+def snapshot_tree(paths) -> dict:
+    """
+    Return (mtime_ns, size) for every file below `paths`, keyed by path.
+
+    Uses os.scandir, whose entries carry their stat results on most
+    platforms, so a snapshot costs one directory listing per directory.
+    """
+    snapshot = {}
+    pending = [str(path) for path in paths]
+    while pending:
+        path = pending.pop()
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    else:
+                        stat = entry.stat()
+                        snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        except NotADirectoryError:
+            stat = os.stat(path)
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            continue
+    return snapshot
+
+
+class BuildCoalescer:
+    """
+    Runs builds on request, one at a time, sharing each build between all
+    the requests it can answer.
+
+    A request is answered by the first build that starts after it arrived,
+    so it always sees the files as they were when it was made. Requests that
+    arrive while a build runs all wait for one follow-up build instead of
+    queueing a build each.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._condition = threading.Condition()
+        self._running = False
+        self._started = 0
+        self._finished = 0
+        self._result = None
+
+    @property
+    def builds(self) -> int:
+        return self._started
+
+    def request(self):
+        with self._condition:
+            target = self._started + 1
+            while self._finished < target:
+                if self._running:
+                    self._condition.wait()
+                    continue
+                self._running = True
+                self._started += 1
+                generation = self._started
+                self._condition.release()
+                try:
+                    result = self._build()
+                except Exception as error:
+                    result = {"ok": False, "errors": [f"build failed: {error!r}"], "stages": {}}
+                finally:
+                    self._condition.acquire()
+                    self._running = False
+                self._finished = generation
+                self._result = dict(result, build=generation)
+                self._condition.notify_all()
+            return self._result
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """
+    One request per connection: the client sends a command line (`build`,
+    `status` or `stop`) and gets one line of JSON back.
+    """
+
+    def handle(self):
+        command = self.rfile.readline().decode().strip() or 'build'
+        if command == 'build':
+            response = self.server.coalescer.request()
+        elif command == 'status':
+            response = {"ok": True, "builds": self.server.coalescer.builds,
+                        "uptime_s": round(time.monotonic() - self.server.started, 3)}
+        elif command == 'stop':
+            response = {"ok": True}
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            response = {"ok": False, "errors": [f"unknown command {command!r}"]}
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+class BuildDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Long-lived build server on a Unix socket.
+
+    `build` is called to build the site; being one process, it keeps the
+    imported modules, the compiled template and any in-memory caches it
+    closes over warm between builds. Before building, the sources below
+    `watch_paths` are snapshotted; when nothing changed since the last
+    successful build, its result is returned straight away.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, build, watch_paths=()):
+        self.socket_path = str(socket_path)
+        self.build = build
+        self.watch_paths = list(watch_paths)
+        self.coalescer = BuildCoalescer(self._build)
+        self.started = time.monotonic()
+        self._last_snapshot = None
+        self._last_result = None
+        # A socket file left behind by a daemon that died would block the bind
+        if os.path.exists(self.socket_path) and not _socket_alive(self.socket_path):
+            os.unlink(self.socket_path)
+        super().__init__(self.socket_path, DaemonRequestHandler)
+
+    def _build(self) -> dict:
+        start = time.perf_counter()
+        snapshot = snapshot_tree(self.watch_paths)
+        if snapshot == self._last_snapshot:
+            result = dict(self._last_result, skipped=True)
+        else:
+            report = self.build()
+            result = {"ok": not report.failed, "skipped": False, **report.to_dict()}
+            if not report.failed:
+                self._last_snapshot = snapshot
+                self._last_result = result
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return result
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def _socket_alive(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def send_request(socket_path: str, command: str = 'build', timeout: float = None) -> dict:
+    """Send one command to a running daemon and return its decoded response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(socket_path))
+        client.sendall(command.encode() + b'\n')
+        with client.makefile('rb') as response:
+            return json.loads(response.readline())
+
+
+if __name__ == '__main__':
+    # A client that imports nothing from the generator, for hooks that only
+    # want results: python3 src/daemon.py [build|status|stop] [SOCKET]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+    socket_path = sys.argv[2] if len(sys.argv) > 2 else Path(__file__).parent.parent / '.cache' / DEFAULT_SOCKET_NAME
+    response = send_request(socket_path, command)
+    print(json.dumps(response))
+    sys.exit(0 if response.get("ok") else 1)
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+DEPLOY_MANIFEST_VERSION = 1
+DEPLOY_MANIFEST_NAME = 'deploy-manifest.json'
+DEPLOY_DELTA_NAME = 'deploy-delta.json'
+
+
+def sink_manifest(sink) -> dict:
+    """Return the manifest of everything written through an output sink (see sinks.py)."""
+    return {path: {"size": size, "sha256": digest}
+            for path, (size, digest, _) in sorted(sink.hashes.items())}
+
+
+def directory_manifest(root: str, known: dict = None) -> tuple[dict, int]:
+    """
+    Return the manifest of every file below `root`.
+
+    `known` holds the hashes recorded while the files were written
+    (OutputSink.hashes); a file whose size and modification time still
+    match is not read again, so only files that later stages created or
+    rewrote in place are hashed here.
+
+    Returns:
+        tuple[dict, int]: {path: {"size", "sha256"}}, and the number of files read
+    """
+    root = Path(root)
+    known = known or {}
+    files = {}
+    read = 0
+    for dir_path, dir_names, file_names in os.walk(root, followlinks=True):
+        for file_name in file_names:
+            path = Path(dir_path) / file_name
+            relative = path.relative_to(root).as_posix()
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entry = known.get(relative)
+            if entry is not None and entry[2] == stat.st_mtime_ns and entry[0] == stat.st_size:
+                digest = entry[1]
+            else:
+                digest = hashlib.sha256()
+                with path.open('rb') as file:
+                    for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                        digest.update(chunk)
+                digest = digest.hexdigest()
+                read += 1
+            files[relative] = {"size": stat.st_size, "sha256": digest}
+    return dict(sorted(files.items())), read
+
+
+def diff_manifests(previous: dict, current: dict) -> dict:
+    """
+    Compare two manifests.
+
+    Returns:
+        dict: Sorted "added", "changed" and "removed" path lists; a deploy
+        uploads the first two and purges the last two
+    """
+    return {
+        "added": sorted(path for path in current if path not in previous),
+        "changed": sorted(path for path, entry in current.items()
+                          if path in previous and previous[path]["sha256"] != entry["sha256"]),
+        "removed": sorted(path for path in previous if path not in current),
+    }
+
+
+def load_deploy_manifest(path: str) -> dict:
+    """Return the files of a saved manifest, or {} if there is none this version can read."""
+    try:
+        state = json.loads(Path(path).read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+    if state.get("version") != DEPLOY_MANIFEST_VERSION:
+        return {}
+    return state.get("files", {})
+
+
+def _write_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w') as tmp_file:
+        json.dump(data, tmp_file, indent=1)
+    os.replace(tmp_path, path)
+
+
+def write_deploy_manifest(dest_dir: str, files: dict) -> dict:
+    """
+    Save the manifest of this build's files in `dest_dir`, next to the delta
+    against the manifest saved by the previous build.
+
+    Returns:
+        dict: Counts of "files", "added", "changed" and "removed"
+    """
+    dest_dir = Path(dest_dir)
+    manifest_path = dest_dir / DEPLOY_MANIFEST_NAME
+    delta = diff_manifests(load_deploy_manifest(manifest_path), files)
+    _write_json(dest_dir / DEPLOY_DELTA_NAME, {"version": DEPLOY_MANIFEST_VERSION, **delta})
+    _write_json(manifest_path, {"version": DEPLOY_MANIFEST_VERSION, "files": files})
+    return {"files": len(files), **{kind: len(paths) for kind, paths in delta.items()}}
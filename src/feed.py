@@ -0,0 +1,189 @@
+import heapq
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from pathlib import Path, PurePosixPath
+from xml.sax.saxutils import escape, quoteattr
+from page_index import iter_page_paths, page_record
+from sinks import as_sink
+from utils import render_markdown
+
+DEFAULT_MAX_ENTRIES = 20
+FEED_STATE_VERSION = 1
+FEED_FILE_NAMES = {"atom": "feed.xml", "rss": "rss.xml"}
+
+
+def render_atom_entry(record: dict, content: str, site_url: str) -> str:
+    """Render one Atom `<entry>` element."""
+    url = site_url + record["url"]
+    return (
+        "<entry>"
+        f"<title>{escape(record['title'])}</title>"
+        f"<id>{escape(url)}</id>"
+        f"<link href={quoteattr(url)}/>"
+        f"<updated>{record['date']}</updated>"
+        f"<summary>{escape(record['summary'])}</summary>"
+        f"<content type=\"html\" xml:base={quoteattr(site_url + '/')}>{escape(content)}</content>"
+        "</entry>"
+    )
+
+
+def render_rss_item(record: dict, content: str, site_url: str) -> str:
+    """Render one RSS 2.0 `<item>` element."""
+    url = site_url + record["url"]
+    published = format_datetime(datetime.fromisoformat(record["date"]))
+    return (
+        "<item>"
+        f"<title>{escape(record['title'])}</title>"
+        f"<link>{escape(url)}</link>"
+        f"<guid isPermaLink=\"true\">{escape(url)}</guid>"
+        f"<pubDate>{published}</pubDate>"
+        f"<description>{escape(content)}</description>"
+        "</item>"
+    )
+
+
+def render_feed(entries: list, section: str, site_url: str, title: str, feed_format: str) -> str:
+    """Wrap pre-rendered entry elements into a complete feed document."""
+    section_url = f"{site_url}/{section}/" if section else f"{site_url}/"
+    feed_url = section_url + FEED_FILE_NAMES[feed_format]
+    updated = entries[0]["date"] if entries else datetime.fromtimestamp(0, timezone.utc).isoformat()
+    body = ''.join(entry["xml"] for entry in entries)
+
+    if feed_format == "atom":
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom">'
+            f"<title>{escape(title)}</title>"
+            f"<id>{escape(section_url)}</id>"
+            f"<link href={quoteattr(feed_url)} rel=\"self\"/>"
+            f"<link href={quoteattr(section_url)}/>"
+            f"<updated>{updated}</updated>"
+            f"<author><name>{escape(title)}</name></author>"
+            f"{body}"
+            "</feed>\n"
+        )
+
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss version="2.0"><channel>'
+        f"<title>{escape(title)}</title>"
+        f"<link>{escape(section_url)}</link>"
+        f"<description>{escape(title)}</description>"
+        f"{body}"
+        "</channel></rss>\n"
+    )
+
+
+def load_feed_state(state_path: Path, site_url: str, feed_format: str) -> dict:
+    """
+    Load previously rendered entries keyed by source path.
+
+    State written for a different site URL, feed format or state version is
+    discarded, since its entries would render differently.
+    """
+    try:
+        state = json.loads(state_path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+    if (state.get("version") != FEED_STATE_VERSION or state.get("site_url") != site_url
+            or state.get("format") != feed_format):
+        return {}
+
+    return {entry["source"]: entry for entry in state.get("entries", [])}
+
+
+def save_feed_state(state_path: Path, entries: list, site_url: str, feed_format: str):
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state = {
+        "version": FEED_STATE_VERSION,
+        "site_url": site_url,
+        "format": feed_format,
+        "entries": entries,
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=state_path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w') as tmp_file:
+        json.dump(state, tmp_file)
+    os.replace(tmp_path, state_path)
+
+
+def generate_feed(dir_path_content: str, section: str, dest_dir_path: str, site_url: str,
+                  title: str = None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                  feed_format: str = "atom", state_path: str = None, cache=None, minifier=None,
+                  transforms=()) -> dict:
+    """
+    Generate an Atom or RSS feed of the newest pages in a content section.
+
+    Pages are ranked by modification time using only a stat per file, and only
+    the newest `max_entries` are kept. Entries already present in the on-disk
+    state with the same mtime and size are reused as-is; only new or changed
+    pages are read and rendered, so a rebuild effectively prepends new entries
+    and trims the oldest. Entry content comes from the render cache when one is
+    given; with the `minifier` and `transforms` the pages were built with, it
+    is the very entry the page build stored, so no page is rendered twice.
+
+    Args:
+        dir_path_content: Root content directory
+        section: Section path relative to the content root, e.g. "majesty"
+        dest_dir_path: Root output directory, or an output sink (see sinks.py)
+        site_url: Absolute site URL without a trailing slash, e.g. "https://example.com"
+        title: Feed title, defaults to the section name
+        max_entries: Maximum number of entries in the feed
+        feed_format: "atom" (written to feed.xml) or "rss" (written to rss.xml)
+        state_path: JSON file holding rendered entries between builds
+        cache (RenderCache, optional): Render cache to take entry content from
+        minifier (Minifier, optional): Minifier the pages were built with
+        transforms (tuple): Page transforms the pages were built with
+
+    Returns:
+        dict: Counts of "entries", "reused" and "rendered" entries, and with
+        a `cache`, of rendered entries whose content was in it ("cache_hits")
+    """
+    if feed_format not in FEED_FILE_NAMES:
+        raise ValueError(f"Unknown feed format: {feed_format}")
+
+    section = section.strip('/')
+    site_url = site_url.rstrip('/')
+    title = title or (Path(section).name if section else "Home")
+    render_entry = render_atom_entry if feed_format == "atom" else render_rss_item
+
+    def stat_page(md_path):
+        stat = md_path.stat()
+        return (stat.st_mtime_ns, str(md_path), stat.st_size)
+
+    newest = heapq.nlargest(max_entries, map(stat_page, iter_page_paths(dir_path_content, section)))
+
+    previous = load_feed_state(Path(state_path), site_url, feed_format) if state_path else {}
+    entries = []
+    reused = 0
+    hits_before = cache.hits if cache is not None else 0
+    for mtime_ns, source, size in newest:
+        entry = previous.get(source)
+        if entry and entry["mtime_ns"] == mtime_ns and entry["size"] == size:
+            reused += 1
+        else:
+            markdown = Path(source).read_text()
+            record = page_record(dir_path_content, source, markdown)
+            content = render_markdown(markdown, cache, minifier, transforms, record["url"])
+            entry = {
+                "source": source,
+                "mtime_ns": mtime_ns,
+                "size": size,
+                "date": record["date"],
+                "xml": render_entry(record, content, site_url),
+            }
+        entries.append(entry)
+
+    feed = render_feed(entries, section, site_url, title, feed_format)
+    as_sink(dest_dir_path).write(PurePosixPath(section, FEED_FILE_NAMES[feed_format]).as_posix(), feed.encode())
+
+    if state_path:
+        save_feed_state(Path(state_path), entries, site_url, feed_format)
+
+    stats = {"entries": len(entries), "reused": reused, "rendered": len(entries) - reused}
+    if cache is not None:
+        stats["cache_hits"] = cache.hits - hits_before
+    return stats
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+from pathlib import Path
+from urllib.parse import urlsplit
+from link_check import resolve_reference
+
+FINGERPRINT_EXTENSIONS = ('.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.svg',
+                          '.woff', '.woff2')
+HASH_LENGTH = 8
+MANIFEST_NAME = 'asset-manifest.json'
+HEADERS_NAME = '_headers'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+TEMPLATE_URL_ATTRIBUTE = re.compile(r'''(\b(?:href|src)=)(["'])([^"']+)\2''')
+CSS_URL = re.compile(r'''url\(\s*(["']?)([^"')]+)\1\s*\)''')
+
+
+def fingerprinted_name(name: str, data: bytes) -> str:
+    """Return `name.<hash>.ext` for a file name and its content."""
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def rewrite_url(url: str, base_url: str, manifest: dict) -> str:
+    """Return the fingerprinted URL for a reference to an asset, or `url` unchanged."""
+    resolved = resolve_reference(base_url, url)
+    if resolved is None or resolved not in manifest:
+        return url
+    # Keep any query string or fragment following the path
+    return manifest[resolved] + url[len(urlsplit(url).path):]
+
+
+def _rewrite_css(data: bytes, css_url: str, manifest: dict) -> bytes:
+    def replace(match):
+        quote, url = match.groups()
+        return f"url({quote}{rewrite_url(url, css_url, manifest)}{quote})"
+    return CSS_URL.sub(replace, data.decode()).encode()
+
+
+def fingerprint_assets(public_dir: str, extensions=FINGERPRINT_EXTENSIONS) -> dict:
+    """
+    Add a `name.<hash>.ext` copy of every copied static asset.
+
+    Run after the static files have been copied into the output directory
+    and before pages are generated. The originals stay in place for
+    everything pages do not rewrite (feeds, hand-written links, old
+    bookmarks). CSS files are hashed last, and their hashed copies have
+    `url(...)` references to other assets rewritten first, so a changed
+    image also changes the hash of the stylesheet using it. The manifest is
+    written to `asset-manifest.json`, together with a `_headers` file marking
+    every fingerprinted URL as immutable for Netlify/Cloudflare style hosts.
+
+    Args:
+        public_dir: Output directory holding the copied static files
+        extensions: File suffixes to fingerprint; others keep their names
+
+    Returns:
+        dict: Manifest mapping original URL paths to fingerprinted ones
+    """
+    public_path = Path(public_dir)
+    assets = []
+    for dir_path, _, file_names in os.walk(public_path):
+        for file_name in sorted(file_names):
+            if file_name.endswith(tuple(extensions)):
+                assets.append(Path(dir_path) / file_name)
+
+    manifest = {}
+    # Stylesheets go last so their url() references can be rewritten first
+    for path in sorted(assets, key=lambda path: (path.suffix == '.css', path.as_posix())):
+        url = '/' + path.relative_to(public_path).as_posix()
+        data = path.read_bytes()
+        rewritten = _rewrite_css(data, url, manifest) if path.suffix == '.css' else data
+        hashed_path = path.with_name(fingerprinted_name(path.name, rewritten))
+        if rewritten != data:
+            hashed_path.write_bytes(rewritten)
+        else:
+            shutil.copy2(path, hashed_path)
+        manifest[url] = '/' + hashed_path.relative_to(public_path).as_posix()
+
+    (public_path / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    with (public_path / HEADERS_NAME).open('w') as headers_file:
+        for hashed_url in sorted(manifest.values()):
+            headers_file.write(f"{hashed_url}\n  Cache-Control: {IMMUTABLE_CACHE_CONTROL}\n")
+
+    return manifest
+
+
+class AssetFingerprints:
+    """
+    Page transform (see utils.render_content) pointing asset references at
+    their fingerprinted URLs.
+
+    Rewrites `src`/`href` props of the HTML nodes built from image and link
+    TextNodes, resolved against the page URL, and the same attributes in the
+    page template.
+    """
+
+    def __init__(self, manifest: dict):
+        self.manifest = manifest
+        self.cache_key = "fingerprint:" + hashlib.sha256(
+            json.dumps(manifest, sort_keys=True).encode()).hexdigest()
+        self._template_in = None
+        self._template_out = None
+
+    def apply(self, html_node, page_url: str):
+        for node in html_node.walk():
+            if not node.props:
+                continue
+            for prop in ("src", "href"):
+                if prop in node.props:
+                    node.props[prop] = rewrite_url(node.props[prop], page_url, self.manifest)
+
+    def apply_template(self, template: str) -> str:
+        # The template is the same for every page, so rewrite it only once
+        if template is not self._template_in:
+            def replace(match):
+                attribute, quote, url = match.groups()
+                return f"{attribute}{quote}{rewrite_url(url, '/', self.manifest)}{quote}"
+            self._template_out = TEMPLATE_URL_ATTRIBUTE.sub(replace, template)
+            self._template_in = template
+        return self._template_out
@@ -12,6 +12,24 @@ class HTMLNode:
         # child classes should implement this themselves
         raise NotImplementedError
 
+    def iter_html(self, minifier=None, preserve_whitespace: bool = False):
+        """
+        Yield this node's HTML in chunks, for streaming serialization.
+
+        With a `minifier` (see minify.Minifier), insignificant whitespace in
+        text is collapsed as it is written, except inside `<pre>`, `<code>` and
+        similar elements (`preserve_whitespace` is set for their descendants).
+        """
+        # child classes should implement this themselves
+        raise NotImplementedError
+
+    def walk(self):
+        """Yield this node and all of its descendant nodes, depth first."""
+        yield self
+        for child in self.children or []:
+            if type(child) != str:
+                yield from child.walk()
+
     def props_to_html(self):
         html_string = ""
         if self.props:
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import struct
+import zlib
+from pathlib import Path
+from workers import parallel_map
+
+# Bump whenever a change here changes optimizer output, so stale cache entries are never used
+IMAGE_OPTIMIZER_VERSION = 1
+OPTIMIZE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Ancillary PNG chunks that change how the image is displayed; all others are metadata
+PNG_KEPT_CHUNKS = frozenset({b'tRNS', b'gAMA', b'cHRM', b'sRGB', b'iCCP', b'sBIT'})
+# Animated PNGs keep their frame data in chunks tied to IDAT sequence numbers
+PNG_ANIMATION_CHUNKS = frozenset({b'acTL', b'fcTL', b'fdAT'})
+PNG_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+JPEG_SOS = 0xDA
+JPEG_EOI = 0xD9
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+def _png_chunk(chunk_type: bytes, body: bytes) -> bytes:
+    crc = zlib.crc32(chunk_type + body)
+    return struct.pack('>I', len(body)) + chunk_type + body + struct.pack('>I', crc)
+
+
+def optimize_png(data: bytes) -> bytes:
+    """
+    Losslessly shrink a PNG.
+
+    Drops metadata chunks (text, timestamps, physical size, ...), keeping
+    those that affect colour or transparency, and re-deflates the image data
+    into a single IDAT at the highest zlib level. The original is returned
+    when it is already smaller, animated or cannot be parsed.
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        return data
+
+    chunks = []
+    position = len(PNG_SIGNATURE)
+    while position + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[position:position + 8])
+        chunks.append((chunk_type, data[position + 8:position + 8 + length]))
+        position += length + 12
+        if chunk_type == b'IEND':
+            break
+    chunk_types = {chunk_type for chunk_type, _ in chunks}
+    if b'IEND' not in chunk_types or position > len(data) or chunk_types & PNG_ANIMATION_CHUNKS:
+        return data
+
+    try:
+        pixels = zlib.decompress(b''.join(body for chunk_type, body in chunks if chunk_type == b'IDAT'))
+    except zlib.error:
+        return data
+    deflated = []
+    for strategy in PNG_STRATEGIES:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        deflated.append(compressor.compress(pixels) + compressor.flush())
+    image_data = min(deflated, key=len)
+
+    output = [PNG_SIGNATURE]
+    for chunk_type, body in chunks:
+        if chunk_type == b'IDAT':
+            if image_data is not None:
+                output.append(_png_chunk(b'IDAT', image_data))
+                image_data = None
+        # Critical chunks have an upper-case first letter and are always kept
+        elif chunk_type[:1].isupper() or chunk_type in PNG_KEPT_CHUNKS:
+            output.append(_png_chunk(chunk_type, body))
+
+    optimized = b''.join(output)
+    return optimized if len(optimized) < len(data) else data
+
+
+def exif_orientation(payload: bytes):
+    """Return the orientation recorded in an APP1 Exif payload, or None."""
+    if not payload.startswith(b'Exif\0\0'):
+        return None
+    tiff = payload[6:]
+    byte_order = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if byte_order is None or len(tiff) < 10:
+        return None
+    try:
+        (ifd_offset,) = struct.unpack(byte_order + 'I', tiff[4:8])
+        (entries,) = struct.unpack(byte_order + 'H', tiff[ifd_offset:ifd_offset + 2])
+        for index in range(entries):
+            entry = ifd_offset + 2 + index * 12
+            tag, _, _, value = struct.unpack(byte_order + 'HHIH', tiff[entry:entry + 10])
+            if tag == EXIF_ORIENTATION_TAG:
+                return value
+    except struct.error:
+        return None
+    return None
+
+
+def _keep_jpeg_segment(marker: int, payload: bytes) -> bool:
+    if marker == 0xFE:
+        return False
+    if not 0xE0 <= marker <= 0xEF:
+        return True
+    # APP segments that change how the image is decoded or displayed
+    if marker == 0xE0:
+        return payload.startswith(b'JFIF\0')
+    if marker == 0xE1:
+        return exif_orientation(payload) not in (None, 1)
+    if marker == 0xE2:
+        return payload.startswith(b'ICC_PROFILE\0')
+    if marker == 0xEE:
+        return payload.startswith(b'Adobe')
+    return False
+
+
+def optimize_jpeg(data: bytes) -> bytes:
+    """
+    Losslessly shrink a JPEG by dropping metadata segments.
+
+    Comments and APP segments are removed, except JFIF, ICC colour profiles,
+    the Adobe colour transform and Exif data with a non-default orientation.
+    Everything from the start of the scan on is copied untouched.
+    """
+    if not data.startswith(b'\xff\xd8'):
+        return data
+
+    output = [data[:2]]
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return data
+        marker = data[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker in (JPEG_SOS, JPEG_EOI):
+            output.append(data[position:])
+            optimized = b''.join(output)
+            return optimized if len(optimized) < len(data) else data
+        (length,) = struct.unpack('>H', data[position + 2:position + 4])
+        segment = data[position:position + 2 + length]
+        if len(segment) < 2 + length:
+            return data
+        if _keep_jpeg_segment(marker, segment[4:]):
+            output.append(segment)
+        position += 2 + length
+
+    return data
+
+
+def _replace_file(path: Path, data: bytes):
+    """
+    Write `data` to a temporary file and rename it over `path`, so a symlink
+    copied from static/ is replaced rather than written through.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def optimize_image_file(job: tuple) -> tuple:
+    """
+    Worker task: optimize one image in place.
+
+    Results are cached under `<cache_dir>/<xx>/<sha256><suffix>`, keyed on
+    the original content, so an image is only optimized once across builds.
+
+    Returns:
+        tuple: (path, original size, optimized size, reused from cache)
+    """
+    path, cache_dir = job
+    data = Path(path).read_bytes()
+    suffix = Path(path).suffix.lower()
+    digest = hashlib.sha256(f"{IMAGE_OPTIMIZER_VERSION}\0".encode() + data).hexdigest()
+    cached = Path(cache_dir, digest[:2], digest + suffix) if cache_dir else None
+
+    if cached is not None and cached.exists():
+        optimized = cached.read_bytes()
+        if optimized != data:
+            _replace_file(Path(path), optimized)
+        return path, len(data), len(optimized), True
+
+    optimized = optimize_png(data) if suffix == '.png' else optimize_jpeg(data)
+    if optimized is not data:
+        _replace_file(Path(path), optimized)
+    if cached is not None:
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        _replace_file(cached, optimized)
+    return path, len(data), len(optimized), False
+
+
+def optimize_images(public_dir: str, cache_dir: str = None, workers: int = None,
+                    extensions=OPTIMIZE_EXTENSIONS) -> dict:
+    """
+    Losslessly optimize every PNG and JPEG in the output directory.
+
+    Images are optimized in the worker pool. With a `cache_dir`, images
+    whose content was already optimized by an earlier build are copied from
+    the cache instead.
+
+    Args:
+        public_dir: Output directory holding the copied static files
+        cache_dir: Directory for the content-hash keyed optimization cache
+        workers: Number of worker processes, defaults to the CPU count
+        extensions: File suffixes to optimize
+
+    Returns:
+        dict: Counts of "images" and "reused", and total "original_bytes"
+        and "optimized_bytes"
+    """
+    def iter_jobs():
+        for dir_path, _, file_names in os.walk(public_dir):
+            for file_name in sorted(file_names):
+                if file_name.lower().endswith(tuple(extensions)):
+                    yield os.path.join(dir_path, file_name), str(cache_dir) if cache_dir else None
+
+    stats = {"images": 0, "reused": 0, "original_bytes": 0, "optimized_bytes": 0}
+    for _, original_size, optimized_size, reused in parallel_map(optimize_image_file, iter_jobs(), workers):
+        stats["images"] += 1
+        stats["reused"] += reused
+        stats["original_bytes"] += original_size
+        stats["optimized_bytes"] += optimized_size
+    return stats
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from pathlib import Path
+from link_check import resolve_reference
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+PROBE_CACHE_VERSION = 1
+# JPEG start-of-frame markers; C4, C8 and CC share the range but are not frames
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+LAZY_IMAGE_PROPS = {"loading": "lazy", "decoding": "async"}
+
+
+def _probe_png(image_file, head: bytes):
+    if head[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', head[16:24])
+
+
+def _probe_gif(image_file, head: bytes):
+    return struct.unpack('<HH', head[6:10])
+
+
+def _probe_webp(image_file, head: bytes):
+    chunk = head[12:16]
+    if chunk == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a':
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and head[20:21] == b'\x2f':
+        bits = int.from_bytes(head[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1
+    return None
+
+
+def _probe_jpeg(image_file, head: bytes):
+    # Walk the segment headers, seeking over segment bodies, until a frame header
+    image_file.seek(2)
+    while True:
+        marker = image_file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] == 0xFF:
+            image_file.seek(-1, os.SEEK_CUR)
+            continue
+        length = image_file.read(2)
+        if len(length) < 2:
+            return None
+        (length,) = struct.unpack('>H', length)
+        if marker[1] in JPEG_SOF_MARKERS:
+            frame = image_file.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            return width, height
+        image_file.seek(length - 2, os.SEEK_CUR)
+
+
+def probe_image(path: str):
+    """
+    Read the pixel dimensions of a PNG, JPEG, GIF or WebP image from its header.
+
+    Only the first few bytes are read, plus the JPEG segment headers up to
+    the frame header; image data is never loaded.
+
+    Returns:
+        tuple: (width, height), or None for unknown or truncated files
+    """
+    with open(path, 'rb') as image_file:
+        head = image_file.read(32)
+        if head.startswith(b'\x89PNG\r\n\x1a\n'):
+            probe = _probe_png
+        elif head.startswith(b'\xff\xd8'):
+            probe = _probe_jpeg
+        elif head[:6] in (b'GIF87a', b'GIF89a'):
+            probe = _probe_gif
+        elif head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+            probe = _probe_webp
+        else:
+            return None
+        try:
+            size = probe(image_file, head)
+        except struct.error:
+            return None
+    if size is None or not all(size):
+        return None
+    return size
+
+
+def load_probe_cache(cache_path: Path) -> dict:
+    try:
+        cache = json.loads(Path(cache_path).read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+    if cache.get("version") != PROBE_CACHE_VERSION:
+        return {}
+    return cache.get("images", {})
+
+
+def save_probe_cache(cache_path: Path, images: dict):
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w') as tmp_file:
+        json.dump({"version": PROBE_CACHE_VERSION, "images": images}, tmp_file)
+    os.replace(tmp_path, cache_path)
+
+
+def probe_static_images(static_dir: str, cache_path: str = None) -> dict:
+    """
+    Return the dimensions of every image below the static directory.
+
+    Results are cached by path, size and mtime in `cache_path`, so a rebuild
+    only opens images that were added or changed.
+
+    Args:
+        static_dir: Directory whose files are copied to the site root
+        cache_path: JSON file holding previous probe results
+
+    Returns:
+        dict: Maps site URL paths (`/images/a.png`) to (width, height)
+    """
+    static_path = Path(static_dir)
+    cached = load_probe_cache(cache_path) if cache_path is not None else {}
+    images = {}
+    dimensions = {}
+
+    for dir_path, _, file_names in os.walk(static_path):
+        for file_name in sorted(file_names):
+            if not file_name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = Path(dir_path) / file_name
+            url = '/' + path.relative_to(static_path).as_posix()
+            stat = path.stat()
+            entry = cached.get(url)
+            if entry is None or entry[:2] != [stat.st_size, stat.st_mtime_ns]:
+                size = probe_image(path)
+                entry = [stat.st_size, stat.st_mtime_ns] + (list(size) if size else [None, None])
+            images[url] = entry
+            if entry[2] is not None:
+                dimensions[url] = tuple(entry[2:])
+
+    if cache_path is not None and images != cached:
+        save_probe_cache(cache_path, images)
+    return dimensions
+
+
+class ImageDimensions:
+    """
+    Page transform (see utils.render_content) adding intrinsic `width` and
+    `height` to `<img>` nodes of images found under `static/`, plus
+    `loading="lazy"` and `decoding="async"` on every image but the first.
+
+    Sizes reserve the image's box before it loads, so the page does not shift.
+    The first image is usually the largest thing above the fold, and the one
+    ResourceHints preloads; loading it lazily would only delay it.
+    Must run before AssetFingerprints, which renames the image URLs.
+    """
+
+    def __init__(self, dimensions: dict):
+        self.dimensions = dimensions
+        self.cache_key = "image-dimensions:" + hashlib.sha256(
+            json.dumps(sorted(dimensions.items())).encode()).hexdigest()
+
+    def apply(self, html_node, page_url: str):
+        first = True
+        for node in html_node.walk():
+            if node.tag != "img" or not node.props:
+                continue
+            resolved = resolve_reference(page_url, node.props.get("src", ""))
+            if resolved in self.dimensions and "width" not in node.props:
+                width, height = self.dimensions[resolved]
+                node.props["width"] = str(width)
+                node.props["height"] = str(height)
+            for prop, value in LAZY_IMAGE_PROPS.items():
+                if not (first and prop == "loading"):
+                    node.props.setdefault(prop, value)
+            first = False
+
+    def apply_template(self, template: str) -> str:
+        return template
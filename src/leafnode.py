@@ -1,6 +1,9 @@
 from htmlnode import HTMLNode
 from typing import List
 
+# Elements written without a closing tag
+VOID_TAGS = frozenset({"img", "link"})
+
 class LeafNode(HTMLNode):
     def __init__(self, tag: str, value: str, children: List, props: dict):
         if children:
@@ -17,10 +20,22 @@ class LeafNode(HTMLNode):
     def to_html(self):
         if not self.tag:
             return f"{self.value}"
-        elif self.tag == "img":
+        elif self.tag in VOID_TAGS:
             return f"<{self.tag}{self.props_to_html()}/>"
         else:
             return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>".strip()
 
+    def iter_html(self, minifier=None, preserve_whitespace: bool = False):
+        value = self.value
+        if minifier is not None and not preserve_whitespace and self.tag not in minifier.preserve_tags:
+            value = minifier.collapse(value)
+
+        if not self.tag:
+            yield f"{value}"
+        elif self.tag in VOID_TAGS:
+            yield f"<{self.tag}{self.props_to_html()}/>"
+        else:
+            yield f"<{self.tag}{self.props_to_html()}>{value}</{self.tag}>"
+
     def __str__(self):
         return self.to_html()
\ No newline at end of file
@@ -0,0 +1,157 @@
+import threading
+from typing import Iterable, NamedTuple
+from urllib.parse import unquote, urljoin, urlsplit
+from page_index import iter_page_paths
+from walk import walk_tree
+from utils import extract_markdown_images, extract_markdown_links, is_code_marker, page_url
+from workers import parallel_map
+
+
+class BrokenReference(NamedTuple):
+    source: str
+    line: int
+    kind: str
+    url: str
+
+    def __str__(self):
+        return f"{self.source}:{self.line}: broken {self.kind} {self.url}"
+
+
+def build_output_index(dir_path_content: str, static_dir: str = None, extra_paths: Iterable[str] = ()) -> set:
+    """
+    Return the set of every URL path the build will produce.
+
+    Pages are indexed under their URL (`/majesty/`), and `index.md` pages also
+    under their file path (`/majesty/index.html`). Static files are indexed
+    under their path relative to the static directory. Only directory walks
+    are needed, so the index is ready before any page is rendered.
+    """
+    index = set(extra_paths)
+    for md_path in iter_page_paths(dir_path_content, include_section_index=True):
+        url = page_url(dir_path_content, md_path)
+        index.add(url)
+        if url.endswith('/'):
+            index.add(url + 'index.html')
+
+    if static_dir is not None:
+        index.update('/' + entry.relative for entry in walk_tree(static_dir) if not entry.is_dir)
+
+    return index
+
+
+def resolve_reference(base_url: str, url: str):
+    """
+    Resolve a link or image URL against the page it appears on.
+
+    Returns the site path it points to, or None for references that are not
+    checked (other sites, `mailto:` and similar, pure fragments).
+    """
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    return unquote(urljoin(base_url, parts.path))
+
+
+def is_known_output(path: str, index: set) -> bool:
+    """O(1) lookup of a resolved path, allowing for directory-style URLs."""
+    if path in index:
+        return True
+    if path.endswith('/'):
+        return path + 'index.html' in index
+    return path + '/' in index
+
+
+def collect_references(job: tuple) -> tuple:
+    """
+    Worker task: extract every link and image reference of one page.
+
+    Uses the same patterns as split_nodes_link and split_nodes_image, line by
+    line so failures can point at a line number. Lines inside fenced code
+    blocks are skipped.
+
+    Returns:
+        tuple: (source, [(line number, kind, resolved path, url), ...])
+    """
+    content_dir, md_path = job
+    base_url = page_url(content_dir, md_path)
+    references = []
+    in_code_block = False
+
+    with open(md_path) as md_file:
+        for line_number, line in enumerate(md_file, start=1):
+            if is_code_marker(line):
+                in_code_block = not in_code_block
+                continue
+            if in_code_block:
+                continue
+            for kind, matches in (("image", extract_markdown_images(line)),
+                                  ("link", extract_markdown_links(line))):
+                for _, url in matches:
+                    resolved = resolve_reference(base_url, url)
+                    if resolved is not None:
+                        references.append((line_number, kind, resolved, url))
+
+    return md_path, references
+
+
+class LinkChecker:
+    """
+    Checks internal links and images against the output index while the
+    build renders pages.
+
+    `start()` scans pages in a worker pool from a background thread; each
+    reference is looked up in the output index as soon as it arrives. Outputs
+    only known later in the build (listings, feeds, ...) can be registered
+    with `add_outputs()`; references still missing are looked up again once
+    `wait()` has collected every page.
+
+    `md_paths` limits the scan to some of the pages, e.g. those of one
+    build shard; `unresolved` then holds (reference, resolved path) pairs
+    for a later check against the merged output.
+    """
+
+    def __init__(self, dir_path_content: str, output_index: set, workers: int = None, md_paths=None):
+        self.dir_path_content = str(dir_path_content)
+        self.output_index = output_index
+        self.workers = workers
+        self.md_paths = md_paths
+        self.unresolved = []
+        self._thread = None
+        self._error = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='link-checker', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        md_paths = self.md_paths
+        if md_paths is None:
+            md_paths = iter_page_paths(self.dir_path_content, include_section_index=True)
+        jobs = ((self.dir_path_content, str(md_path)) for md_path in md_paths)
+        try:
+            # Started from the checker's thread, so the pool does not fork (see process_context)
+            for source, references in parallel_map(collect_references, jobs, self.workers):
+                for line_number, kind, resolved, url in references:
+                    if not is_known_output(resolved, self.output_index):
+                        self.unresolved.append((BrokenReference(source, line_number, kind, url), resolved))
+        except BaseException as error:
+            self._error = error
+
+    def add_outputs(self, paths: Iterable[str]):
+        self.output_index.update(paths)
+
+    def join(self):
+        """Wait for the scan to finish."""
+        if self._thread is None:
+            self._run()
+        else:
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def wait(self) -> list[BrokenReference]:
+        """Wait for the scan to finish and return the broken references."""
+        self.join()
+        return [broken for broken, resolved in self.unresolved
+                if not is_known_output(resolved, self.output_index)]
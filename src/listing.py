@@ -0,0 +1,112 @@
+import math
+from pathlib import Path, PurePosixPath
+from leafnode import LeafNode
+from parentnode import ParentNode
+from page_index import DEFAULT_MEMORY_BUDGET, iter_page_records, sort_records
+from sinks import as_sink
+from utils import fill_template
+
+DEFAULT_PER_PAGE = 50
+
+
+def listing_page_url(section: str, number: int) -> str:
+    """Return the URL of page `number` (1-based) of a section listing."""
+    section = section.strip('/')
+    prefix = f'/{section}' if section else ''
+    return f'{prefix}/page/{number}.html'
+
+
+def listing_to_html_node(records: list, section: str, number: int, page_count: int) -> ParentNode:
+    """
+    Build the HTML node for one page of a listing.
+
+    Args:
+        records: Metadata records shown on this page
+        section: Section path relative to the content root
+        number: 1-based number of this page
+        page_count: Total number of listing pages
+
+    Returns:
+        ParentNode: A div holding the list of pages and the pagination links
+    """
+    if records:
+        items = [
+            ParentNode("li", [LeafNode("a", record["title"], None, {"href": record["url"]})])
+            for record in records
+        ]
+        body = ParentNode("ul", items)
+    else:
+        body = LeafNode("p", "No pages yet.", None, None)
+
+    pagination = []
+    if number > 1:
+        pagination.append(LeafNode("a", "Previous", None, {
+            "href": listing_page_url(section, number - 1), "rel": "prev"}))
+    pagination.append(LeafNode("span", f"Page {number} of {page_count}", None, None))
+    if number < page_count:
+        pagination.append(LeafNode("a", "Next", None, {
+            "href": listing_page_url(section, number + 1), "rel": "next"}))
+
+    return ParentNode("div", [body, ParentNode("nav", pagination, {"class": "pagination"})])
+
+
+def generate_listing_pages(dir_path_content: str, section: str, template_path: str,
+                           dest_dir_path: str, per_page: int = DEFAULT_PER_PAGE,
+                           sort_key: str = "title", reverse: bool = False,
+                           memory_budget: int = DEFAULT_MEMORY_BUDGET, transforms=()) -> int:
+    """
+    Generate paginated index pages for every page below a content section.
+
+    Records come from the page-metadata index and are sorted with an external
+    merge sort, so only `memory_budget` records are held while sorting and one
+    page worth of records while writing. Each listing page is written as soon
+    as it is full, to `<dest>/<section>/page/<n>.html`.
+
+    Args:
+        dir_path_content: Root content directory
+        section: Section path relative to the content root, e.g. "majesty"
+        template_path: Path to the HTML template file
+        dest_dir_path: Root output directory, or an output sink (see sinks.py)
+        per_page: Number of entries per listing page
+        sort_key: Record field to sort by ("title", "date" or "url")
+        reverse: Sort in descending order, e.g. newest first for "date"
+        memory_budget: Maximum number of records to hold in memory while sorting
+        transforms: Page transforms whose template rewrites apply to listing pages
+
+    Returns:
+        int: Number of listing pages written
+    """
+    if per_page < 1:
+        raise ValueError("per_page must be at least 1")
+
+    template = Path(template_path).read_text()
+    for transform in transforms:
+        template = transform.apply_template(template)
+    section = section.strip('/')
+    section_title = Path(section).name if section else "Home"
+    sink = as_sink(dest_dir_path)
+    dest_path = PurePosixPath(section, 'page')
+
+    total, records = sort_records(
+        iter_page_records(dir_path_content, section), sort_key, reverse, memory_budget)
+    page_count = max(1, math.ceil(total / per_page))
+
+    def write_page(number, batch):
+        html_node = listing_to_html_node(batch, section, number, page_count)
+        title = f"{section_title} (page {number} of {page_count})"
+        sink.write((dest_path / f'{number}.html').as_posix(),
+                   fill_template(template, title, str(html_node)).encode())
+
+    number = 1
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == per_page:
+            write_page(number, batch)
+            number += 1
+            batch = []
+
+    if batch or total == 0:
+        write_page(number, batch)
+
+    return page_count
@@ -1,33 +1,591 @@
+import argparse
+import json
 import os
 import shutil
+import sys
 from pathlib import Path
-from utils import copy_from_to_dir, generate_pages_recursive
+from utils import copy_from_to_dir, generate_pages_recursive, page_url
+from listing import DEFAULT_PER_PAGE, generate_listing_pages, listing_page_url
+from feed import FEED_FILE_NAMES, generate_feed
+from link_check import LinkChecker, build_output_index, is_known_output
+from render_cache import RenderCache
+from navigation import build_nav_tree
+from search_index import build_search_index, write_search_index
+from compress import compress_outputs
+from report import BuildReport
+from minify import Minifier
+from fingerprint import AssetFingerprints, fingerprint_assets
+from image_probe import ImageDimensions, probe_static_images
+from image_optimize import optimize_images
+from assets import AssetCache, AssetInliner, minify_stylesheets
+from resource_hints import ResourceHints, collect_link_graph, save_link_graph
+from service_worker import (DEFAULT_PRECACHE_BUDGET, ServiceWorkerRegistration, load_page_ranking,
+                            precache_entries, write_service_worker)
+from page_index import iter_page_paths
+from shard import (SHARD_DATA_DIR, iter_merged_search_records, load_shard_manifests, merge_shard_outputs,
+                   merged_broken_references, merged_link_graph, merged_output_index, parse_shard,
+                   shard_pages, write_shard_manifest, write_shard_search_records)
+from daemon import DEFAULT_SOCKET_NAME, BuildDaemon
+from walk import is_selected
+from page_guard import ON_PAGE_ERROR, PageGuard
+from sinks import ARCHIVE_EXTENSIONS, ChangedFilesSink, DirectorySink, open_sink
+from cache_archive import export_cache, import_cache
+from deploy import directory_manifest, sink_manifest, write_deploy_manifest
+from server import DEFAULT_CACHE_BYTES, DEFAULT_PORT, PackServer, PreviewServer, serve
 
-def main(project_dir=None):
+DEFAULT_SITE_URL = 'http://localhost:8888'
+# Rendered pages the build daemon keeps in memory between builds
+DAEMON_RENDER_CACHE_ENTRIES = 10_000
+
+def main(project_dir=None, listings=None, feeds=(), site_url=DEFAULT_SITE_URL, search=False,
+         workers=None, check_links=False, compress=False, minify=False, fingerprint=False,
+         image_dimensions=False, optimize=False, minify_css=False, inline_css=False,
+         inline_images=False, resource_hints=False, service_worker=False,
+         precache_budget=DEFAULT_PRECACHE_BUDGET, shard=None, render_cache=None, output=None,
+         write_if_changed=False, deploy_manifest=False, only=(), exclude=(), copy_static=True,
+         page_wall_time=None, page_cpu_time=None, max_page_bytes=None, on_page_error='fail'):
     # Define paths
     if project_dir is None:
-        project_dir = Path(__file__).parent.parent
+        project_dir = default_project_dir()
     else:
         project_dir = Path(project_dir)
     public_dir = project_dir / 'public'
     static_dir = project_dir / 'static'
     content_dir = project_dir / 'content'
     template_path = project_dir / 'template.html'
+    cache_dir = project_dir / '.cache'
+    if render_cache is None:
+        render_cache = RenderCache(cache_dir / 'render')
+    report = BuildReport()
+    if output is not None and write_if_changed:
+        raise ValueError("write_if_changed applies to public/ and cannot be combined with an output archive")
+    # A partial build renders only the selected pages (or skips the static
+    # files) into the existing public/ and leaves everything else in place
+    partial = bool(only or exclude) or not copy_static
+    if partial and (output is not None or write_if_changed or shard is not None or fingerprint):
+        raise ValueError("a partial build updates public/ in place and cannot be combined with "
+                         "an output archive, write_if_changed, shard or fingerprint")
+
+    # Pages, static files, listings and feeds can stream straight into an
+    # archive, or into public/ writing only what changed; stages that
+    # rewrite or scan the output need a complete directory of their own,
+    # which is copied to the sink at the end
+    in_place = (optimize or minify_css or fingerprint or inline_css or inline_images or search
+                or service_worker or compress or shard is not None)
+    sink = None
+    # An archive that is not closed is left as a temporary file; remove it
+    # if the build fails part-way
+    try:
+        if output is not None and not in_place:
+            sink = open_sink(output)
+        elif write_if_changed and not in_place:
+            sink = ChangedFilesSink(public_dir)
+        # When writing only changed files, public/ keeps the previous build to
+        # compare against and in-place stages work in a staging directory
+        build_dir = cache_dir / 'staging' if write_if_changed else public_dir
+        # One sink for every writer, so the hashes it records cover the whole site
+        site_dest = sink if sink is not None else DirectorySink(build_dir)
+
+        # Delete existing public directory if it exists
+        if sink is None and not partial and build_dir.exists():
+            shutil.rmtree(build_dir)
+
+        # Create required directories
+        if sink is None:
+            build_dir.mkdir(parents=True, exist_ok=True)
+        content_dir.mkdir(exist_ok=True)
+        static_dir.mkdir(exist_ok=True)
+
+        # A partial build checks links on the selected pages only
+        selected_md_paths = None
+        site_wide = True
+        if only or exclude:
+            selected_md_paths = [md_path for md_path in iter_page_paths(content_dir, include_section_index=True)
+                                 if is_selected(md_path.relative_to(content_dir).as_posix(), only, exclude)]
+            report.record('selection', only=list(only), exclude=list(exclude), pages=len(selected_md_paths))
+
+        # A shard renders only its part of the pages; site-wide outputs that need
+        # every page are left to `merge`, listings and feeds are built by shard 1
+        if shard is not None:
+            partition, shard_positions = shard_pages(content_dir, shard)
+            selected_md_paths = [md_path for _, md_path in shard_positions]
+            site_wide = shard[0] == 1
+            shard_data = build_dir / SHARD_DATA_DIR
+            report.record('shard', shard=f"{shard[0]}/{shard[1]}", pages=len(selected_md_paths))
+
+        # Start checking internal links and images alongside rendering
+        link_checker = None
+        if check_links:
+            output_index = build_output_index(content_dir, static_dir)
+            link_checker = LinkChecker(content_dir, output_index, workers, selected_md_paths).start()
+
+        # Copy static files to public directory
+        if copy_static:
+            copy_from_to_dir(static_dir, site_dest)
+        if shard is not None:
+            shard_data.mkdir()
+
+        # Losslessly shrink copied images; before fingerprinting, which hashes the result
+        if optimize:
+            report.record('optimize', **optimize_images(build_dir, cache_dir / 'images', workers))
+
+        # Minify stylesheets once; before fingerprinting, which hashes the result
+        asset_cache = AssetCache(cache_dir / 'assets.json')
+        if minify_css:
+            report.record('css', **minify_stylesheets(build_dir, asset_cache))
+
+        # Size images from their headers so pages reserve space for them; this
+        # must see the original image URLs, before fingerprinting rewrites them
+        transforms = ()
+        if image_dimensions:
+            dimensions = probe_static_images(static_dir, cache_dir / 'images.json')
+            report.record('images', probed=len(dimensions))
+            transforms += (ImageDimensions(dimensions),)
+
+        # Copy static assets to content-hashed names and point pages at them
+        if fingerprint:
+            manifest = fingerprint_assets(build_dir)
+            report.record('fingerprint', assets=len(manifest))
+            transforms += (AssetFingerprints(manifest),)
+
+        # Inline small stylesheets and images into the pages that use them
+        if inline_css or inline_images:
+            inliner = AssetInliner(build_dir, asset_cache, inline_css, inline_images)
+            report.record('inline', stylesheets=len(inliner.styles), images=len(inliner.images))
+            transforms += (inliner,)
+
+        if service_worker:
+            transforms += (ServiceWorkerRegistration(),)
+
+        # Hint the hero image and likely next pages; last, so it sees final URLs
+        hints = None
+        if resource_hints:
+            hints = ResourceHints(cache_dir / 'link-graph.json')
+            transforms += (hints,)
+
+        # Build the navigation model once if the template has a place for it
+        template = template_path.read_text()
+        nav = None
+        if "{{ Nav }}" in template or "{{ Breadcrumbs }}" in template:
+            nav = build_nav_tree(content_dir)
+
+        # Parse pages in a watched worker process when they have a budget, so
+        # one pathological page cannot stall the build
+        guard = None
+        if page_wall_time is not None or page_cpu_time is not None or max_page_bytes is not None:
+            guard = PageGuard(page_wall_time, page_cpu_time, max_page_bytes, on_page_error == 'placeholder')
+
+        # Generate pages recursively from content to public
+        minifier = Minifier() if minify else None
+        try:
+            generate_pages_recursive(content_dir, template_path, site_dest, render_cache, nav,
+                                     minifier=minifier, transforms=transforms,
+                                     pages=set(selected_md_paths) if shard is not None else None,
+                                     only=only, exclude=exclude, guard=guard)
+        finally:
+            if guard is not None:
+                guard.close()
+        report.record('render', cache_hits=render_cache.hits, cache_misses=render_cache.misses)
+        if guard is not None:
+            report.record('budget', over_budget=dict(guard.offending), workers_killed=guard.killed,
+                          placeholders=len(guard.offending) if guard.placeholder else 0)
+            for page, reason in guard.offending if not guard.placeholder else ():
+                report.error(f"{page}: not published, {reason}")
+        if minifier is not None:
+            report.record('minify', **minifier.stats())
+        page_urls = [page_url(content_dir, md_path)
+                     for md_path in iter_page_paths(content_dir, include_section_index=True)]
+        if hints is not None:
+            hints.save(page_urls)
+            if shard is not None:
+                hints.save([page_url(content_dir, md_path) for md_path in selected_md_paths],
+                           shard_data / 'link-graph.json')
+            report.record('hints', preloads=hints.preloads, prefetches=hints.prefetches)
+        elif service_worker:
+            # The service worker precaches the most linked-to pages; without
+            # hints recording the link graph while rendering, read it from the markdown
+            if shard is not None:
+                save_link_graph(shard_data / 'link-graph.json',
+                                collect_link_graph(content_dir, selected_md_paths, workers))
+            else:
+                save_link_graph(cache_dir / 'link-graph.json', collect_link_graph(
+                    content_dir, iter_page_paths(content_dir, include_section_index=True), workers))
+
+        # Generate paginated listings for the configured sections
+        for section, per_page in (listings or {}).items() if site_wide else ():
+            page_count = generate_listing_pages(content_dir, section, template_path, site_dest, per_page,
+                                                transforms=transforms)
+            if link_checker is not None:
+                link_checker.add_outputs(listing_page_url(section, number) for number in range(1, page_count + 1))
+
+        # Generate feeds, reusing entries from the previous build where possible.
+        # Entries share the pages' renders, but not their hashed asset URLs,
+        # which a later build deletes while feed readers keep old entries, nor
+        # their resource hints
+        feed_transforms = tuple(transform for transform in transforms
+                                if not isinstance(transform, (AssetFingerprints, ResourceHints)))
+        for section in feeds if site_wide else ():
+            state_name = (section.strip('/') or 'index').replace('/', '-') + '.json'
+            feed_stats = generate_feed(content_dir, section, site_dest, site_url,
+                                       state_path=cache_dir / 'feeds' / state_name, cache=render_cache,
+                                       minifier=minifier, transforms=feed_transforms)
+            report.record(f'feed:{section}', **feed_stats)
+            if link_checker is not None:
+                feed_path = Path('/', section.strip('/'), FEED_FILE_NAMES['atom'])
+                link_checker.add_outputs([feed_path.as_posix()])
+
+        # Drop render cache entries no page used, so the cache (and what `cache
+        # export` carries) does not grow with every edit; a partial build or a
+        # shard leaves out pages whose entries are still good
+        if not partial and shard is None:
+            report.record('render', pruned=render_cache.prune())
+
+        # Build the client-side search index in the worker pool
+        if search and shard is not None:
+            report.record('search', documents=write_shard_search_records(content_dir, shard_positions,
+                                                                         shard_data, workers))
+        elif search:
+            report.record('search', **build_search_index(content_dir, build_dir, workers))
+
+        # Precache stylesheets, popular pages and images for repeat visitors
+        if service_worker and shard is None:
+            entries = precache_entries(build_dir, page_urls, load_page_ranking(cache_dir / 'link-graph.json'),
+                                       precache_budget)
+            report.record('service_worker', budget=precache_budget, **write_service_worker(build_dir, entries))
+
+        # Precompress text outputs once everything has been written
+        if compress:
+            report.record('compress', **compress_outputs(build_dir, cache_dir / 'compress', workers))
+
+        if link_checker is not None and shard is not None:
+            # Other shards may provide what this one is missing; check again after merging
+            link_checker.join()
+            unresolved = [[Path(broken.source).relative_to(content_dir).as_posix(), *broken[1:], resolved]
+                          for broken, resolved in link_checker.unresolved
+                          if not is_known_output(resolved, link_checker.output_index)]
+            (shard_data / 'links.json').write_text(json.dumps(unresolved))
+            report.record('links', unresolved=len(unresolved))
+        elif link_checker is not None:
+            broken = link_checker.wait()
+            report.record('links', broken=len(broken))
+            for reference in broken:
+                report.error(str(reference))
+
+        if shard is not None:
+            stages = {"search": search, "check_links": check_links}
+            if service_worker:
+                stages["service_worker"] = precache_budget
+            write_shard_manifest(build_dir, shard, partition, **stages)
+
+        if output is not None:
+            if sink is None:
+                sink = open_sink(output)
+                copy_from_to_dir(build_dir, sink)
+            sink.close()
+            report.record('output', path=str(output), streamed=not in_place, files=sink.files, bytes=sink.bytes)
+            if sink.skipped:
+                report.record('output', skipped=sink.skipped)
+        elif write_if_changed:
+            if sink is None:
+                sink = ChangedFilesSink(public_dir)
+                copy_from_to_dir(build_dir, sink)
+                shutil.rmtree(build_dir)
+            sink.close()
+            report.record('output', streamed=not in_place, files=sink.files, **sink.stats())
+    except BaseException:
+        if sink is not None:
+            sink.abort()
+        raise
+
+    # List every output file's hash, and what changed since the last build,
+    # from the hashes taken while writing
+    if deploy_manifest:
+        if sink is not None:
+            files, read = sink_manifest(sink), 0
+        else:
+            files, read = directory_manifest(build_dir, site_dest.hashes)
+        report.record('deploy', rehashed=read, **write_deploy_manifest(cache_dir, files))
+
+    report.write(cache_dir / 'build-report.json')
+    return report
+
+def merge(shard_dirs, project_dir=None):
+    """
+    Combine the output directories of a sharded build (`build --shard I/N`)
+    into one `public/`, and run the stages that need every page: the search
+    index, the service worker and the final link check.
+    """
+    if project_dir is None:
+        project_dir = default_project_dir()
+    else:
+        project_dir = Path(project_dir)
+    public_dir = project_dir / 'public'
+    content_dir = project_dir / 'content'
+    cache_dir = project_dir / '.cache'
+    report = BuildReport()
+
+    shards = load_shard_manifests(shard_dirs)
+    stages = shards[0][1]["stages"]
 
-    # Delete existing public directory if it exists
     if public_dir.exists():
         shutil.rmtree(public_dir)
-    
-    # Create required directories
-    public_dir.mkdir(exist_ok=True)
-    content_dir.mkdir(exist_ok=True)
-    static_dir.mkdir(exist_ok=True)
+    public_dir.mkdir(parents=True)
+    report.record('merge', shards=len(shards), files=merge_shard_outputs(shards, public_dir))
+
+    # Keep the site-wide link graph for hints and precache ranking in later builds
+    link_graph = merged_link_graph(shards)
+    if link_graph:
+        save_link_graph(cache_dir / 'link-graph.json', link_graph)
+
+    if stages["search"]:
+        report.record('search', **write_search_index(iter_merged_search_records(shards), public_dir))
+
+    if "service_worker" in stages:
+        page_urls = [page_url(content_dir, md_path)
+                     for md_path in iter_page_paths(content_dir, include_section_index=True)]
+        entries = precache_entries(public_dir, page_urls, load_page_ranking(cache_dir / 'link-graph.json'),
+                                   stages["service_worker"])
+        report.record('service_worker', budget=stages["service_worker"],
+                      **write_service_worker(public_dir, entries))
+
+    if stages["check_links"]:
+        broken = merged_broken_references(shards, merged_output_index(shards), content_dir)
+        report.record('links', broken=len(broken))
+        for reference in broken:
+            report.error(str(reference))
+
+    report.write(cache_dir / 'build-report.json')
+    return report
+
+def parse_listing(value: str) -> tuple[str, int]:
+    """Parse a `SECTION[:PER_PAGE]` command line value."""
+    section, _, per_page = value.partition(':')
+    try:
+        return section, int(per_page) if per_page else DEFAULT_PER_PAGE
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid page size in {value!r}")
+
+def parse_output(value: str) -> str:
+    """Check that an `--output` path names an archive format."""
+    if not value.endswith(ARCHIVE_EXTENSIONS):
+        raise argparse.ArgumentTypeError(
+            f"unknown output format for {value!r}, expected one of {', '.join(ARCHIVE_EXTENSIONS)}")
+    return value
+
+COMMANDS = ('build', 'merge', 'daemon', 'serve', 'preview', 'cache')
+
+def default_project_dir() -> Path:
+    return Path(__file__).parent.parent
+
+def add_build_arguments(parser):
+    parser.add_argument('--listing', action='append', type=parse_listing, default=[],
+                        metavar='SECTION[:PER_PAGE]',
+                        help="generate paginated index pages for a content section")
+    parser.add_argument('--feed', action='append', default=[], metavar='SECTION',
+                        help="generate an Atom feed for a content section")
+    parser.add_argument('--site-url', default=DEFAULT_SITE_URL,
+                        help="absolute site URL used in feeds")
+    parser.add_argument('--search', action='store_true',
+                        help="build a sharded client-side search index under public/search/")
+    parser.add_argument('--check-links', action='store_true',
+                        help="report broken internal links and missing images")
+    parser.add_argument('--compress', action='store_true',
+                        help="write precompressed .gz/.zst siblings of HTML, CSS and SVG outputs")
+    parser.add_argument('--minify', action='store_true',
+                        help="strip insignificant whitespace from generated pages")
+    parser.add_argument('--fingerprint', action='store_true',
+                        help="rename static assets to content-hashed names for immutable caching")
+    parser.add_argument('--image-dimensions', action='store_true',
+                        help="add width/height and lazy-loading attributes to images")
+    parser.add_argument('--optimize-images', action='store_true',
+                        help="losslessly strip metadata from and recompress PNG and JPEG images")
+    parser.add_argument('--minify-css', action='store_true',
+                        help="strip comments and insignificant whitespace from stylesheets")
+    parser.add_argument('--inline-css', action='store_true',
+                        help="inline small stylesheets linked from the template into <head>")
+    parser.add_argument('--inline-images', action='store_true',
+                        help="inline small images as data: URIs")
+    parser.add_argument('--resource-hints', action='store_true',
+                        help="preload each page's first image and prefetch its likely next pages")
+    parser.add_argument('--service-worker', action='store_true',
+                        help="write an offline-capable service worker with a precache manifest")
+    parser.add_argument('--precache-budget', type=int, default=DEFAULT_PRECACHE_BUDGET, metavar='BYTES',
+                        help="maximum total size of files the service worker precaches")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of worker processes (defaults to the CPU count)")
+    parser.add_argument('--shard', type=parse_shard, default=None, metavar='I/N',
+                        help="render only shard I of N of the pages, for `merge` to combine")
+    parser.add_argument('--deploy-manifest', action='store_true',
+                        help="write the hash of every output file and the changes since the last build to .cache/")
+    parser.add_argument('--only', action='append', default=[], metavar='GLOB',
+                        help="render only the pages whose path below content/ matches GLOB (e.g. "
+                             "'majesty/**'), leaving the rest of public/ in place; repeatable")
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help="do not render the pages whose path below content/ matches GLOB, "
+                             "leaving their output in place; repeatable")
+    parser.add_argument('--skip-static', action='store_true',
+                        help="do not copy static/ again, leaving public/ in place")
+    parser.add_argument('--page-timeout', type=float, default=None, metavar='SECONDS',
+                        help="wall-clock time allowed to parse one page")
+    parser.add_argument('--page-cpu-time', type=float, default=None, metavar='SECONDS',
+                        help="CPU time allowed to parse one page")
+    parser.add_argument('--max-page-bytes', type=int, default=None, metavar='BYTES',
+                        help="largest markdown file to parse")
+    parser.add_argument('--on-page-error', choices=ON_PAGE_ERROR, default='fail',
+                        help="for a page over its budget, fail the build once every other page is "
+                             "written, or publish a placeholder page (default: fail)")
+    destination = parser.add_mutually_exclusive_group()
+    destination.add_argument('--write-if-changed', action='store_true',
+                             help="keep public/ between builds and rewrite only files whose contents changed")
+    destination.add_argument('--output', type=parse_output, default=None, metavar='ARCHIVE',
+                             help="write the site into a .tar, .tar.gz, .zip or .pack file instead of "
+                                  "public/ (stages that rewrite outputs still build public/ first)")
+
+def build_options(args) -> dict:
+    """Return the keyword arguments for main() given by parsed build arguments."""
+    return dict(listings=dict(args.listing), feeds=args.feed, site_url=args.site_url,
+                search=args.search, workers=args.workers, check_links=args.check_links,
+                compress=args.compress, minify=args.minify, fingerprint=args.fingerprint,
+                image_dimensions=args.image_dimensions, optimize=args.optimize_images,
+                minify_css=args.minify_css, inline_css=args.inline_css,
+                inline_images=args.inline_images, resource_hints=args.resource_hints,
+                service_worker=args.service_worker, precache_budget=args.precache_budget,
+                shard=args.shard, output=args.output, write_if_changed=args.write_if_changed,
+                deploy_manifest=args.deploy_manifest, only=args.only, exclude=args.exclude,
+                copy_static=not args.skip_static, page_wall_time=args.page_timeout,
+                page_cpu_time=args.page_cpu_time, max_page_bytes=args.max_page_bytes,
+                on_page_error=args.on_page_error)
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # `build` is the default command, so `main.py --minify` keeps working;
+    # the command comes after any top-level --project-dir
+    position = 0
+    while position < len(argv) and argv[position].startswith('--project-dir'):
+        position += 1 if '=' in argv[position] else 2
+    if position >= len(argv) or argv[position] not in COMMANDS + ('-h', '--help'):
+        argv = argv[:position] + ['build'] + argv[position:]
 
-    # Copy static files to public directory
-    copy_from_to_dir(static_dir, public_dir)
+    parser = argparse.ArgumentParser(description="Simple static site generator.")
+    parser.add_argument('--project-dir', default=None,
+                        help="project root (defaults to the repository root)")
+    subparsers = parser.add_subparsers(dest='command')
 
-    # Generate pages recursively from content to public
-    generate_pages_recursive(content_dir, template_path, public_dir)
+    build = subparsers.add_parser('build', help="build the site from content/ into public/")
+    build.add_argument('--project-dir', default=argparse.SUPPRESS,
+                       help="project root (defaults to the repository root)")
+    add_build_arguments(build)
+
+    merge = subparsers.add_parser('merge', help="combine the outputs of a sharded build into public/")
+    merge.add_argument('--project-dir', default=argparse.SUPPRESS,
+                       help="project root (defaults to the repository root)")
+    merge.add_argument('shard_dirs', nargs='+', metavar='SHARD_DIR',
+                       help="output directory of each `build --shard I/N`")
+
+    daemon = subparsers.add_parser('daemon', help="keep a build server with warm caches on a Unix socket")
+    daemon.add_argument('--project-dir', default=argparse.SUPPRESS,
+                        help="project root (defaults to the repository root)")
+    daemon.add_argument('--socket', default=None,
+                        help=f"socket path (defaults to .cache/{DEFAULT_SOCKET_NAME} in the project)")
+    add_build_arguments(daemon)
+
+    serve = subparsers.add_parser('serve', help="serve the built site from public/")
+    serve.add_argument('--project-dir', default=argparse.SUPPRESS,
+                       help="project root (defaults to the repository root)")
+    serve.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT, help="port to listen on")
+    serve.add_argument('--pack', default=None,
+                       help="serve a pack file written by `build --output SITE.pack` instead of public/")
+    serve.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                       help="in-memory file cache size in MiB")
+
+    preview = subparsers.add_parser('preview', help="render pages on request, without a build")
+    preview.add_argument('--project-dir', default=argparse.SUPPRESS,
+                         help="project root (defaults to the repository root)")
+    preview.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    preview.add_argument('--port', type=int, default=DEFAULT_PORT, help="port to listen on")
+
+    cache = subparsers.add_parser('cache', help="move the build caches in .cache/ between machines")
+    cache.add_argument('--project-dir', default=argparse.SUPPRESS,
+                       help="project root (defaults to the repository root)")
+    cache.add_argument('action', choices=('export', 'import'),
+                       help="pack the caches into ARCHIVE, or unpack ARCHIVE into .cache/")
+    cache.add_argument('archive', metavar='ARCHIVE', help="cache archive path, e.g. build-cache.tar.gz")
+
+    return parser.parse_args(argv)
+
+def run_build(args):
+    try:
+        report = main(args.project_dir, **build_options(args))
+    except ValueError as error:
+        sys.exit(f"build failed: {error}")
+    for error in report.errors:
+        print(error, file=sys.stderr)
+    if report.failed:
+        sys.exit(1)
+
+def run_merge(args):
+    try:
+        report = merge(args.shard_dirs, args.project_dir)
+    except ValueError as error:
+        sys.exit(f"merge failed: {error}")
+    for error in report.errors:
+        print(error, file=sys.stderr)
+    if report.failed:
+        sys.exit(1)
+
+def run_daemon(args):
+    project_dir = Path(args.project_dir) if args.project_dir else default_project_dir()
+    options = build_options(args)
+    render_cache = RenderCache(project_dir / '.cache' / 'render', DAEMON_RENDER_CACHE_ENTRIES)
+
+    def build():
+        render_cache.hits = render_cache.misses = 0
+        return main(project_dir, render_cache=render_cache, **options)
+
+    socket_path = Path(args.socket) if args.socket else project_dir / '.cache' / DEFAULT_SOCKET_NAME
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    watch_paths = [project_dir / 'content', project_dir / 'static', project_dir / 'template.html']
+    with BuildDaemon(socket_path, build, watch_paths) as daemon:
+        print(f"Build daemon listening on {socket_path}")
+        daemon.serve_forever()
+
+def run_serve(args):
+    project_dir = Path(args.project_dir) if args.project_dir else default_project_dir()
+    if args.pack:
+        serve(args.pack, args.host, args.port, server_class=PackServer)
+    else:
+        serve(project_dir / 'public', args.host, args.port, cache_bytes=args.cache_mb * 1024 * 1024)
+
+def run_preview(args):
+    project_dir = Path(args.project_dir) if args.project_dir else default_project_dir()
+    serve(project_dir, args.host, args.port, server_class=PreviewServer)
+
+def run_cache(args):
+    project_dir = Path(args.project_dir) if args.project_dir else default_project_dir()
+    cache_dir = project_dir / '.cache'
+    if args.action == 'export':
+        stats = export_cache(cache_dir, args.archive)
+        print(f"Exported {stats['files']} cache files ({stats['bytes']} bytes) to {args.archive}")
+        return
+    try:
+        stats = import_cache(cache_dir, args.archive)
+    except (FileNotFoundError, ValueError) as error:
+        sys.exit(f"cache import failed: {error}")
+    print(f"Imported {stats['imported']} cache files from {args.archive} "
+          f"({stats['stale']} stale, {stats['rejected']} rejected)")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.command == 'merge':
+        run_merge(args)
+    elif args.command == 'daemon':
+        run_daemon(args)
+    elif args.command == 'serve':
+        run_serve(args)
+    elif args.command == 'preview':
+        run_preview(args)
+    elif args.command == 'cache':
+        run_cache(args)
+    else:
+        run_build(args)
@@ -0,0 +1,98 @@
+import re
+
+# Elements whose text content must be written exactly as-is
+PRESERVE_TAGS = frozenset({"pre", "code", "textarea", "script", "style"})
+# Elements that never render the whitespace around them
+BLOCK_TAGS = frozenset({
+    "!doctype", "html", "head", "body", "meta", "link", "title", "base", "script", "style",
+    "article", "aside", "blockquote", "div", "footer", "header", "main", "nav", "section",
+    "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li", "ol", "p", "pre", "table", "tbody",
+    "td", "th", "thead", "tr", "ul",
+})
+WHITESPACE_RUN = re.compile(r"\s+")
+TEMPLATE_TOKEN = re.compile(r"<!--.*?-->|<[^>]+>", re.DOTALL)
+TAG_NAME = re.compile(r"</?\s*([!\w-]+)")
+
+
+class Minifier:
+    """
+    Whitespace minifier applied while HTML nodes are serialized.
+
+    Passed to `HTMLNode.iter_html`; collapses whitespace runs in text to a
+    single space and keeps count of the bytes that saves, overall and per
+    page.
+    """
+
+    preserve_tags = PRESERVE_TAGS
+
+    def __init__(self):
+        self.saved = 0
+        self.pages = {}
+
+    def collapse(self, text: str) -> str:
+        collapsed = WHITESPACE_RUN.sub(" ", text)
+        self.saved += len(text) - len(collapsed)
+        return collapsed
+
+    def record_page(self, page: str, saved: int):
+        self.pages[page] = saved
+
+    def stats(self) -> dict:
+        return {
+            "pages": len(self.pages),
+            "bytes_saved": sum(self.pages.values()),
+            "bytes_saved_per_page": self.pages,
+        }
+
+
+def _tag_name(tag: str) -> str:
+    match = TAG_NAME.match(tag)
+    return match.group(1).lower() if match else ""
+
+
+def minify_template(template: str) -> str:
+    """
+    Strip insignificant whitespace and comments from a page template.
+
+    Runs once per template, not per page. Whitespace runs in text are
+    collapsed to one space and dropped entirely next to block-level tags;
+    anything inside `<pre>`, `<code>`, `<script>`, ... is kept verbatim.
+    Placeholders such as `{{ Content }}` are ordinary text and survive.
+    """
+    output = []
+    position = 0
+    previous_tag = "html"
+    preserving = None
+
+    for match in TEMPLATE_TOKEN.finditer(template):
+        token = match.group(0)
+        tag = _tag_name(token)
+        text = template[position:match.start()]
+        position = match.end()
+
+        if preserving is not None:
+            output.append(text)
+            output.append(token)
+            if token.startswith("</") and tag == preserving:
+                preserving = None
+            previous_tag = tag
+            continue
+
+        text = WHITESPACE_RUN.sub(" ", text)
+        if previous_tag in BLOCK_TAGS:
+            text = text.lstrip()
+        if tag in BLOCK_TAGS:
+            text = text.rstrip()
+        output.append(text)
+
+        if token.startswith("<!--"):
+            continue
+
+        output.append(token)
+        if not token.startswith("</") and tag in PRESERVE_TAGS:
+            preserving = tag
+        previous_tag = tag
+
+    tail = template[position:]
+    output.append(tail if preserving is not None else WHITESPACE_RUN.sub(" ", tail).strip())
+    return "".join(output)
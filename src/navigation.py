@@ -0,0 +1,112 @@
+from pathlib import PurePosixPath
+from typing import Iterable
+from leafnode import LeafNode
+from parentnode import ParentNode
+from walk import DEFAULT_IGNORE, walk_tree
+
+BREADCRUMB_SEPARATOR = " / "
+
+
+class NavSection:
+    """
+    One content directory in the navigation tree.
+
+    The section's sidebar (links to its pages and subsections) and its
+    breadcrumb trail are rendered the first time they are asked for and then
+    reused by every page in the section. Breadcrumbs extend the parent's
+    cached trail, so each fragment costs O(entries in the section) to build
+    exactly once.
+    """
+
+    def __init__(self, path: str, parent=None):
+        self.path = path
+        self.parent = parent
+        self.url = f"/{path}/" if path else "/"
+        self.label = PurePosixPath(path).name if path else "Home"
+        self.sections = []
+        self.pages = []
+        self._nav_html = None
+        self._breadcrumbs_html = None
+
+    def __repr__(self):
+        return f"NavSection({self.path!r}, {len(self.sections)} sections, {len(self.pages)} pages)"
+
+    def nav_html(self) -> str:
+        if self._nav_html is None:
+            items = [
+                ParentNode("li", [LeafNode("a", section.label, None, {"href": section.url})])
+                for section in self.sections
+            ]
+            items.extend(
+                ParentNode("li", [LeafNode("a", label, None, {"href": url})])
+                for label, url in self.pages
+            )
+            self._nav_html = ParentNode("ul", items, {"class": "nav"}).to_html() if items else ""
+        return self._nav_html
+
+    def breadcrumbs_html(self) -> str:
+        if self._breadcrumbs_html is None:
+            link = LeafNode("a", self.label, None, {"href": self.url}).to_html()
+            if self.parent is None:
+                self._breadcrumbs_html = link
+            else:
+                self._breadcrumbs_html = self.parent.breadcrumbs_html() + BREADCRUMB_SEPARATOR + link
+        return self._breadcrumbs_html
+
+
+class NavTree:
+    """Site-wide navigation model, built once per build and shared by all pages."""
+
+    def __init__(self):
+        self.root = NavSection("")
+        self._sections = {"": self.root}
+
+    @classmethod
+    def from_paths(cls, page_paths: Iterable[str]) -> "NavTree":
+        """
+        Build a tree from markdown paths relative to the content root.
+
+        Pages are labelled by file name (`index.md` stands for its section and
+        is not listed), so building the tree never has to read page contents.
+        """
+        tree = cls()
+        for page_path in page_paths:
+            page_path = PurePosixPath(page_path)
+            section = tree._add_section(page_path.parent.as_posix())
+            if page_path.name != 'index.md':
+                url = '/' + page_path.with_suffix('.html').as_posix()
+                section.pages.append((page_path.stem, url))
+        return tree
+
+    def _add_section(self, path: str) -> NavSection:
+        path = '' if path == '.' else path
+        section = self._sections.get(path)
+        if section is None:
+            parent = self._add_section(PurePosixPath(path).parent.as_posix())
+            section = NavSection(path, parent)
+            parent.sections.append(section)
+            self._sections[path] = section
+        return section
+
+    def section(self, path: str) -> NavSection:
+        """Return the section for a directory relative to the content root."""
+        path = PurePosixPath(path).as_posix()
+        return self._sections.get('' if path == '.' else path, self.root)
+
+    def __len__(self):
+        return len(self._sections)
+
+
+def build_nav_tree(content_dir: str, ignore=DEFAULT_IGNORE) -> NavTree:
+    """
+    Walk the content directory once and build the navigation tree.
+
+    Args:
+        content_dir: Root content directory
+        ignore: Glob patterns of files and directories to skip (see walk.py)
+
+    Returns:
+        NavTree: Sections and pages in sorted order
+    """
+    return NavTree.from_paths(entry.relative for entry in walk_tree(content_dir, ignore)
+                              if not entry.is_dir and entry.relative.endswith('.md'))
@@ -0,0 +1,158 @@
+import signal
+from workers import process_context
+
+# How an over-budget page is published: not at all (the build fails), or
+# as a placeholder page (the build succeeds)
+ON_PAGE_ERROR = ('fail', 'placeholder')
+
+
+class PageBudgetExceeded(Exception):
+    """A page's markdown took too long to parse, or was too big to try."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _parse_markdown(markdown: str):
+    # Imported here so utils can import this module
+    from utils import markdown_to_html_node
+    return markdown_to_html_node(markdown)
+
+
+def _serve(conn, parse, cpu_time):
+    """Worker loop: parse each markdown text received, with a CPU time budget per text, until None."""
+    # SIGPROF's default action ends the process, however deep in C code the parser is
+    signal.signal(signal.SIGPROF, signal.SIG_DFL)
+    while True:
+        try:
+            markdown = conn.recv()
+        except EOFError:
+            return
+        if markdown is None:
+            return
+        if cpu_time:
+            signal.setitimer(signal.ITIMER_PROF, cpu_time)
+        try:
+            result = (True, parse(markdown))
+        except Exception as error:
+            result = (False, error)
+        finally:
+            if cpu_time:
+                signal.setitimer(signal.ITIMER_PROF, 0)
+        conn.send(result)
+
+
+class PageGuard:
+    """
+    Parses page markdown in a worker process under per-page budgets, so a
+    pathological page (a giant paragraph, thousands of `*`) cannot stall
+    the build.
+
+    A page larger than `max_bytes` is not parsed at all. A page whose parse
+    takes longer than `wall_time` seconds, or uses more than `cpu_time`
+    seconds of CPU, has its worker killed; a new worker is started for the
+    next page. Either way parse raises PageBudgetExceeded, and render_pages
+    reports the page and publishes a placeholder when `placeholder` is set.
+
+    Args:
+        wall_time (float, optional): Wall-clock seconds allowed per page
+        cpu_time (float, optional): CPU seconds allowed per page
+        max_bytes (int, optional): Largest markdown source, in UTF-8 bytes, to parse
+        placeholder (bool): Publish a placeholder for over-budget pages
+            instead of leaving them out and failing the build
+        parse (callable, optional): Module-level markdown parser, defaults
+            to markdown_to_html_node
+    """
+
+    def __init__(self, wall_time: float = None, cpu_time: float = None, max_bytes: int = None,
+                 placeholder: bool = False, parse=None):
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.max_bytes = max_bytes
+        self.placeholder = placeholder
+        self.parse_func = parse or _parse_markdown
+        self.offending = []
+        self.killed = 0
+        self._process = None
+        self._conn = None
+
+    def _start(self):
+        # Not forked while the link checker's thread runs (see process_context)
+        context = process_context()
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=_serve, daemon=True,
+                                        args=(child_conn, self.parse_func, self.cpu_time))
+        self._process.start()
+        child_conn.close()
+
+    def _kill(self):
+        self._process.kill()
+        self._process.join()
+        self._conn.close()
+        self._process = self._conn = None
+        self.killed += 1
+
+    @property
+    def cache_key(self) -> str:
+        """
+        Part of the render cache key of pages parsed under this guard: a page
+        rendered under other time budgets, or none, might not finish under
+        these. The size budget is checked before the cache is (see check_size).
+        """
+        if self.wall_time is None and self.cpu_time is None:
+            return ""
+        return f"budget:{self.wall_time}:{self.cpu_time}"
+
+    def check_size(self, markdown: str):
+        """
+        Raises:
+            PageBudgetExceeded: If `markdown` is over the size budget
+        """
+        if self.max_bytes is not None:
+            size = len(markdown.encode())
+            if size > self.max_bytes:
+                raise PageBudgetExceeded(f"{size} bytes of markdown, over the {self.max_bytes} byte limit")
+
+    def parse(self, markdown: str):
+        """
+        Return the HTML node tree of `markdown`, parsed in the worker process.
+
+        Raises:
+            PageBudgetExceeded: If the page is too big, or its parse ran out of time
+        """
+        self.check_size(markdown)
+        if self._process is None:
+            self._start()
+
+        self._conn.send(markdown)
+        if not self._conn.poll(self.wall_time):
+            self._kill()
+            raise PageBudgetExceeded(f"parsing took over {self.wall_time}s")
+        try:
+            ok, result = self._conn.recv()
+        except EOFError:
+            # The worker died: its CPU timer went off, or it ran out of memory
+            self._kill()
+            raise PageBudgetExceeded(f"parsing used over {self.cpu_time}s of CPU time"
+                                     if self.cpu_time else "the parser process died")
+        if not ok:
+            raise result
+        return result
+
+    def close(self):
+        """Stop the worker process; a later parse starts a new one."""
+        if self._process is not None:
+            self._conn.send(None)
+            self._conn.close()
+            self._process.join(1)
+            if self._process.is_alive():
+                self._process.kill()
+                self._process.join()
+            self._process = self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,175 @@
+import heapq
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+from textnode import TextType
+from walk import DEFAULT_IGNORE, walk_tree
+from utils import (BlockType, block_to_block_type, extract_title,
+                   markdown_to_blocks, page_url, text_to_textnodes)
+
+# Number of records sort_records keeps in memory before spilling a sorted run
+DEFAULT_MEMORY_BUDGET = 10_000
+SUMMARY_LENGTH = 200
+
+
+def extract_summary(markdown: str, length: int = SUMMARY_LENGTH) -> str:
+    """
+    Return the plain text of the first paragraph of a page.
+
+    Args:
+        markdown: Page source
+        length: Maximum number of characters to keep
+
+    Returns:
+        str: Summary text, or "" if the page has no paragraph
+    """
+    for block in markdown_to_blocks(markdown):
+        if block_to_block_type(block) != BlockType.PARAGRAPH:
+            continue
+        text = ' '.join(block.split())
+        try:
+            nodes = text_to_textnodes(text)
+            text = ''.join(node.text for node in nodes if node.text_type != TextType.IMAGE)
+        except Exception:
+            # Malformed inline markup; fall back to the raw paragraph text
+            pass
+        text = text.strip()
+        if not text:
+            continue
+        if len(text) > length:
+            text = text[:length].rsplit(' ', 1)[0] + '…'
+        return text
+
+    return ""
+
+
+def page_record(content_dir: str, md_path: str, markdown: str = None) -> dict:
+    """
+    Build the metadata record for a single markdown page.
+
+    The record holds the page URL, title, last-modified date (ISO 8601, UTC),
+    summary and source path. It is a plain dict so it can be written out as a
+    JSON line. Pass `markdown` when the caller has already read the page.
+    """
+    md_path = Path(md_path)
+    if markdown is None:
+        markdown = md_path.read_text()
+    modified = datetime.fromtimestamp(md_path.stat().st_mtime, timezone.utc)
+
+    return {
+        "url": page_url(content_dir, md_path),
+        "title": extract_title(markdown),
+        "date": modified.isoformat(timespec='seconds'),
+        "summary": extract_summary(markdown),
+        "source": str(md_path),
+    }
+
+
+def iter_page_paths(content_dir: str, section: str = "", include_section_index: bool = False,
+                    ignore=DEFAULT_IGNORE) -> Iterator[Path]:
+    """
+    Lazily yield the markdown files below a content section.
+
+    The section's own `index.md` is its landing page rather than a member of
+    the section, so it is skipped unless `include_section_index` is set. Directories and files are visited in sorted
+    order, and only one directory listing is held in memory at a time.
+
+    Args:
+        content_dir: Root content directory
+        section: Section path relative to the content root, e.g. "majesty"
+        ignore: Glob patterns of files and directories to skip (see walk.py)
+    """
+    section_path = Path(content_dir) / section.strip('/')
+    if not section_path.is_dir():
+        raise ValueError(f"Section directory {section_path} does not exist")
+
+    for entry in walk_tree(section_path, ignore):
+        if entry.is_dir or not entry.relative.endswith('.md'):
+            continue
+        if not include_section_index and entry.relative == 'index.md':
+            continue
+        yield Path(entry.path)
+
+
+def iter_page_records(content_dir: str, section: str = "") -> Iterator[dict]:
+    """Lazily yield metadata records for every page below a content section."""
+    for md_path in iter_page_paths(content_dir, section):
+        yield page_record(content_dir, md_path)
+
+
+def _spill_run(chunk: list, sort_key: Callable, reverse: bool, run_dir: str) -> str:
+    """Sort a chunk of records and write it to a JSON-lines run file."""
+    chunk.sort(key=sort_key, reverse=reverse)
+    fd, run_path = tempfile.mkstemp(suffix='.jsonl', dir=run_dir)
+    with os.fdopen(fd, 'w') as run_file:
+        for record in chunk:
+            run_file.write(json.dumps(record))
+            run_file.write('\n')
+    return run_path
+
+
+def _merge_runs(run_paths: list, sort_key: Callable, reverse: bool,
+                run_dir: tempfile.TemporaryDirectory) -> Iterator[dict]:
+    """Stream the k-way merge of sorted run files, then remove them."""
+    run_files = [open(run_path) for run_path in run_paths]
+    try:
+        streams = [map(json.loads, run_file) for run_file in run_files]
+        yield from heapq.merge(*streams, key=sort_key, reverse=reverse)
+    finally:
+        for run_file in run_files:
+            run_file.close()
+        run_dir.cleanup()
+
+
+def sort_records(records: Iterable[dict], key: str, reverse: bool = False,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET) -> tuple[int, Iterator[dict]]:
+    """
+    Sort metadata records by a field, spilling to disk past a memory budget.
+
+    Records are buffered until `memory_budget` of them are held, then the
+    buffer is sorted and written to a temporary run file. Once the input is
+    exhausted the runs are k-way merged lazily, so at most `memory_budget`
+    records (plus one per run) are ever in memory. Ties are broken by URL to
+    keep the output order deterministic.
+
+    Args:
+        records: Iterable of record dicts
+        key: Record field to sort on
+        reverse: Sort in descending order
+        memory_budget: Maximum number of records to hold in memory
+
+    Returns:
+        tuple[int, Iterator[dict]]: Total record count and the sorted records
+    """
+    if memory_budget < 1:
+        raise ValueError("memory_budget must be at least 1")
+
+    def sort_key(record):
+        return (record[key], record["url"])
+
+    count = 0
+    chunk = []
+    run_paths = []
+    run_dir = None
+
+    for record in records:
+        count += 1
+        chunk.append(record)
+        if len(chunk) >= memory_budget:
+            if run_dir is None:
+                run_dir = tempfile.TemporaryDirectory(prefix='ssg-sort-')
+            run_paths.append(_spill_run(chunk, sort_key, reverse, run_dir.name))
+            chunk = []
+
+    if run_dir is None:
+        # Everything fit in memory, no need to touch the disk
+        chunk.sort(key=sort_key, reverse=reverse)
+        return count, iter(chunk)
+
+    if chunk:
+        run_paths.append(_spill_run(chunk, sort_key, reverse, run_dir.name))
+
+    return count, _merge_runs(run_paths, sort_key, reverse, run_dir)
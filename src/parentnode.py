@@ -8,20 +8,25 @@ class ParentNode(HTMLNode):
         super().__init__(tag, None, children, props)
 
     def to_html(self):
+        return "".join(self.iter_html())
+
+    def iter_html(self, minifier=None, preserve_whitespace: bool = False):
         if not self.tag:
             raise ValueError("No tag provided to a ParentNode")
 
         if not self.children:
             raise ValueError("No children provided to a ParentNode")
 
-        children_string = ""
+        if minifier is not None and self.tag in minifier.preserve_tags:
+            preserve_whitespace = True
+
+        yield f"<{self.tag}{self.props_to_html()}>"
         for child in self.children:
             if type(child) != str:
-                children_string += child.to_html()
+                yield from child.iter_html(minifier, preserve_whitespace)
             else:
-                children_string += child
-
-        return f"<{self.tag}{self.props_to_html()}>{children_string}</{self.tag}>"
+                yield child
+        yield f"</{self.tag}>"
 
     def __str__(self):
         return self.to_html()
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from utils import render_content
+from walk import walk_tree
+
+# Bump whenever a change to the markdown renderer changes its output, so stale
+# entries from older builds are never served
+RENDER_CACHE_VERSION = 1
+
+
+class RenderCache:
+    """
+    On-disk cache of rendered page content, keyed on the markdown source.
+
+    Entries live under `<cache_dir>/<xx>/<sha256>.html`, where the hash covers
+    the renderer version and the markdown text, so an entry can never go stale
+    and the cache is shared by every stage that needs a page's HTML (page
+    generation, feeds, ...).
+
+    With `memory_entries`, the most recently used entries are also kept in
+    memory, so a long-lived process (see daemon.py) skips the disk as well.
+
+    Entries of edited pages, of transform variants no longer in use and of
+    old link graphs are never read again; `prune()` deletes every entry a
+    build did not use.
+    """
+
+    def __init__(self, cache_dir: str, memory_entries: int = 0):
+        self.cache_dir = Path(cache_dir)
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, markdown: str, variant: str = "") -> str:
+        digest = hashlib.sha256(f"{RENDER_CACHE_VERSION}\0{variant}\0".encode())
+        digest.update(markdown.encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.html"
+
+    def _remember(self, key: str, entry: str):
+        if self.memory_entries:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            if len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def get(self, markdown: str, variant: str = ""):
+        """Return the cached HTML for `markdown`, or None on a miss."""
+        key = self.key(markdown, variant)
+        self.used.add(key)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        try:
+            entry = self._entry_path(key).read_text()
+        except FileNotFoundError:
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def put(self, markdown: str, html: str, variant: str = ""):
+        """Store rendered HTML, atomically so concurrent builds never see half an entry."""
+        key = self.key(markdown, variant)
+        self.used.add(key)
+        self._remember(key, html)
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=entry_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(html)
+        os.replace(tmp_path, entry_path)
+
+    def prune(self) -> int:
+        """
+        Delete the disk entries not looked up or stored since the last prune.
+
+        Only call this after a build that rendered every page; a partial
+        build would delete the entries of the pages it left out.
+
+        Returns:
+            int: Number of entries deleted
+        """
+        pruned = 0
+        if self.cache_dir.is_dir():
+            for entry in walk_tree(self.cache_dir, ignore=('*.tmp',)):
+                if entry.is_dir or not entry.relative.endswith('.html'):
+                    continue
+                if Path(entry.relative).stem not in self.used:
+                    Path(entry.path).unlink(missing_ok=True)
+                    pruned += 1
+        self.used = set()
+        return pruned
+
+    def render(self, markdown: str, minifier=None, transforms=(), page_url: str = '/', guard=None) -> str:
+        """
+        Return the page content HTML for `markdown`, rendering it only on a miss.
+
+        Minified output is cached separately from plain output, with the number
+        of bytes minification saved on the entry's first line so a hit can
+        still credit it to the minifier. Output of page transforms is cached per
+        page URL and transform cache key, since both can change the result.
+        A miss is parsed through `guard` when one is given (see page_guard.py).
+        Pages over the guard's size budget are refused before the lookup, and
+        output is cached per time budget, so the cache never lets through a
+        page the guard would have stopped.
+        """
+        variant = "minified" if minifier is not None else ""
+        if transforms:
+            variant += "\0" + page_url + "".join(f"\0{transform.cache_key}" for transform in transforms)
+        if guard is not None:
+            guard.check_size(markdown)
+            if guard.cache_key:
+                variant += f"\0{guard.cache_key}"
+        entry = self.get(markdown, variant)
+        if entry is not None:
+            self.hits += 1
+            if minifier is None:
+                return entry
+            saved, _, html = entry.partition("\n")
+            minifier.saved += int(saved)
+            return html
+
+        self.misses += 1
+        if minifier is None:
+            html = render_content(markdown, None, transforms, page_url, guard)
+            self.put(markdown, html, variant)
+            return html
+
+        saved_before = minifier.saved
+        html = render_content(markdown, minifier, transforms, page_url, guard)
+        self.put(markdown, f"{minifier.saved - saved_before}\n{html}", variant)
+        return html
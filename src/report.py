@@ -0,0 +1,39 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+class BuildReport:
+    """
+    Per-stage statistics collected during a build.
+
+    Each stage records a flat dict of counters; `errors` collects messages
+    that should make the build fail (broken links, ...). The report is
+    written as JSON so CI can track it between builds.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.errors = []
+
+    def record(self, stage: str, **stats):
+        self.stages.setdefault(stage, {}).update(stats)
+
+    def error(self, message: str):
+        self.errors.append(message)
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.errors)
+
+    def to_dict(self) -> dict:
+        return {"stages": self.stages, "errors": self.errors}
+
+    def write(self, path: str):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as tmp_file:
+            json.dump(self.to_dict(), tmp_file, indent=2)
+        os.replace(tmp_path, path)
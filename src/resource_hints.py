@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import Counter
+from pathlib import Path
+from leafnode import LeafNode
+from link_check import collect_references, resolve_reference
+from utils import page_url
+from workers import parallel_map
+
+DEFAULT_PREFETCH_COUNT = 2
+LINK_GRAPH_VERSION = 1
+
+
+def is_page_url(path: str) -> bool:
+    return path.endswith('/') or path.endswith('.html')
+
+
+class ResourceHints:
+    """
+    Page transform (see utils.render_content) adding resource hints to the
+    top of each page's content:
+
+    - `<link rel="preload" as="image">` for the page's first image, which is
+      usually the largest thing above the fold, and is never loaded lazily;
+    - `<link rel="prefetch">` for up to `prefetch_count` of the internal
+      pages it links to, most linked-to pages across the site first.
+
+    References come from the nodes built by split_nodes_image and
+    split_nodes_link, so no extra parse is needed. The site-wide link graph
+    is only complete once every page has been rendered, so ranking uses the
+    graph saved by the previous build; `save()` stores this build's graph.
+    Preload and prefetch links are allowed in `<body>`, and living in the
+    content they are cached with it. Should be the last transform, so it
+    sees final (fingerprinted, inlined) URLs.
+    """
+
+    def __init__(self, graph_path: str, prefetch_count: int = DEFAULT_PREFETCH_COUNT):
+        self.graph_path = Path(graph_path)
+        self.prefetch_count = prefetch_count
+        self.previous = self._load()
+        self.graph = {}
+        self.preloads = 0
+        self.prefetches = 0
+        self.in_degree = Counter(target for targets in self.previous.values() for target in set(targets))
+        self.cache_key = f"hints:{prefetch_count}:" + hashlib.sha256(
+            json.dumps(sorted(self.in_degree.items())).encode()).hexdigest()
+
+    def _load(self) -> dict:
+        try:
+            state = json.loads(self.graph_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+        if state.get("version") != LINK_GRAPH_VERSION:
+            return {}
+        return state.get("pages", {})
+
+    def apply(self, html_node, page_url: str):
+        hero_image = None
+        targets = []
+        for node in html_node.walk():
+            if not node.props:
+                continue
+            if node.tag == "img" and hero_image is None:
+                src = node.props.get("src", "")
+                if not src.startswith("data:"):
+                    hero_image = src
+                    # A lazy image waits for layout, which defeats the preload
+                    if node.props.get("loading") == "lazy":
+                        del node.props["loading"]
+            elif node.tag == "a":
+                target = resolve_reference(page_url, node.props.get("href", ""))
+                if target is not None and target != page_url and is_page_url(target) and target not in targets:
+                    targets.append(target)
+        self.graph[page_url] = targets
+
+        hints = []
+        if hero_image is not None:
+            hints.append(LeafNode("link", "", None, {"rel": "preload", "as": "image", "href": hero_image}))
+            self.preloads += 1
+        # Stable sort, so pages unknown to the previous graph keep their order on the page
+        ranked = sorted(targets, key=lambda target: -self.in_degree[target])
+        for target in ranked[:self.prefetch_count]:
+            hints.append(LeafNode("link", "", None, {"rel": "prefetch", "href": target}))
+            self.prefetches += 1
+        html_node.children[:0] = hints
+
+    def apply_template(self, template: str) -> str:
+        return template
+
+    def save(self, page_urls, graph_path: str = None):
+        """
+        Store the link graph of every page in `page_urls`, in `graph_path`
+        or where the previous graph was loaded from.
+
+        Pages served from the render cache were not seen this build; their
+        content is unchanged, so their entries carry over from the last graph.
+        """
+        pages = {url: self.graph.get(url, self.previous.get(url, [])) for url in page_urls}
+        save_link_graph(graph_path if graph_path is not None else self.graph_path, pages)
+
+
+def collect_link_graph(content_dir: str, md_paths, workers: int = None) -> dict:
+    """
+    Return the link graph of the pages at `md_paths`, read from their
+    markdown, for builds that rank pages without ResourceHints recording
+    the graph while rendering.
+
+    Returns:
+        dict: {page URL: [linked page URLs]}, the format save_link_graph writes
+    """
+    jobs = ((str(content_dir), str(md_path)) for md_path in md_paths)
+    pages = {}
+    for source, references in parallel_map(collect_references, jobs, workers):
+        url = page_url(content_dir, source)
+        targets = []
+        for _, kind, target, _ in references:
+            if kind == "link" and target != url and is_page_url(target) and target not in targets:
+                targets.append(target)
+        pages[url] = targets
+    return pages
+
+
+def save_link_graph(graph_path: str, pages: dict):
+    """Atomically write a link graph of {page URL: [linked page URLs]}."""
+    graph_path = Path(graph_path)
+    graph_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=graph_path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w') as tmp_file:
+        json.dump({"version": LINK_GRAPH_VERSION, "pages": pages}, tmp_file)
+    os.replace(tmp_path, graph_path)
@@ -0,0 +1,225 @@
+import json
+import re
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, Iterator
+from textnode import TextNode, TextType
+from page_index import iter_page_paths
+from utils import (BlockType, block_to_block_type, extract_title, markdown_to_blocks,
+                   page_url, text_to_children, text_to_textnodes)
+from workers import parallel_map
+
+SEARCH_INDEX_VERSION = 1
+DEFAULT_PREFIX_LENGTH = 2
+# Postings held in memory before they are spilled to per-shard run files
+DEFAULT_POSTINGS_BUDGET = 1_000_000
+DOCS_PER_CHUNK = 1000
+MIN_TERM_LENGTH = 2
+TERM_PATTERN = re.compile(r"\w+")
+
+
+def page_text_nodes(markdown: str) -> Iterator[TextNode]:
+    """
+    Yield the inline text nodes of a page, as produced by text_to_textnodes.
+
+    Code blocks are skipped; they are mostly noise for full-text search.
+    Blocks with malformed inline markup are yielded as a single plain node.
+    """
+    for block in markdown_to_blocks(markdown):
+        block_type = block_to_block_type(block)
+        if block_type == BlockType.CODE:
+            continue
+        for item in text_to_children(block, block_type):
+            try:
+                yield from text_to_textnodes(item)
+            except Exception:
+                yield TextNode(item, TextType.NORMAL_TEXT)
+
+
+def extract_terms(markdown: str) -> list[str]:
+    """Return the sorted, de-duplicated search terms of a page."""
+    terms = set()
+    for node in page_text_nodes(markdown):
+        terms.update(term for term in TERM_PATTERN.findall(node.text.lower())
+                     if len(term) >= MIN_TERM_LENGTH)
+    return sorted(terms)
+
+
+def index_page(job: tuple) -> tuple:
+    """Worker task: return (url, title, terms) for one (content_dir, md_path) job."""
+    content_dir, md_path = job
+    markdown = Path(md_path).read_text()
+    return page_url(content_dir, md_path), extract_title(markdown), extract_terms(markdown)
+
+
+def shard_name(term: str, prefix_length: int = DEFAULT_PREFIX_LENGTH) -> str:
+    """
+    Return the shard a term lives in.
+
+    Shards are named after the term's first `prefix_length` characters. Non
+    ASCII prefixes are hex encoded so every shard name is safe in a URL.
+    """
+    prefix = term[:prefix_length]
+    if prefix.isascii():
+        return prefix
+    return 'x' + prefix.encode().hex()
+
+
+def delta_encode(doc_ids: list[int]) -> list[int]:
+    """Encode an ascending list of doc ids as gaps: [3, 5, 9] -> [3, 2, 4]."""
+    previous = 0
+    deltas = []
+    for doc_id in doc_ids:
+        deltas.append(doc_id - previous)
+        previous = doc_id
+    return deltas
+
+
+def delta_decode(deltas: list[int]) -> list[int]:
+    doc_ids = []
+    current = 0
+    for delta in deltas:
+        current += delta
+        doc_ids.append(current)
+    return doc_ids
+
+
+def _spill_postings(postings: dict, run_dir: Path, prefix_length: int):
+    """Append in-memory postings to the run file of each shard."""
+    by_shard = defaultdict(list)
+    for term, doc_ids in postings.items():
+        by_shard[shard_name(term, prefix_length)].append((term, doc_ids))
+
+    for shard, entries in by_shard.items():
+        with (run_dir / f'{shard}.jsonl').open('a') as run_file:
+            for entry in entries:
+                run_file.write(json.dumps(entry))
+                run_file.write('\n')
+
+
+def _write_shard(run_path: Path, shard_path: Path) -> int:
+    """
+    Merge a shard's spilled postings and write them delta encoded.
+
+    Runs were spilled in doc id order, so concatenating a term's lists in file
+    order keeps them ascending. Returns the number of terms in the shard.
+    """
+    merged = defaultdict(list)
+    with run_path.open() as run_file:
+        for line in run_file:
+            term, doc_ids = json.loads(line)
+            merged[term].extend(doc_ids)
+
+    shard = {term: delta_encode(merged[term]) for term in sorted(merged)}
+    shard_path.write_text(json.dumps(shard, separators=(',', ':')))
+    return len(shard)
+
+
+def build_search_index(dir_path_content: str, dest_dir_path: str, workers: int = None,
+                       prefix_length: int = DEFAULT_PREFIX_LENGTH,
+                       postings_budget: int = DEFAULT_POSTINGS_BUDGET) -> dict:
+    """
+    Build a prefix-sharded full-text search index under `<dest>/search/`.
+
+    Pages are tokenised in the worker pool and streamed back in order, so doc
+    ids are assigned deterministically; see write_search_index for the layout.
+
+    Args:
+        dir_path_content: Root content directory
+        dest_dir_path: Root output directory
+        workers: Number of worker processes, defaults to the CPU count
+        prefix_length: Number of leading term characters that pick the shard
+        postings_budget: Maximum number of postings held in memory
+
+    Returns:
+        dict: Counts of "documents", "terms" and "shards"
+    """
+    jobs = ((str(dir_path_content), str(md_path))
+            for md_path in iter_page_paths(dir_path_content, include_section_index=True))
+    return write_search_index(parallel_map(index_page, jobs, workers), dest_dir_path,
+                              prefix_length, postings_budget)
+
+
+def write_search_index(pages: Iterable[tuple], dest_dir_path: str,
+                       prefix_length: int = DEFAULT_PREFIX_LENGTH,
+                       postings_budget: int = DEFAULT_POSTINGS_BUDGET) -> dict:
+    """
+    Write a prefix-sharded full-text search index under `<dest>/search/`.
+
+    Layout:
+        manifest.json        version, prefix length, shard names, doc chunking
+        docs-<n>.json        [[url, title], ...] for doc ids n*DOCS_PER_CHUNK onwards
+        terms/<prefix>.json  {term: [delta-encoded doc ids]} for terms with that prefix
+
+    A browser looks up a query term by fetching only the shard named after the
+    term's prefix, then the doc chunks its hits fall into.
+
+    Doc ids follow the order of `pages`. Postings are spilled to per-shard run
+    files whenever `postings_budget` of them are held in memory, and each
+    shard is merged on its own at the end.
+
+    Args:
+        pages: (url, title, terms) per page, as returned by index_page
+        dest_dir_path: Root output directory
+        prefix_length: Number of leading term characters that pick the shard
+        postings_budget: Maximum number of postings held in memory
+
+    Returns:
+        dict: Counts of "documents", "terms" and "shards"
+    """
+    search_path = Path(dest_dir_path) / 'search'
+    (search_path / 'terms').mkdir(parents=True, exist_ok=True)
+
+    doc_count = 0
+    term_count = 0
+    postings = defaultdict(list)
+    held = 0
+    docs_chunk = []
+
+    def flush_docs():
+        chunk_number = (doc_count - 1) // DOCS_PER_CHUNK
+        (search_path / f'docs-{chunk_number}.json').write_text(
+            json.dumps(docs_chunk, separators=(',', ':')))
+
+    with tempfile.TemporaryDirectory(prefix='ssg-search-') as run_dir:
+        run_dir = Path(run_dir)
+
+        for url, title, terms in pages:
+            doc_id = doc_count
+            doc_count += 1
+            docs_chunk.append([url, title])
+            if len(docs_chunk) == DOCS_PER_CHUNK:
+                flush_docs()
+                docs_chunk = []
+
+            for term in terms:
+                postings[term].append(doc_id)
+            held += len(terms)
+            if held >= postings_budget:
+                _spill_postings(postings, run_dir, prefix_length)
+                postings.clear()
+                held = 0
+
+        if docs_chunk:
+            flush_docs()
+        if postings:
+            _spill_postings(postings, run_dir, prefix_length)
+            postings.clear()
+
+        shards = []
+        for run_path in sorted(run_dir.glob('*.jsonl')):
+            shard_path = search_path / 'terms' / f'{run_path.stem}.json'
+            term_count += _write_shard(run_path, shard_path)
+            shards.append(run_path.stem)
+
+    manifest = {
+        "version": SEARCH_INDEX_VERSION,
+        "prefix_length": prefix_length,
+        "documents": doc_count,
+        "docs_per_chunk": DOCS_PER_CHUNK,
+        "shards": shards,
+    }
+    (search_path / 'manifest.json').write_text(json.dumps(manifest, separators=(',', ':')))
+
+    return {"documents": doc_count, "terms": term_count, "shards": len(shards)}
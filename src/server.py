@@ -0,0 +1,453 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+from navigation import NavTree
+from sinks import PackReader
+from utils import load_template, render_page
+
+DEFAULT_PORT = 8888
+# Total bytes of file bodies kept in memory
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+# Larger files are never cached; they are streamed with sendfile instead
+DEFAULT_MAX_CACHED_FILE = 1024 * 1024
+# Rendered pages kept by the preview server
+DEFAULT_MAX_PREVIEW_PAGES = 1024
+
+
+class FileCache:
+    """
+    Thread-safe LRU cache of small file bodies, bounded by total size.
+
+    Entries are keyed on path and validated against the file's mtime and
+    size on every lookup, so a rebuild is picked up without a restart.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat: os.stat_result) -> bytes:
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+
+        with open(path, 'rb') as file:
+            body = file.read()
+
+        with self._lock:
+            self.misses += 1
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            if len(body) <= self.max_bytes:
+                self._entries[path] = (version, body)
+                self.size += len(body)
+                while self.size > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return body
+
+
+def make_etag(stat: os.stat_result, suffix: str = "") -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{suffix}"'
+
+
+def parse_range(header: str, size: int):
+    """
+    Parse a single-range `Range: bytes=...` header.
+
+    Returns:
+        tuple | None: Inclusive (start, end), or None for a header this server
+        does not handle (multiple ranges, other units), which is served as a
+        full response.
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return None
+    start, _, end = spec.strip().partition('-')
+    try:
+        if not start:
+            length = int(end)
+            if length <= 0:
+                raise ValueError("empty suffix range")
+            return max(0, size - length), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        raise ValueError(f"invalid range {header!r}")
+    if start >= size or start > end:
+        raise ValueError(f"unsatisfiable range {header!r}")
+    return start, min(end, size - 1)
+
+
+class StaticRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves a directory of built files.
+
+    Speaks HTTP/1.1 with keep-alive, answers conditional requests from the
+    ETag/Last-Modified validators, supports single byte ranges, sends a
+    precompressed `.gz` sibling to clients that accept gzip, serves small
+    files from the shared in-memory cache and streams large ones with
+    sendfile.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "SimpleStaticSite"
+    # Headers and body go out in separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_file(head_only=False)
+
+    def do_HEAD(self):
+        self.send_file(head_only=True)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def translate_path(self, url_path: str):
+        """Map a URL path to a file under the served root, refusing traversal."""
+        path = posixpath.normpath(unquote(urlsplit(url_path).path))
+        parts = [part for part in path.split('/') if part and part not in ('.', '..')]
+        return os.path.join(self.server.root, *parts)
+
+    def send_error_response(self, status: HTTPStatus, headers: dict = None):
+        body = f"{status.value} {status.phrase}\n".encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def not_modified(self, etag: str, mtime: float) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return if_none_match.strip() == '*' or etag in (tag.strip() for tag in if_none_match.split(','))
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def send_file(self, head_only: bool):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not urlsplit(self.path).path.endswith('/'):
+                self.send_error_response(HTTPStatus.MOVED_PERMANENTLY,
+                                         {"Location": urlsplit(self.path).path + '/'})
+                return
+            path = os.path.join(path, 'index.html')
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.send_error_response(HTTPStatus.NOT_FOUND)
+            return
+
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        headers = {"Vary": "Accept-Encoding"}
+        etag = make_etag(stat)
+
+        # Prefer a precompressed sibling for whole-file requests
+        if self.headers.get("Range") is None and 'gzip' in self.headers.get("Accept-Encoding", ""):
+            try:
+                gzip_stat = os.stat(path + '.gz')
+                path, stat = path + '.gz', gzip_stat
+                etag = make_etag(stat, '-gz')
+                headers["Content-Encoding"] = "gzip"
+            except OSError:
+                pass
+
+        def send_body(start, length):
+            if stat.st_size <= self.server.max_cached_file:
+                self.wfile.write(self.server.file_cache.get(path, stat)[start:start + length])
+            else:
+                self.wfile.flush()
+                with open(path, 'rb') as file:
+                    self.connection.sendfile(file, start, length)
+
+        self.send_resource(head_only, content_type, headers, etag, stat.st_mtime, stat.st_size, send_body)
+
+    def send_resource(self, head_only: bool, content_type: str, headers: dict, etag: str, mtime: float,
+                      size: int, send_body):
+        """
+        Answer a request for one resolved file: validators, conditional
+        requests and byte ranges. `send_body(start, length)` writes the bytes.
+        """
+        headers["ETag"] = etag
+        headers["Last-Modified"] = formatdate(mtime, usegmt=True)
+        headers["Cache-Control"] = "no-cache"
+        headers["Accept-Ranges"] = "bytes"
+
+        if self.not_modified(etag, mtime):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        status = HTTPStatus.OK
+        range_header = self.headers.get("Range")
+        start, end = 0, size - 1
+        if range_header is not None and size > 0:
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                self.send_error_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                                         {"Content-Range": f"bytes */{size}"})
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                status = HTTPStatus.PARTIAL_CONTENT
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        length = end - start + 1
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if head_only or length <= 0:
+            return
+        send_body(start, length)
+
+
+class StaticServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, root: str, cache_bytes: int = DEFAULT_CACHE_BYTES,
+                 max_cached_file: int = DEFAULT_MAX_CACHED_FILE, quiet: bool = False,
+                 handler_class=StaticRequestHandler):
+        self.root = str(Path(root).resolve())
+        self.file_cache = FileCache(cache_bytes)
+        self.max_cached_file = max_cached_file
+        self.quiet = quiet
+        super().__init__(address, handler_class)
+
+
+class PreviewRequestHandler(StaticRequestHandler):
+    """
+    Renders pages straight from content/ on request; anything that is not a
+    page is served from static/ as-is.
+    """
+
+    def send_file(self, head_only: bool):
+        url_path = unquote(urlsplit(self.path).path)
+        md_path = self.server.resolve_page(url_path)
+        if md_path is None:
+            if os.path.isdir(self.server.content_path(url_path)) and not url_path.endswith('/'):
+                self.send_error_response(HTTPStatus.MOVED_PERMANENTLY, {"Location": url_path + '/'})
+                return
+            super().send_file(head_only)
+            return
+
+        body, etag = self.server.render(md_path)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+
+class PreviewServer(StaticServer):
+    """
+    Development server that renders pages on demand instead of running a build.
+
+    A request maps to a single markdown file, which is rendered with the same
+    code as the build (`render_page`) on first request. The result is kept in
+    an LRU cache keyed on the page's mtime and size, its directory's mtime
+    (for the section navigation) and the template, so the cost of a request
+    depends on that one page, never on the size of the site.
+    """
+
+    def __init__(self, address, project_dir: str, max_pages: int = DEFAULT_MAX_PREVIEW_PAGES, **kwargs):
+        project_dir = Path(project_dir)
+        self.content_dir = str((project_dir / 'content').resolve())
+        self.template_path = str((project_dir / 'template.html').resolve())
+        self.max_pages = max_pages
+        self.renders = 0
+        self._pages = OrderedDict()
+        self._pages_lock = threading.Lock()
+        super().__init__(address, project_dir / 'static', handler_class=PreviewRequestHandler, **kwargs)
+
+    def content_path(self, url_path: str) -> str:
+        parts = [part for part in posixpath.normpath(url_path).split('/') if part and part not in ('.', '..')]
+        return os.path.join(self.content_dir, *parts)
+
+    def resolve_page(self, url_path: str):
+        """Map a page URL to its markdown source, or None if it is not a page."""
+        path = self.content_path(url_path)
+        if url_path.endswith('/'):
+            candidate = os.path.join(path, 'index.md')
+        elif url_path.endswith('.html'):
+            candidate = path[:-len('.html')] + '.md'
+        else:
+            return None
+        return candidate if os.path.isfile(candidate) else None
+
+    def section_nav(self, md_path: str):
+        """Build the navigation section for one page from its own directory only."""
+        section_dir = os.path.dirname(md_path)
+        relative_dir = Path(section_dir).relative_to(self.content_dir).as_posix()
+        paths = [posixpath.join(relative_dir, 'index.md')]
+        with os.scandir(section_dir) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.is_dir():
+                    paths.append(posixpath.join(relative_dir, entry.name, 'index.md'))
+                elif entry.name.endswith('.md'):
+                    paths.append(posixpath.join(relative_dir, entry.name))
+        return NavTree.from_paths(paths).section(relative_dir)
+
+    def render(self, md_path: str) -> tuple[bytes, str]:
+        stat = os.stat(md_path)
+        template = load_template(self.template_path)
+        key = (stat.st_mtime_ns, stat.st_size, os.stat(os.path.dirname(md_path)).st_mtime_ns,
+               hash(template))
+
+        with self._pages_lock:
+            entry = self._pages.get(md_path)
+            if entry is not None and entry[0] == key:
+                self._pages.move_to_end(md_path)
+                return entry[1], entry[2]
+
+        nav_section = None
+        if "{{ Nav }}" in template or "{{ Breadcrumbs }}" in template:
+            nav_section = self.section_nav(md_path)
+        document, _ = render_page(Path(md_path).read_text(), self.template_path, nav_section=nav_section)
+        body = document.encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+        with self._pages_lock:
+            self.renders += 1
+            self._pages[md_path] = (key, body, etag)
+            self._pages.move_to_end(md_path)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return body, etag
+
+
+class PackRequestHandler(StaticRequestHandler):
+    """Serves the files of a pack (see sinks.PackSink) by offset, without unpacking it."""
+
+    def send_file(self, head_only: bool):
+        pack = self.server.current_pack()
+        url_path = urlsplit(self.path).path
+        parts = [part for part in posixpath.normpath(unquote(url_path)).split('/')
+                 if part and part not in ('.', '..')]
+        name = '/'.join(parts)
+        if url_path.endswith('/'):
+            name = posixpath.join(name, 'index.html')
+        elif name not in pack and posixpath.join(name, 'index.html') in pack:
+            self.send_error_response(HTTPStatus.MOVED_PERMANENTLY, {"Location": url_path + '/'})
+            return
+        entry = pack.entry(name)
+        if entry is None:
+            self.send_error_response(HTTPStatus.NOT_FOUND)
+            return
+
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        headers = {"Vary": "Accept-Encoding"}
+        suffix = ""
+        if self.headers.get("Range") is None and 'gzip' in self.headers.get("Accept-Encoding", ""):
+            gzip_entry = pack.entry(name + '.gz')
+            if gzip_entry is not None:
+                name, entry, suffix = name + '.gz', gzip_entry, '-gz'
+                headers["Content-Encoding"] = "gzip"
+        offset, size, mtime = entry
+        # Offsets change whenever the pack is rebuilt with different contents
+        etag = f'"{pack.stat.st_mtime_ns:x}-{offset:x}-{size:x}{suffix}"'
+
+        def send_body(start, length):
+            if length <= self.server.max_cached_file:
+                self.wfile.write(pack.read(name, start, length))
+            else:
+                self.wfile.flush()
+                # From the pack the index came from, even if a rebuild has replaced it since
+                with os.fdopen(os.dup(pack.fileno()), 'rb') as file:
+                    self.connection.sendfile(file, offset + start, length)
+
+        self.send_resource(head_only, content_type, headers, etag, mtime, size, send_body)
+
+
+class PackServer(ThreadingHTTPServer):
+    """
+    Serves a site straight from a pack file built with `--output site.pack`.
+
+    The pack's index is loaded once; every request is a dictionary lookup and
+    a positioned read (or sendfile for large files) from the pack. A rebuilt
+    pack replaces the old one atomically and is picked up on the next request.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, pack_path: str, max_cached_file: int = DEFAULT_MAX_CACHED_FILE,
+                 quiet: bool = False, handler_class=PackRequestHandler):
+        self.pack_path = str(pack_path)
+        self.max_cached_file = max_cached_file
+        self.quiet = quiet
+        self._pack = PackReader(self.pack_path)
+        self._pack_lock = threading.Lock()
+        super().__init__(address, handler_class)
+
+    def current_pack(self) -> PackReader:
+        with self._pack_lock:
+            try:
+                stat = os.stat(self.pack_path)
+            except OSError:
+                return self._pack
+            if (stat.st_ino, stat.st_mtime_ns) != (self._pack.stat.st_ino, self._pack.stat.st_mtime_ns):
+                # The old reader closes once the requests still using it let go
+                self._pack = PackReader(self.pack_path)
+            return self._pack
+
+    def server_close(self):
+        super().server_close()
+        self._pack.close()
+
+
+def serve(root: str, host: str = '127.0.0.1', port: int = DEFAULT_PORT, server_class=StaticServer,
+          **kwargs):
+    """
+    Serve `root` (a directory, the project for a PreviewServer or a pack file
+    for a PackServer) until interrupted.
+    """
+    with server_class((host, port), root, **kwargs) as server:
+        print(f"Serving {root} on http://{host}:{server.server_address[1]}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from fingerprint import MANIFEST_NAME as ASSET_MANIFEST_NAME
+
+DEFAULT_PRECACHE_BUDGET = 2 * 1024 * 1024
+PRECACHE_MANIFEST_NAME = 'precache-manifest.json'
+SERVICE_WORKER_NAME = 'sw.js'
+PRECACHE_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.svg')
+REGISTRATION_SCRIPT = (f"<script>if ('serviceWorker' in navigator) "
+                       f"navigator.serviceWorker.register('/{SERVICE_WORKER_NAME}');</script>")
+BODY_END = re.compile(r'</body>', re.IGNORECASE)
+
+SERVICE_WORKER_SCRIPT = """\
+// Generated by the site build. Precaches the entries of /%(manifest)s into a
+// cache per manifest version, copying unchanged entries from the installed
+// version and re-downloading only those whose content hash changed. The
+// version below changes with the manifest, so browsers install each new build.
+const VERSION = '%(version)s';
+const CACHE = 'precache-' + VERSION;
+const HASHES = '/__precache-hashes';
+
+function isPrecache(name) {
+  return name === 'precache' || name.startsWith('precache-');
+}
+
+self.addEventListener('install', (event) => {
+  event.waitUntil((async () => {
+    const manifest = await (await fetch('/%(manifest)s?v=' + VERSION, {cache: 'no-store'})).json();
+    const cache = await caches.open(CACHE);
+    const previous = [];
+    for (const name of (await caches.keys()).filter((name) => isPrecache(name) && name !== CACHE)) {
+      const old = await caches.open(name);
+      const stored = await old.match(HASHES);
+      previous.push([old, stored ? await stored.json() : {}]);
+    }
+    const hashes = {};
+    await Promise.all(manifest.entries.map(async (entry) => {
+      hashes[entry.url] = entry.hash;
+      for (const [old, oldHashes] of previous) {
+        const response = oldHashes[entry.url] === entry.hash && await old.match(entry.url);
+        if (response) {
+          await cache.put(entry.url, response);
+          return;
+        }
+      }
+      const response = await fetch(entry.url, {cache: 'no-store'});
+      if (response.ok) {
+        await cache.put(entry.url, response);
+      }
+    }));
+    await cache.put(HASHES, new Response(JSON.stringify(hashes)));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', (event) => {
+  // Drop earlier versions, and with them every entry the new manifest no longer lists
+  event.waitUntil((async () => {
+    const names = await caches.keys();
+    await Promise.all(names.filter((name) => isPrecache(name) && name !== CACHE)
+                           .map((name) => caches.delete(name)));
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener('fetch', (event) => {
+  const url = new URL(event.request.url);
+  if (event.request.method !== 'GET' || url.origin !== self.location.origin) {
+    return;
+  }
+  event.respondWith((async () => {
+    const cached = await caches.match(url.pathname, {cacheName: CACHE});
+    if (cached) {
+      return cached;
+    }
+    return fetch(event.request);
+  })());
+});
+"""
+
+
+def page_file(public_dir: Path, url: str) -> Path:
+    """Return the output file behind a page URL (`/blog/` -> `blog/index.html`)."""
+    relative = url.lstrip('/')
+    return public_dir / (relative + 'index.html' if url.endswith('/') else relative)
+
+
+def load_page_ranking(graph_path) -> list:
+    """
+    Return page URLs ordered by how many pages link to them, most first,
+    from the link graph saved by resource_hints.ResourceHints, or built by
+    resource_hints.collect_link_graph when hints are off.
+    """
+    try:
+        pages = json.loads(Path(graph_path).read_text()).get("pages", {})
+    except (FileNotFoundError, ValueError):
+        return []
+    in_degree = Counter(target for targets in pages.values() for target in set(targets))
+    return sorted(in_degree, key=lambda url: (-in_degree[url], url))
+
+
+def precache_entries(public_dir: str, page_urls, page_ranking=(), budget: int = DEFAULT_PRECACHE_BUDGET) -> list:
+    """
+    Choose the outputs worth precaching, within `budget` bytes in total.
+
+    Stylesheets come first, then pages (the home page, then the most
+    linked-to), then images, smallest first. Entries that would exceed the
+    budget are skipped in favour of smaller ones further down.
+
+    Args:
+        public_dir: Output directory of the finished build
+        page_urls: URLs of every page the build produced
+        page_ranking: Page URLs ordered by popularity, e.g. from load_page_ranking
+        budget: Maximum total size of precached files in bytes
+
+    Returns:
+        list: Entries of {"url", "hash", "size"}
+    """
+    public_path = Path(public_dir)
+    # Pages load the fingerprinted copies of assets, so their originals are not worth precaching
+    try:
+        fingerprinted = set(json.loads((public_path / ASSET_MANIFEST_NAME).read_text()))
+    except (FileNotFoundError, ValueError):
+        fingerprinted = set()
+    stylesheets = []
+    images = []
+    for dir_path, _, file_names in os.walk(public_path):
+        for file_name in sorted(file_names):
+            path = Path(dir_path) / file_name
+            url = '/' + path.relative_to(public_path).as_posix()
+            if url in fingerprinted:
+                continue
+            if file_name.endswith('.css'):
+                stylesheets.append((url, path))
+            elif file_name.lower().endswith(PRECACHE_IMAGE_EXTENSIONS):
+                images.append((url, path))
+    images.sort(key=lambda image: (image[1].stat().st_size, image[0]))
+
+    page_urls = set(page_urls)
+    ranked_pages = ['/'] if '/' in page_urls else []
+    ranked_pages += [url for url in page_ranking if url in page_urls and url != '/']
+    pages = [(url, page_file(public_path, url)) for url in ranked_pages]
+
+    entries = []
+    total = 0
+    for url, path in stylesheets + pages + images:
+        size = path.stat().st_size
+        if total + size > budget:
+            continue
+        total += size
+        entries.append({"url": url, "hash": hashlib.sha256(path.read_bytes()).hexdigest()[:16], "size": size})
+    return entries
+
+
+def write_service_worker(public_dir: str, entries: list) -> dict:
+    """
+    Write the precache manifest and the service worker script.
+
+    The script embeds the manifest version, so it changes whenever a
+    precached file does and browsers install the new build.
+
+    Returns:
+        dict: Number of precached "entries" and their total "bytes"
+    """
+    public_path = Path(public_dir)
+    version = hashlib.sha256(json.dumps(entries, sort_keys=True).encode()).hexdigest()[:16]
+    (public_path / PRECACHE_MANIFEST_NAME).write_text(
+        json.dumps({"version": version, "entries": entries}, indent=2))
+    (public_path / SERVICE_WORKER_NAME).write_text(
+        SERVICE_WORKER_SCRIPT % {"manifest": PRECACHE_MANIFEST_NAME, "version": version})
+    return {"entries": len(entries), "bytes": sum(entry["size"] for entry in entries)}
+
+
+class ServiceWorkerRegistration:
+    """Page transform (see utils.render_content) registering /sw.js from every page."""
+
+    cache_key = "service-worker"
+
+    def apply(self, html_node, page_url: str):
+        pass
+
+    def apply_template(self, template: str) -> str:
+        if BODY_END.search(template):
+            return BODY_END.sub(lambda match: REGISTRATION_SCRIPT + match.group(0), template, count=1)
+        return template + REGISTRATION_SCRIPT
@@ -0,0 +1,214 @@
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import shutil
+from pathlib import Path
+from link_check import BrokenReference, is_known_output
+from page_index import iter_page_paths
+from search_index import index_page
+from workers import parallel_map
+
+SHARD_FORMAT_VERSION = 1
+# Per-shard build data lives here, inside the shard's output directory
+SHARD_DATA_DIR = '.shard'
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse an `I/N` command line value, with shards numbered from 1."""
+    index, _, count = value.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard {value!r}, expected I/N")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard {value!r}, I must be between 1 and N")
+    return index, count
+
+
+def partition_pages(content_dir: str, count: int) -> dict:
+    """
+    Deterministically assign every page to one of `count` shards.
+
+    Pages are taken largest first, using file size as the cost of rendering
+    them, and each goes to the shard with the least total size so far. Pages
+    of equal size are ordered by a hash of their path, and shards of equal
+    load by number, so every machine computes the same partition from the
+    same content tree, whatever order its file system lists files in.
+
+    Returns:
+        dict: Maps each page's path relative to `content_dir` to its shard number
+    """
+    pages = []
+    for md_path in iter_page_paths(content_dir, include_section_index=True):
+        relative = md_path.relative_to(content_dir).as_posix()
+        digest = hashlib.sha256(relative.encode()).hexdigest()
+        pages.append((-max(md_path.stat().st_size, 1), digest, relative))
+    pages.sort()
+
+    loads = [(0, shard) for shard in range(1, count + 1)]
+    assignment = {}
+    for negative_size, _, relative in pages:
+        load, shard = heapq.heappop(loads)
+        assignment[relative] = shard
+        heapq.heappush(loads, (load - negative_size, shard))
+    return assignment
+
+
+def partition_key(assignment: dict) -> str:
+    """Hash of a partition, which every shard of one build must agree on."""
+    return hashlib.sha256(json.dumps(sorted(assignment.items())).encode()).hexdigest()
+
+
+def shard_pages(content_dir: str, shard: tuple[int, int]) -> tuple[str, list]:
+    """
+    Return the partition key and the markdown paths one shard renders, in
+    site order (the order of iter_page_paths), each with its site position.
+    """
+    index, count = shard
+    assignment = partition_pages(content_dir, count)
+    pages = [(position, md_path) for position, md_path
+             in enumerate(iter_page_paths(content_dir, include_section_index=True))
+             if assignment[md_path.relative_to(content_dir).as_posix()] == index]
+    return partition_key(assignment), pages
+
+
+def write_shard_search_records(content_dir: str, pages: list, shard_data: Path, workers: int = None) -> int:
+    """Tokenise a shard's pages for the search index, to be indexed at merge time."""
+    jobs = ((str(content_dir), str(md_path)) for _, md_path in pages)
+    with (shard_data / 'search.jsonl').open('w') as records_file:
+        for (position, _), record in zip(pages, parallel_map(index_page, jobs, workers)):
+            records_file.write(json.dumps([position, *record]))
+            records_file.write('\n')
+    return len(pages)
+
+
+def write_shard_manifest(public_dir: str, shard: tuple[int, int], key: str, **stages) -> dict:
+    """
+    Record what a shard built: its number, the partition it followed, the
+    stages left for the merge, and a content hash of every output file.
+    """
+    public_path = Path(public_dir)
+    files = {}
+    for dir_path, dir_names, file_names in os.walk(public_path):
+        if Path(dir_path) == public_path and SHARD_DATA_DIR in dir_names:
+            dir_names.remove(SHARD_DATA_DIR)
+        for file_name in file_names:
+            path = Path(dir_path) / file_name
+            files[path.relative_to(public_path).as_posix()] = hashlib.sha256(path.read_bytes()).hexdigest()
+
+    manifest = {
+        "version": SHARD_FORMAT_VERSION,
+        "shard": list(shard),
+        "partition": key,
+        "stages": stages,
+        "files": dict(sorted(files.items())),
+    }
+    (public_path / SHARD_DATA_DIR / 'manifest.json').write_text(json.dumps(manifest, indent=1))
+    return manifest
+
+
+def load_shard_manifests(shard_dirs) -> list:
+    """
+    Load and validate the manifests of a complete set of shards.
+
+    Raises ValueError unless the shards share one partition and cover every
+    shard number exactly once. Returns (shard dir, manifest) pairs in shard
+    order.
+    """
+    shards = []
+    for shard_dir in shard_dirs:
+        manifest_path = Path(shard_dir) / SHARD_DATA_DIR / 'manifest.json'
+        try:
+            manifest = json.loads(manifest_path.read_text())
+        except FileNotFoundError:
+            raise ValueError(f"{shard_dir} is not a shard build (missing {manifest_path})")
+        if manifest.get("version") != SHARD_FORMAT_VERSION:
+            raise ValueError(f"{shard_dir} was built by an incompatible version")
+        shards.append((Path(shard_dir), manifest))
+    if not shards:
+        raise ValueError("no shards to merge")
+
+    shards.sort(key=lambda shard: shard[1]["shard"][0])
+    count = shards[0][1]["shard"][1]
+    numbers = [manifest["shard"] for _, manifest in shards]
+    if numbers != [[index, count] for index in range(1, count + 1)]:
+        raise ValueError(f"expected shards 1/{count} to {count}/{count}, got "
+                         + ", ".join(f"{index}/{total}" for index, total in numbers))
+    if len({manifest["partition"] for _, manifest in shards}) != 1:
+        raise ValueError("shards were built from different content trees")
+    return shards
+
+
+def merge_shard_outputs(shards: list, dest_dir: str) -> int:
+    """
+    Copy every shard's output files into `dest_dir`.
+
+    Files several shards wrote (static files, ...) must be identical.
+    Returns the number of files copied.
+    """
+    dest_path = Path(dest_dir)
+    owners = {}
+    for shard_dir, manifest in shards:
+        index = manifest["shard"][0]
+        for relative, digest in manifest["files"].items():
+            if relative in owners:
+                owner, owner_digest = owners[relative]
+                if digest != owner_digest:
+                    raise ValueError(f"{relative} differs between shards {owner} and {index}")
+                continue
+            owners[relative] = (index, digest)
+            target = dest_path / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(shard_dir / relative, target)
+    return len(owners)
+
+
+def iter_merged_search_records(shards: list):
+    """Yield (url, title, terms) for every shard's pages, back in site order."""
+    def records(shard_dir):
+        with (shard_dir / SHARD_DATA_DIR / 'search.jsonl').open() as records_file:
+            for line in records_file:
+                yield json.loads(line)
+
+    for _, url, title, terms in heapq.merge(*(records(shard_dir) for shard_dir, _ in shards)):
+        yield url, title, terms
+
+
+def merged_output_index(shards: list) -> set:
+    """Return the URL paths of every merged output file, and of directories with an index page."""
+    index = set()
+    for _, manifest in shards:
+        for relative in manifest["files"]:
+            index.add('/' + relative)
+            if relative == 'index.html' or relative.endswith('/index.html'):
+                index.add('/' + relative[:-len('index.html')])
+    return index
+
+
+def merged_broken_references(shards: list, output_index: set, content_dir: str) -> list[BrokenReference]:
+    """
+    Return references the shards could not resolve that the merged output
+    does not provide either. Shards record sources relative to their content
+    directory; they are reported below `content_dir`.
+    """
+    broken = []
+    for shard_dir, _ in shards:
+        links_path = shard_dir / SHARD_DATA_DIR / 'links.json'
+        if not links_path.exists():
+            continue
+        for source, line, kind, url, resolved in json.loads(links_path.read_text()):
+            if not is_known_output(resolved, output_index):
+                broken.append(BrokenReference(str(Path(content_dir) / source), line, kind, url))
+    return sorted(broken)
+
+
+def merged_link_graph(shards: list) -> dict:
+    """Combine the link graph portions the shards saved, see resource_hints.ResourceHints."""
+    pages = {}
+    for shard_dir, _ in shards:
+        graph_path = shard_dir / SHARD_DATA_DIR / 'link-graph.json'
+        if graph_path.exists():
+            pages.update(json.loads(graph_path.read_text())["pages"])
+    return pages
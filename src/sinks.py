@@ -0,0 +1,499 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import struct
+import tarfile
+import tempfile
+import time
+import zipfile
+from pathlib import Path, PurePosixPath
+from stat import S_IFLNK, S_ISREG
+
+PACK_MAGIC = b'SSGPACK1'
+PACK_FORMAT_VERSION = 1
+# Index offset, index length, magic
+PACK_TRAILER = struct.Struct('<QQ8s')
+ARCHIVE_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.zip', '.pack')
+# Already compressed; deflating them again only costs time
+STORED_EXTENSIONS = frozenset({'.png', '.jpg', '.jpeg', '.gif', '.webp', '.gz', '.zst', '.woff', '.woff2'})
+
+
+class OutputSink:
+    """
+    Destination of a build's output files.
+
+    Paths are POSIX paths relative to the site root. Writing the same path
+    twice replaces the earlier file in a directory; archives are streamed
+    and cannot take a member back, so they reject the second write with a
+    ValueError. Sinks are context managers; archives are only complete, and
+    appear under their final name, once closed.
+
+    Every file's size and SHA-256 are recorded in `hashes` as it passes
+    through, for the deploy manifest (see deploy.py). Symlinks a sink cannot
+    hold are left out and listed in `skipped`.
+    """
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.hashes = {}
+        self.skipped = []
+
+    def write(self, path: str, data: bytes):
+        raise NotImplementedError
+
+    def copy(self, path: str, source_path: str):
+        """Add the file at `source_path` as `path`, keeping its modification time."""
+        raise NotImplementedError
+
+    def location(self, path: str) -> str:
+        """Describe where `path` ends up, for reports."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def abort(self):
+        """Discard an unfinished output."""
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _record(self, path: str, size: int, digest: str, mtime_ns: int = None):
+        """Count a file and remember its hash; `mtime_ns` lets directories tell later edits apart."""
+        self.files += 1
+        self.bytes += size
+        if digest is not None:
+            self.hashes[PurePosixPath(path).as_posix()] = (size, digest, mtime_ns)
+
+    def _record_link(self, path: str, source_path: str):
+        # A link is published as the file it points to; dangling links as nothing
+        if os.path.isfile(source_path):
+            self._record(path, os.path.getsize(source_path), _file_digest(source_path))
+        else:
+            self._record(path, 0, None)
+
+
+class DirectorySink(OutputSink):
+    """Writes loose files below `root`, the layout of `public/`."""
+
+    def __init__(self, root: str):
+        super().__init__()
+        self.root = Path(root)
+
+    def location(self, path: str) -> str:
+        return str(self.root / path)
+
+    def write(self, path: str, data: bytes):
+        dest_path = self.root / path
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        dest_path.write_bytes(data)
+        self._record(path, len(data), hashlib.sha256(data).hexdigest(), dest_path.stat().st_mtime_ns)
+
+    def copy(self, path: str, source_path: str):
+        dest_path = self.root / path
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        # Replace what a previous build left here, rather than write through a link
+        if os.path.islink(dest_path) or (os.path.islink(source_path) and os.path.lexists(dest_path)):
+            dest_path.unlink()
+        # Preserve symlinks, as copy_from_to_dir always has
+        if os.path.islink(source_path):
+            os.symlink(os.readlink(source_path), dest_path)
+            self._record_link(path, source_path)
+            return
+        with open(source_path, 'rb') as source_file, dest_path.open('wb') as dest_file:
+            reader = _HashingReader(source_file)
+            shutil.copyfileobj(reader, dest_file)
+        shutil.copystat(source_path, dest_path)
+        self._record(path, reader.size, reader.hexdigest(), dest_path.stat().st_mtime_ns)
+
+
+class ChangedFilesSink(DirectorySink):
+    """
+    Writes below `root` only the files whose bytes differ from what is
+    already there, so unchanged files keep their modification time and
+    rsync or an uploader can skip them.
+
+    Existing files are compared by size, then by hash. Changed files are
+    written to a temporary file and renamed over the old one, so a server
+    never sees a half-written file. Closing removes the files under `root`
+    that this build did not write.
+    """
+
+    def __init__(self, root: str):
+        super().__init__(root)
+        self.unchanged = 0
+        self.changed = 0
+        self.removed = 0
+        self.bytes_written = 0
+        self._written = set()
+
+    def _replace(self, dest_path: Path, fill):
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dest_path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                fill(tmp_file, tmp_path)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def write(self, path: str, data: bytes):
+        self._written.add(PurePosixPath(path).as_posix())
+        dest_path = self.root / path
+        digest = hashlib.sha256(data).hexdigest()
+        if _same_size(dest_path, len(data)) and _file_digest(dest_path) == digest:
+            self.unchanged += 1
+        else:
+            def fill(tmp_file, tmp_path):
+                tmp_file.write(data)
+                os.chmod(tmp_path, 0o644)
+
+            self._replace(dest_path, fill)
+            self.changed += 1
+            self.bytes_written += len(data)
+        self._record(path, len(data), digest, dest_path.stat().st_mtime_ns)
+
+    def copy(self, path: str, source_path: str):
+        self._written.add(PurePosixPath(path).as_posix())
+        dest_path = self.root / path
+        if os.path.islink(source_path):
+            target = os.readlink(source_path)
+            self._record_link(path, source_path)
+            if os.path.islink(dest_path) and os.readlink(dest_path) == target:
+                self.unchanged += 1
+                return
+            if os.path.lexists(dest_path):
+                os.unlink(dest_path)
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            os.symlink(target, dest_path)
+            self.changed += 1
+            return
+
+        size = os.path.getsize(source_path)
+        digest = None
+        if _same_size(dest_path, size):
+            digest = _file_digest(source_path)
+            if _file_digest(dest_path) == digest:
+                self.unchanged += 1
+                self._record(path, size, digest, dest_path.stat().st_mtime_ns)
+                return
+
+        def fill(tmp_file, tmp_path):
+            nonlocal digest
+            with open(source_path, 'rb') as source_file:
+                reader = _HashingReader(source_file)
+                shutil.copyfileobj(reader, tmp_file)
+            tmp_file.flush()
+            shutil.copystat(source_path, tmp_path)
+            digest = reader.hexdigest()
+
+        self._replace(dest_path, fill)
+        self.changed += 1
+        self.bytes_written += size
+        self._record(path, size, digest, dest_path.stat().st_mtime_ns)
+
+    def close(self):
+        """Remove files left over from earlier builds, and directories they leave empty."""
+        for dir_path, dir_names, file_names in os.walk(self.root, topdown=False):
+            for name in file_names + [name for name in dir_names if os.path.islink(os.path.join(dir_path, name))]:
+                path = Path(dir_path) / name
+                if path.relative_to(self.root).as_posix() not in self._written:
+                    path.unlink()
+                    self.removed += 1
+            if Path(dir_path) != self.root and not os.listdir(dir_path):
+                os.rmdir(dir_path)
+
+    def abort(self):
+        """Leave the files of earlier builds in place; only a complete build replaces them."""
+
+    def stats(self) -> dict:
+        return {"unchanged": self.unchanged, "changed": self.changed, "removed": self.removed,
+                "bytes_written": self.bytes_written}
+
+
+def _same_size(path: Path, size: int) -> bool:
+    """Whether `path` is a regular file (not a symlink) of `size` bytes."""
+    try:
+        stat = os.lstat(path)
+    except FileNotFoundError:
+        return False
+    return S_ISREG(stat.st_mode) and stat.st_size == size
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _HashingReader:
+    """Read-only file wrapper that hashes what is read through it."""
+
+    def __init__(self, file):
+        self._file = file
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._file.read(size)
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+class _ArchiveSink(OutputSink):
+    """An archive written to a temporary file and renamed into place when closed."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._paths = set()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.mtime = time.time()
+        fd, self._tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+        self._file = os.fdopen(fd, 'wb')
+
+    def location(self, path: str) -> str:
+        return f"{self.path}:{path}"
+
+    def _claim(self, path: str):
+        """Reserve `path`, which a streamed archive can hold only once."""
+        path = PurePosixPath(path).as_posix()
+        if path in self._paths:
+            raise ValueError(f"{path} is already in {self.path}")
+        self._paths.add(path)
+
+    def _finish(self):
+        pass
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._finish()
+        self._file.close()
+        os.chmod(self._tmp_path, 0o644)
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if not self._file.closed:
+            # Finish the tar or zip writer too, or it finishes into the
+            # closed file when garbage collected
+            try:
+                self._finish()
+            except (OSError, ValueError, tarfile.TarError):
+                pass
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+
+
+class TarSink(_ArchiveSink):
+    """Streams files into a tar archive, gzip-compressed for `.tar.gz`/`.tgz` paths."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        compressed = self.path.name.endswith(('.tar.gz', '.tgz'))
+        self._tar = tarfile.open(fileobj=self._file, mode='w|gz' if compressed else 'w|')
+
+    def write(self, path: str, data: bytes):
+        self._claim(path)
+        info = tarfile.TarInfo(path)
+        info.size = len(data)
+        info.mtime = self.mtime
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(data))
+        self._record(path, len(data), hashlib.sha256(data).hexdigest())
+
+    def copy(self, path: str, source_path: str):
+        self._claim(path)
+        info = self._tar.gettarinfo(source_path, arcname=path)
+        if info.isreg():
+            with open(source_path, 'rb') as source_file:
+                reader = _HashingReader(source_file)
+                self._tar.addfile(info, reader)
+            self._record(path, reader.size, reader.hexdigest())
+        else:
+            self._tar.addfile(info)
+            self._record_link(path, source_path)
+
+    def _finish(self):
+        self._tar.close()
+
+
+class ZipSink(_ArchiveSink):
+    """Streams files into a zip archive, deflating all but already compressed formats."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._zip = zipfile.ZipFile(self._file, 'w')
+
+    @staticmethod
+    def _compression(path: str) -> int:
+        return zipfile.ZIP_STORED if PurePosixPath(path).suffix in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+    def write(self, path: str, data: bytes):
+        self._claim(path)
+        info = zipfile.ZipInfo(path, time.localtime(self.mtime)[:6])
+        info.external_attr = 0o644 << 16
+        info.compress_type = self._compression(path)
+        self._zip.writestr(info, data)
+        self._record(path, len(data), hashlib.sha256(data).hexdigest())
+
+    def copy(self, path: str, source_path: str):
+        self._claim(path)
+        if os.path.islink(source_path):
+            # Stored the Info-ZIP way: a Unix link mode, with the target as the data
+            info = zipfile.ZipInfo(path, time.localtime(os.lstat(source_path).st_mtime)[:6])
+            info.create_system = 3
+            info.external_attr = (S_IFLNK | 0o777) << 16
+            self._zip.writestr(info, os.readlink(source_path))
+            self._record_link(path, source_path)
+            return
+        info = zipfile.ZipInfo.from_file(source_path, path)
+        info.compress_type = self._compression(path)
+        with open(source_path, 'rb') as source_file, self._zip.open(info, 'w') as dest_file:
+            reader = _HashingReader(source_file)
+            shutil.copyfileobj(reader, dest_file)
+        self._record(path, reader.size, reader.hexdigest())
+
+    def _finish(self):
+        self._zip.close()
+
+
+class PackSink(_ArchiveSink):
+    """
+    Writes the pack format: every file's bytes back to back, followed by a
+    JSON index of {path: [offset, length, mtime]} and a fixed-size trailer
+    locating the index. A reader (PackReader) opens a pack with two reads
+    and serves any file with one positioned read or sendfile.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file.write(PACK_MAGIC)
+        self.index = {}
+
+    def write(self, path: str, data: bytes):
+        self._claim(path)
+        self.index[path] = [self._file.tell(), len(data), int(self.mtime)]
+        self._file.write(data)
+        self._record(path, len(data), hashlib.sha256(data).hexdigest())
+
+    def copy(self, path: str, source_path: str):
+        self._claim(path)
+        # A pack holds only file contents: a link is stored as the file it
+        # points to, and a dangling one is left out
+        if os.path.islink(source_path) and not os.path.isfile(source_path):
+            self.skipped.append(path)
+            return
+        offset = self._file.tell()
+        with open(source_path, 'rb') as source_file:
+            reader = _HashingReader(source_file)
+            shutil.copyfileobj(reader, self._file)
+        self.index[path] = [offset, reader.size, int(os.stat(source_path).st_mtime)]
+        self._record(path, reader.size, reader.hexdigest())
+
+    def _finish(self):
+        index = json.dumps({"version": PACK_FORMAT_VERSION, "files": self.index},
+                           separators=(',', ':')).encode()
+        index_offset = self._file.tell()
+        self._file.write(index)
+        self._file.write(PACK_TRAILER.pack(index_offset, len(index), PACK_MAGIC))
+
+
+class PackReader:
+    """
+    Random access to the files of a pack written by PackSink.
+
+    Reads use os.pread on one descriptor, so a reader can be shared between
+    threads.
+
+    Raises:
+        ValueError: If `path` is not a pack this version can read
+    """
+
+    _fd = None
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._fd = os.open(self.path, os.O_RDONLY)
+        try:
+            self.stat = os.fstat(self._fd)
+            if self.stat.st_size < len(PACK_MAGIC) + PACK_TRAILER.size:
+                raise ValueError(f"{path} is not a pack")
+            trailer = os.pread(self._fd, PACK_TRAILER.size, self.stat.st_size - PACK_TRAILER.size)
+            index_offset, index_length, magic = PACK_TRAILER.unpack(trailer)
+            if magic != PACK_MAGIC:
+                raise ValueError(f"{path} is not a pack")
+            index = json.loads(os.pread(self._fd, index_length, index_offset))
+            if index.get("version") != PACK_FORMAT_VERSION:
+                raise ValueError(f"{path} was written by an incompatible version")
+        except BaseException:
+            self.close()
+            raise
+        self.files = index["files"]
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.files
+
+    def entry(self, path: str):
+        """Return (offset, length, mtime) of `path`, or None if the pack has no such file."""
+        entry = self.files.get(path)
+        return tuple(entry) if entry is not None else None
+
+    def read(self, path: str, start: int = 0, length: int = None) -> bytes:
+        offset, size, _ = self.files[path]
+        if length is None:
+            length = size - start
+        return os.pread(self._fd, length, offset + start)
+
+    def fileno(self) -> int:
+        """The descriptor of the pack this reader opened, which a replaced pack does not change."""
+        return self._fd
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        self.close()
+
+
+def open_sink(path: str) -> OutputSink:
+    """
+    Return the archive sink for an output path, chosen by its extension.
+
+    Raises:
+        ValueError: If the extension is not one of ARCHIVE_EXTENSIONS
+    """
+    name = Path(path).name
+    if name.endswith(('.tar', '.tar.gz', '.tgz')):
+        return TarSink(path)
+    if name.endswith('.zip'):
+        return ZipSink(path)
+    if name.endswith('.pack'):
+        return PackSink(path)
+    raise ValueError(f"unknown output format for {path}, expected one of {', '.join(ARCHIVE_EXTENSIONS)}")
+
+
+def as_sink(dest) -> OutputSink:
+    """Return `dest` if it is a sink, or a DirectorySink for a directory path."""
+    return dest if isinstance(dest, OutputSink) else DirectorySink(dest)
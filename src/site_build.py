@@ -0,0 +1,46 @@
+from collections.abc import Mapping
+from navigation import NavTree
+from minify import Minifier
+from utils import render_pages
+from walk import DEFAULT_IGNORE, is_ignored
+
+
+def build(sources: Mapping[str, str], template: str, static: Mapping[str, bytes] = None, cache=None,
+          minify: bool = False, transforms=(), ignore=DEFAULT_IGNORE) -> dict[str, bytes]:
+    """
+    Build a site in memory: markdown in, published files out.
+
+    This is the page generation of `main.main()` without the file system:
+    the same renderer, template handling and navigation, so serverless
+    renderers and tests can build whole sites without a project directory.
+
+    Args:
+        sources: Page markdown keyed by POSIX path relative to the content
+            root (`index.md`, `majesty/rings.md`); keys not ending in `.md`
+            are ignored
+        template: Page template text
+        static: Files published as they are, keyed by path relative to the
+            site root, like the contents of `static/`
+        cache (RenderCache, optional): Render cache to reuse page content from
+        minify: Strip insignificant whitespace from the pages
+        transforms (tuple): Page transforms applied to every page (see utils.render_content)
+        ignore (tuple): Glob patterns of sources and static files to leave
+            out, like the files a build from disk skips (see walk.py)
+
+    Returns:
+        dict[str, bytes]: Output files keyed by path relative to the site root
+    """
+    outputs = {path: bytes(data) for path, data in (static or {}).items() if not is_ignored(path, ignore)}
+    # Drafts and editor droppings are left out, as MarkdownSources leaves them out on disk
+    ignored = {path for path in sources if is_ignored(path, ignore)}
+    if ignored:
+        sources = {path: sources[path] for path in sources if path not in ignored}
+
+    nav = None
+    if "{{ Nav }}" in template or "{{ Breadcrumbs }}" in template:
+        nav = NavTree.from_paths(sorted(path for path in sources if path.endswith('.md')))
+
+    minifier = Minifier() if minify else None
+    for path, document, _ in render_pages(sources, template, cache, nav, minifier, transforms):
+        outputs[path] = document.encode()
+    return outputs
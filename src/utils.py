@@ -1,15 +1,24 @@
 import os
 import re
 import shutil
-from pathlib import Path
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
 from enum import Enum
-from typing import Callable
+from collections.abc import Mapping
+from typing import Callable, Iterator
 from typing import List
 import textwrap
 from textnode import TextNode, TextType
 from htmlnode import HTMLNode
 from leafnode import LeafNode
 from parentnode import ParentNode
+from minify import minify_template
+from sinks import OutputSink, as_sink
+from walk import DEFAULT_IGNORE, is_selected, walk_tree
+from page_guard import PageBudgetExceeded
+
+# Published in place of a page that ran over its parse budget (see page_guard.py)
+PLACEHOLDER_CONTENT = "<div><p>This page could not be rendered.</p></div>"
 
 class BlockType(Enum):
     """Enum for different types of markdown blocks."""
@@ -576,24 +585,33 @@ def markdown_to_html_node(markdown: str):
     # Wrap in a div
     return ParentNode("div", children)
 
-def copy_from_to_dir(source_dir: str, dest_dir: str):
+def copy_from_to_dir(source_dir: str, dest_dir: str, ignore=DEFAULT_IGNORE):
     """
     Copy files and directories from source to destination.
     
     Args:
         source_dir (str): Source directory path
-        dest_dir (str): Destination directory path
+        dest_dir (str | OutputSink): Destination directory path, or an output
+            sink (see sinks.py) to add the files to
+        ignore (tuple): Glob patterns of files not to copy (see walk.py)
         
     Raises:
         ValueError: If source directory does not exist
     """
     source_path = Path(source_dir)
-    dest_path = Path(dest_dir)
     
     # Check if source directory exists
     if not source_path.exists():
         raise ValueError(f"Source directory {source_path} does not exist")
 
+    if isinstance(dest_dir, OutputSink):
+        for entry in walk_tree(source_path, ignore):
+            if not entry.is_dir:
+                dest_dir.copy(entry.relative, entry.path)
+        return
+
+    dest_path = Path(dest_dir)
+
     # Remove destination directory if it exists
     if dest_path.exists():
         shutil.rmtree(dest_path)
@@ -601,20 +619,15 @@ def copy_from_to_dir(source_dir: str, dest_dir: str):
     # Create destination directory
     dest_path.mkdir(parents=True)
 
-    # Iterate through all files and directories in source
-    for item in source_path.iterdir():
-        dest_item = dest_path / item.name
-        
-        if item.is_dir():
-            # Recursively copy subdirectories
-            copy_from_to_dir(str(item), str(dest_item))
-        else:
+    for entry in walk_tree(source_path, ignore):
+        dest_item = os.path.join(dest_path, entry.relative)
+        if entry.is_dir:
+            os.mkdir(dest_item)
+        elif entry.is_symlink:
             # Copy individual files, preserving symlinks
-            if item.is_symlink():
-                target = os.readlink(str(item))
-                os.symlink(target, str(dest_item))
-            else:
-                shutil.copy2(str(item), str(dest_item))
+            os.symlink(os.readlink(entry.path), dest_item)
+        else:
+            shutil.copy2(entry.path, dest_item)
 
 def extract_title(markdown: str) -> str:
     for line in markdown.split("\n"):
@@ -626,49 +639,254 @@ def extract_title(markdown: str) -> str:
     
     return "Untitled"
 
-def generate_page(from_path: str, template_path: str, dest_path: str):
+def fill_template(template: str, title: str, content: str, nav: str = "", breadcrumbs: str = "") -> str:
+    """Substitute the title, rendered content and navigation fragments into a page template."""
+    return (template.replace("{{ Title }}", title)
+            .replace("{{ Nav }}", nav)
+            .replace("{{ Breadcrumbs }}", breadcrumbs)
+            .replace("{{ Content }}", content))
+
+def page_url(content_dir: str, md_path: str) -> str:
+    """
+    Return the site URL a markdown file is published under.
+
+    `index.md` maps to its directory (`/majesty/`), every other page to its
+    `.html` path (`/majesty/notes.html`).
+    """
+    return relative_page_url(Path(md_path).relative_to(Path(content_dir)))
+
+def relative_page_url(relative_path: str) -> str:
+    """Return the site URL of a markdown path relative to the content root."""
+    relative_path = PurePosixPath(Path(relative_path).as_posix())
+    if relative_path.name == 'index.md':
+        parent = relative_path.parent.as_posix()
+        return '/' if parent == '.' else f'/{parent}/'
+    return '/' + relative_path.with_suffix('.html').as_posix()
+
+@lru_cache(maxsize=16)
+def _compile_template(template_path: str, mtime_ns: int, size: int, minify: bool) -> str:
+    template = Path(template_path).read_text()
+    return minify_template(template) if minify else template
+
+def load_template(template_path: str, minify: bool = False) -> str:
+    """
+    Return a page template, compiled once and reused until the file changes.
+
+    Args:
+        template_path: Path to the HTML template file
+        minify: Strip insignificant whitespace from the template
+
+    Returns:
+        str: Template text with `{{ ... }}` placeholders
+    """
+    stat = os.stat(template_path)
+    return _compile_template(str(template_path), stat.st_mtime_ns, stat.st_size, minify)
+
+def render_content(markdown: str, minifier=None, transforms=(), page_url: str = '/', guard=None) -> str:
+    """
+    Render page content HTML from markdown.
+
+    `transforms` are applied to the HTML node tree before it is serialized.
+    Each one provides `apply(html_node, page_url)` to edit nodes in place,
+    `apply_template(template)` to edit the page template, and a `cache_key`
+    string that changes whenever its output would. With a `guard` (see
+    page_guard.py), the markdown is parsed in its worker process under the
+    guard's time and size budgets.
+    """
+    html_node = guard.parse(markdown) if guard is not None else markdown_to_html_node(markdown)
+    for transform in transforms:
+        transform.apply(html_node, page_url)
+    return "".join(html_node.iter_html(minifier))
+
+def render_markdown(markdown: str, cache=None, minifier=None, transforms=(), page_url: str = '/',
+                    guard=None) -> str:
+    """Render page content HTML, through the render cache when one is given."""
+    if cache is not None:
+        return cache.render(markdown, minifier, transforms, page_url, guard)
+    return render_content(markdown, minifier, transforms, page_url, guard)
+
+def render_document(source_markdown: str, template: str, cache=None, nav_section=None,
+                    minifier=None, transforms=(), page_url: str = '/', guard=None) -> str:
+    """
+    Render a complete HTML document from page markdown and a page template
+    that is already minified and transformed as needed.
+    """
+    html_version = render_markdown(source_markdown, cache, minifier, transforms, page_url, guard)
+    return fill_page_template(template, extract_title(source_markdown), html_version, nav_section)
+
+def fill_page_template(template: str, title: str, content: str, nav_section=None) -> str:
+    """Fill a page template, with the navigation fragments of `nav_section` when given."""
+    if nav_section is not None:
+        return fill_template(template, title, content, nav_section.nav_html(), nav_section.breadcrumbs_html())
+    return fill_template(template, title, content)
+
+def render_page(source_markdown: str, template_path: str, cache=None, nav_section=None,
+                minifier=None, transforms=(), page_url: str = '/') -> tuple[str, int]:
+    """
+    Render a complete HTML document from page markdown.
+
+    This is the whole of page generation short of writing the result, shared
+    by the build and the on-demand preview server.
+
+    Returns:
+        tuple[str, int]: The document and the bytes minification saved on it
+    """
+    template = load_template(template_path, minifier is not None)
+    for transform in transforms:
+        template = transform.apply_template(template)
+    saved_before = minifier.saved if minifier is not None else 0
+    new_document = render_document(source_markdown, template, cache, nav_section, minifier,
+                                   transforms, page_url)
+
+    saved = 0
+    if minifier is not None:
+        template_saved = len(load_template(template_path)) - len(load_template(template_path, True))
+        saved = minifier.saved - saved_before + template_saved
+    return new_document, saved
+
+def render_pages(sources: Mapping, template: str, cache=None, nav=None, minifier=None, transforms=(),
+                 nav_dir: str = '', guard=None) -> Iterator[tuple[str, str, int]]:
+    """
+    Render every markdown page of a content tree, without touching the disk.
+
+    Args:
+        sources (Mapping[str, str]): Page markdown keyed by POSIX path relative
+            to the content directory; keys not ending in `.md` are skipped
+        template (str): Page template text
+        cache (RenderCache, optional): Render cache to reuse page content from
+        nav (NavTree, optional): Navigation tree for the whole site
+        minifier (Minifier, optional): Minify pages while they are serialized
+        transforms (tuple): Page transforms applied to every page (see render_content)
+        nav_dir (str): Position of the content directory in the navigation tree
+        guard (PageGuard, optional): Parse pages under time and size budgets;
+            a page over budget is added to `guard.offending` and left out, or
+            published as a placeholder if the guard says so
+
+    Yields:
+        tuple[str, str, int]: Output path relative to the destination directory,
+            the document, and the bytes minification saved on it
+    """
+    template_saved = 0
+    if minifier is not None:
+        compiled = minify_template(template)
+        template_saved = len(template) - len(compiled)
+        template = compiled
+    for transform in transforms:
+        template = transform.apply_template(template)
+
+    for relative_path in sources:
+        relative_path = PurePosixPath(relative_path)
+        if relative_path.suffix != '.md':
+            continue
+        site_path = f"{nav_dir}/{relative_path}".lstrip('/')
+        nav_section = nav.section(PurePosixPath(site_path).parent.as_posix()) if nav is not None else None
+        saved_before = minifier.saved if minifier is not None else 0
+        source_markdown = sources[relative_path.as_posix()]
+        try:
+            document = render_document(source_markdown, template, cache, nav_section,
+                                       minifier, transforms, relative_page_url(site_path), guard)
+        except PageBudgetExceeded as error:
+            guard.offending.append((site_path, error.reason))
+            if not guard.placeholder:
+                continue
+            document = fill_page_template(template, extract_title(source_markdown), PLACEHOLDER_CONTENT,
+                                          nav_section)
+        saved = minifier.saved - saved_before + template_saved if minifier is not None else 0
+        yield relative_path.with_suffix('.html').as_posix(), document, saved
+
+class MarkdownSources(Mapping):
+    """
+    The markdown files below a content directory as a read-only mapping of
+    relative POSIX path to text, the on-disk counterpart of the dict
+    `site_build.build` takes. Files are listed up front and read on access.
+
+    Args:
+        content_dir (str): Content directory
+        pages (set, optional): Markdown paths to include; all pages when omitted
+        ignore (tuple): Glob patterns of files and directories to skip (see walk.py)
+        only (tuple): Globs of the relative paths to include; all when empty
+        exclude (tuple): Globs of relative paths to leave out
+    """
+
+    def __init__(self, content_dir: str, pages=None, ignore=DEFAULT_IGNORE, only=(), exclude=()):
+        self._paths = {}
+        for entry in walk_tree(content_dir, ignore):
+            if entry.is_dir or not entry.relative.endswith('.md'):
+                continue
+            if not is_selected(entry.relative, only, exclude):
+                continue
+            md_path = Path(entry.path)
+            if pages is None or md_path in pages:
+                self._paths[entry.relative] = md_path
+
+    def __getitem__(self, relative_path: str) -> str:
+        return self._paths[relative_path].read_text()
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+def generate_page(from_path: str, template_path: str, dest_path: str, cache=None, nav_section=None,
+                  minifier=None, transforms=(), page_url: str = '/', sink=None):
+    """
+    Render one markdown file into an HTML page at `dest_path`, a file path,
+    or a path inside `sink` when an output sink is given.
+    """
     from_path = Path(from_path)
     template_path = Path(template_path)
-    dest_path = Path(dest_path)
-
-    with from_path.open('r') as from_file, \
-         template_path.open('r') as template_file, \
-         dest_path.open('w') as output_file:
-        template = template_file.read()
-        source_markdown = from_file.read()
-        html_version = markdown_to_html_node(source_markdown)
-        title = extract_title(source_markdown)
-        new_document = template.replace("{{ Title }}", title).replace("{{ Content }}", str(html_version))
-        output_file.write(new_document)
-
-def generate_pages_recursive(dir_path_content: str, template_path: str, dest_dir_path: str):
+
+    new_document, saved = render_page(from_path.read_text(), template_path, cache, nav_section, minifier,
+                                      transforms, page_url)
+
+    if sink is None:
+        dest_path = Path(dest_path)
+        with dest_path.open('w') as output_file:
+            output_file.write(new_document)
+    else:
+        sink.write(PurePosixPath(dest_path).as_posix(), new_document.encode())
+        dest_path = sink.location(dest_path)
+
+    if minifier is not None:
+        minifier.record_page(str(dest_path), saved)
+
+def generate_pages_recursive(dir_path_content: str, template_path: str, dest_dir_path: str, cache=None,
+                             nav=None, nav_dir: str = '', minifier=None, transforms=(), pages=None,
+                             only=(), exclude=(), guard=None):
     """
     Recursively generate HTML pages from markdown files.
+
+    The disk side of render_pages: sources are read from `dir_path_content`
+    and documents written below `dest_dir_path`.
     
     Args:
         dir_path_content (str): Path to the content directory containing markdown files
         template_path (str): Path to the HTML template file
-        dest_dir_path (str): Destination directory for generated HTML files
+        dest_dir_path (str | OutputSink): Destination directory for generated
+            HTML files, or an output sink (see sinks.py)
+        cache (RenderCache, optional): Render cache to reuse page content from
+        nav (NavTree, optional): Navigation tree built once for the whole site;
+            every page splices in the pre-rendered fragments of its section
+        nav_dir (str): Position of `dir_path_content` in the navigation tree
+        minifier (Minifier, optional): Minify pages while they are serialized
+        transforms (tuple): Page transforms applied to every page (see render_content)
+        pages (set, optional): Markdown paths to render, e.g. one build shard's;
+            all pages when omitted
+        only (tuple): Globs of the markdown paths, relative to `dir_path_content`,
+            to render (`majesty/**`); all pages when empty
+        exclude (tuple): Globs of markdown paths not to render
+        guard (PageGuard, optional): Parse pages under time and size budgets (see render_pages)
     """
-    content_path = Path(dir_path_content)
-    dest_path = Path(dest_dir_path)
-    template_path = Path(template_path)
-
-    # Ensure destination directory exists
-    dest_path.mkdir(parents=True, exist_ok=True)
-
-    for dir_entry in content_path.iterdir():
-        if dir_entry.is_dir():
-            # Recursively process subdirectories
-            subdir_dest = dest_path / dir_entry.name
-            generate_pages_recursive(str(dir_entry), str(template_path), str(subdir_dest))
-        elif dir_entry.suffix == '.md':
-            # Generate HTML for markdown files
-            relative_path = dir_entry.relative_to(content_path)
-            output_path = dest_path / relative_path.with_suffix('.html')
-            
-            # Create parent directories if they don't exist
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Generate the page
-            generate_page(str(dir_entry), str(template_path), str(output_path))
\ No newline at end of file
+    sink = as_sink(dest_dir_path)
+    if not isinstance(dest_dir_path, OutputSink):
+        # Ensure destination directory exists
+        sink.root.mkdir(parents=True, exist_ok=True)
+
+    sources = MarkdownSources(dir_path_content, pages, only=only, exclude=exclude)
+    for relative_path, document, saved in render_pages(sources, load_template(template_path), cache, nav,
+                                                       minifier, transforms, nav_dir, guard):
+        sink.write(relative_path, document.encode())
+
+        if minifier is not None:
+            minifier.record_page(sink.location(relative_path), saved)
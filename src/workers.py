@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+# Items handed to a worker per task; amortises pickling and IPC per item
+DEFAULT_BATCH_SIZE = 32
+# Batches queued per worker before the producer waits for results
+BATCHES_IN_FLIGHT_PER_WORKER = 4
+
+
+def default_worker_count() -> int:
+    return os.cpu_count() or 1
+
+
+def process_context():
+    """
+    Return the multiprocessing context to start worker processes from.
+
+    That is the platform's default, unless other threads are running (the
+    background link check, a server): a process forked then can inherit a
+    lock one of them holds and hang, and Python 3.12+ warns about it, so
+    workers are started by forkserver, or spawn where that is unavailable.
+    """
+    if threading.active_count() == 1:
+        return multiprocessing.get_context()
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _run_batch(func: Callable, batch: list) -> list:
+    return [func(item) for item in batch]
+
+
+def parallel_map(func: Callable, items: Iterable, workers: int = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, mp_context=None) -> Iterator:
+    """
+    Lazily map `func` over `items` in a pool of worker processes.
+
+    Results are yielded in input order. Only a bounded number of batches is
+    in flight at any time, so neither the input nor the results are ever
+    fully materialised and memory stays flat for arbitrarily many items.
+    With `workers=1` everything runs in the calling process.
+
+    Args:
+        func: Picklable, module-level function to apply
+        items: Picklable inputs
+        workers: Number of worker processes, defaults to the CPU count
+        batch_size: Number of items sent to a worker per task
+        mp_context: multiprocessing context the workers are started from,
+            defaults to process_context()
+    """
+    workers = workers or default_worker_count()
+    if workers <= 1:
+        yield from map(func, items)
+        return
+
+    max_in_flight = workers * BATCHES_IN_FLIGHT_PER_WORKER
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context or process_context()) as pool:
+        pending = deque()
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) < batch_size:
+                continue
+            pending.append(pool.submit(_run_batch, func, batch))
+            batch = []
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+
+        if batch:
+            pending.append(pool.submit(_run_batch, func, batch))
+        while pending:
+            yield from pending.popleft().result()
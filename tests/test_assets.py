@@ -0,0 +1,148 @@
+import base64
+import json
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from assets import AssetCache, AssetInliner, minify_css, minify_stylesheets
+from fingerprint import AssetFingerprints, fingerprint_assets
+from main import main
+from utils import render_content
+
+
+class TestMinifyCss(unittest.TestCase):
+    def test_strips_comments_and_whitespace(self):
+        css = """/* site styles */
+body {
+    margin: 0;
+    font-family: "Segoe  UI", sans-serif;
+}
+
+h1,
+h2 > a {
+    width: calc(100% - 2px);
+}
+"""
+        self.assertEqual(minify_css(css),
+                         'body{margin:0;font-family:"Segoe  UI",sans-serif}h1,h2>a{width:calc(100% - 2px)}')
+
+    def test_keeps_significant_spaces(self):
+        self.assertEqual(minify_css('nav  a :hover { content: "/* not a comment */" }'),
+                         'nav a :hover{content:"/* not a comment */"}')
+        self.assertEqual(minify_css('@media screen and (max-width: 600px) { p { margin: 0 } }'),
+                         '@media screen and (max-width:600px){p{margin:0}}')
+
+    def test_repository_stylesheet(self):
+        css = (Path(__file__).parent.parent / 'static' / 'index.css').read_text()
+        minified = minify_css(css)
+        self.assertLess(len(minified), len(css))
+        self.assertEqual(minify_css(minified), minified)
+
+
+class TestAssetCache(unittest.TestCase):
+    def test_computes_once_per_content_across_builds(self):
+        with TemporaryDirectory() as temp_dir:
+            cache_path = Path(temp_dir) / 'assets.json'
+            calls = []
+
+            def compute(data):
+                calls.append(data)
+                return data.decode().upper()
+
+            cache = AssetCache(cache_path)
+            self.assertEqual(cache.get('upper', b'a', compute), 'A')
+            self.assertEqual(cache.get('upper', b'a', compute), 'A')
+            cache.save()
+
+            cache = AssetCache(cache_path)
+            self.assertEqual(cache.get('upper', b'a', compute), 'A')
+            self.assertEqual(cache.get('upper', b'b', compute), 'B')
+            self.assertEqual(calls, [b'a', b'b'])
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_minify_replaces_symlinks_instead_of_writing_through(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'static').mkdir()
+            (root / 'static' / 'index.css').write_text('body {\n  color: red;\n}\n')
+            (root / 'public').mkdir()
+            (root / 'public' / 'index.css').symlink_to(root / 'static' / 'index.css')
+            stats = minify_stylesheets(root / 'public', AssetCache(None))
+            self.assertEqual(stats['files'], 1)
+            self.assertFalse((root / 'public' / 'index.css').is_symlink())
+            self.assertEqual((root / 'public' / 'index.css').read_text(), 'body{color:red}')
+            self.assertEqual((root / 'static' / 'index.css').read_text(), 'body {\n  color: red;\n}\n')
+
+
+class TestAssetInliner(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.public = Path(self.temp_dir.name) / 'public'
+        (self.public / 'images').mkdir(parents=True)
+        (self.public / 'css').mkdir()
+        (self.public / 'css' / 'site.css').write_text('body{background:url(../images/bg.png)}')
+        (self.public / 'big.css').write_text('p{margin:0}' * 1000)
+        (self.public / 'images' / 'bg.png').write_bytes(b'\x89PNG small')
+        (self.public / 'images' / 'photo.png').write_bytes(b'\x89PNG' + b'\0' * 4096)
+        self.cache = AssetCache(Path(self.temp_dir.name) / 'assets.json')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_inlines_small_stylesheets_into_template(self):
+        inliner = AssetInliner(self.public, self.cache)
+        template = ('<head><link href="/css/site.css" rel="stylesheet">'
+                    '<link rel="stylesheet" href="/big.css">'
+                    '<link rel="stylesheet" href="/css/site.css" media="print"></head>')
+        self.assertEqual(inliner.apply_template(template),
+                         '<head><style>body{background:url(/images/bg.png)}</style>'
+                         '<link rel="stylesheet" href="/big.css">'
+                         '<link rel="stylesheet" href="/css/site.css" media="print"></head>')
+
+    def test_inlines_small_images_as_data_uris(self):
+        inliner = AssetInliner(self.public, self.cache)
+        html = render_content('![bg](../images/bg.png)\n\n![photo](/images/photo.png)',
+                              transforms=(inliner,), page_url='/blog/post.html')
+        data_uri = 'data:image/png;base64,' + base64.b64encode(b'\x89PNG small').decode()
+        self.assertEqual(html, f'<div><img alt="bg" src="{data_uri}"/><img alt="photo" src="/images/photo.png"/></div>')
+
+    def test_decisions_are_cached_per_asset_hash(self):
+        AssetInliner(self.public, self.cache)
+        cache = AssetCache(self.cache.cache_path)
+        first = AssetInliner(self.public, cache)
+        self.assertEqual(cache.misses, 0)
+
+        (self.public / 'images' / 'bg.png').write_bytes(b'\x89PNG changed')
+        second = AssetInliner(self.public, cache)
+        self.assertEqual(cache.misses, 1)
+        self.assertNotEqual(first.cache_key, second.cache_key)
+
+    def test_inlines_fingerprinted_stylesheet(self):
+        manifest = fingerprint_assets(self.public)
+        transforms = (AssetFingerprints(manifest), AssetInliner(self.public, self.cache))
+        template = '<link href="/css/site.css" rel="stylesheet">'
+        for transform in transforms:
+            template = transform.apply_template(template)
+        self.assertEqual(template, f'<style>body{{background:url({manifest["/images/bg.png"]})}}</style>')
+
+
+class TestAssetBuild(unittest.TestCase):
+    def test_build_minifies_and_inlines(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'static').mkdir()
+            (root / 'static' / 'index.css').write_text('body {\n    margin: 0;\n}\n')
+            (root / 'content').mkdir()
+            (root / 'content' / 'index.md').write_text('# Home')
+            (root / 'template.html').write_text('<link href="/index.css" rel="stylesheet">{{ Content }}')
+
+            report = main(root, minify_css=True, inline_css=True, workers=1)
+
+            self.assertEqual((root / 'public' / 'index.css').read_text(), 'body{margin:0}')
+            self.assertEqual((root / 'public' / 'index.html').read_text(),
+                             '<style>body{margin:0}</style><div><h1>Home</h1></div>')
+            self.assertEqual(report.stages['inline'], {'stylesheets': 1, 'images': 0})
+            self.assertEqual(json.loads((root / '.cache' / 'assets.json').read_text())['version'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import hashlib
+import io
+import json
+import tarfile
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from cache_archive import CACHE_ARCHIVE_MANIFEST, CACHE_ARCHIVE_VERSION, CACHE_COMPONENTS, export_cache, import_cache
+from main import main, parse_args
+
+
+def make_project(root: Path):
+    (root / 'static' / 'images').mkdir(parents=True)
+    (root / 'static' / 'index.css').write_text('body { color: black; }\n' * 100)
+    (root / 'static' / 'images' / 'logo.png').write_bytes(
+        b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x10\x00\x00\x00\x08\x08\x02\x00\x00\x00')
+    (root / 'content' / 'blog').mkdir(parents=True)
+    (root / 'content' / 'index.md').write_text('# Home\n\n![logo](/images/logo.png)\n\n[First](/blog/first)')
+    (root / 'content' / 'blog' / 'first.md').write_text('# First\n\n' + 'Hello there. ' * 200)
+    (root / 'template.html').write_text('<html><body>{{ Content }}</body></html>')
+
+
+def write_archive(path: Path, members: dict, manifest: dict = None):
+    if manifest is None:
+        manifest = {"version": CACHE_ARCHIVE_VERSION,
+                    "components": {name: version for name, (_, version) in CACHE_COMPONENTS.items()},
+                    "files": {name: hashlib.sha256(data).hexdigest() for name, data in members.items()}}
+    with tarfile.open(path, 'w:gz') as archive:
+        for name, data in [(CACHE_ARCHIVE_MANIFEST, json.dumps(manifest).encode()), *members.items()]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+class TestCacheArchive(unittest.TestCase):
+    def test_fresh_checkout_builds_warm(self):
+        options = dict(workers=1, image_dimensions=True, resource_hints=True, compress=True,
+                       feeds=['blog'], deploy_manifest=True)
+        with TemporaryDirectory() as temp_dir:
+            first, second = Path(temp_dir, 'first'), Path(temp_dir, 'second')
+            make_project(first)
+            main(first, **options)
+            stats = export_cache(first / '.cache', Path(temp_dir, 'cache.tar.gz'))
+            self.assertGreater(stats['files'], 0)
+
+            make_project(second)
+            imported = import_cache(second / '.cache', Path(temp_dir, 'cache.tar.gz'))
+            self.assertEqual(imported, {"imported": stats['files'], "stale": 0, "rejected": 0})
+            for name in ('images.json', 'link-graph.json', 'deploy-manifest.json'):
+                self.assertEqual((second / '.cache' / name).read_bytes(), (first / '.cache' / name).read_bytes())
+
+            report = main(second, **options)
+            self.assertEqual(report.stages['render']['cache_misses'], 0)
+            self.assertEqual(report.stages['deploy']['added'], 0)
+            self.assertEqual(report.stages['compress']['reused'], report.stages['compress']['files'])
+            self.assertGreater(report.stages['compress']['files'], 0)
+
+    def test_rejects_tampered_unsafe_and_stale_entries(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            entry = 'render/ab/' + 'ab' * 32 + '.html'
+            members = {entry: b'<p>cached</p>', 'link-graph.json': b'{}', '../escape.txt': b'evil',
+                       'render/../../escape.txt': b'evil', 'notes.txt': b'unknown'}
+            manifest = {"version": CACHE_ARCHIVE_VERSION,
+                        "components": {"render": CACHE_COMPONENTS['render'][1], "link-graph": -1},
+                        "files": {name: hashlib.sha256(data).hexdigest() for name, data in members.items()}}
+            manifest["files"][entry] = hashlib.sha256(b'something else').hexdigest()
+            write_archive(root / 'cache.tar.gz', members, manifest)
+
+            stats = import_cache(root / '.cache', root / 'cache.tar.gz')
+            self.assertEqual(stats, {"imported": 0, "stale": 1, "rejected": 4})
+            self.assertFalse((root / '.cache').exists())
+            self.assertFalse((root / 'escape.txt').exists())
+
+    def test_rejects_other_archives(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'junk.tar.gz').write_bytes(b'not an archive')
+            with tarfile.open(root / 'site.tar.gz', 'w:gz') as archive:
+                archive.add(__file__, arcname='index.html')
+            write_archive(root / 'future.tar.gz', {}, {"version": CACHE_ARCHIVE_VERSION + 1})
+            for name in ('junk.tar.gz', 'site.tar.gz', 'future.tar.gz'):
+                with self.assertRaises(ValueError, msg=name):
+                    import_cache(root / '.cache', root / name)
+            self.assertFalse((root / '.cache').exists())
+
+    def test_command_line(self):
+        args = parse_args(['cache', 'export', 'build-cache.tar.gz'])
+        self.assertEqual((args.command, args.action, args.archive), ('cache', 'export', 'build-cache.tar.gz'))
+        with self.assertRaises(SystemExit):
+            parse_args(['cache', 'prune', 'build-cache.tar.gz'])
+
+
+if __name__ == '__main__':
+    unittest.main()
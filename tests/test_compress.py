@@ -0,0 +1,68 @@
+import unittest
+import gzip
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from compress import available_encodings, compress_outputs
+from report import BuildReport
+
+
+class TestCompress(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.public_dir = self.root / 'public'
+        self.cache_dir = self.root / '.cache' / 'compress'
+        (self.public_dir / 'sub').mkdir(parents=True)
+        self.page = self.public_dir / 'index.html'
+        self.page.write_text('<p>hello</p>' * 500)
+        (self.public_dir / 'sub' / 'style.css').write_text('body { color: red; }\n' * 200)
+        (self.public_dir / 'tiny.html').write_text('<p>tiny</p>')
+        (self.public_dir / 'image.png').write_bytes(b'\x89PNG' * 1000)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_writes_siblings_above_threshold(self):
+        stats = compress_outputs(self.public_dir, self.cache_dir, workers=1)
+        self.assertEqual(stats["files"], 2)
+        self.assertEqual(stats["reused"], 0)
+        self.assertEqual(gzip.decompress((self.public_dir / 'index.html.gz').read_bytes()),
+                         self.page.read_bytes())
+        self.assertTrue((self.public_dir / 'sub' / 'style.css.gz').exists())
+        self.assertFalse((self.public_dir / 'tiny.html.gz').exists())
+        self.assertFalse((self.public_dir / 'image.png.gz').exists())
+        self.assertLess(stats["gz_ratio"], 0.1)
+        self.assertEqual(os.stat(self.public_dir / 'index.html.gz').st_mtime_ns,
+                         self.page.stat().st_mtime_ns)
+        if '.zst' in available_encodings():
+            self.assertTrue((self.public_dir / 'index.html.zst').exists())
+
+    def test_unchanged_files_reuse_cache(self):
+        compress_outputs(self.public_dir, self.cache_dir, workers=1)
+        (self.public_dir / 'index.html.gz').unlink()
+        self.page.write_text('<p>changed</p>' * 500)
+        stats = compress_outputs(self.public_dir, self.cache_dir, workers=2)
+        self.assertEqual(stats["reused"], 1)
+        self.assertEqual(gzip.decompress((self.public_dir / 'index.html.gz').read_bytes()),
+                         self.page.read_bytes())
+
+
+class TestBuildReport(unittest.TestCase):
+    def test_record_and_write(self):
+        report = BuildReport()
+        report.record('compress', files=2)
+        report.record('compress', reused=1)
+        self.assertFalse(report.failed)
+        report.error('broken link')
+        self.assertTrue(report.failed)
+        with TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / 'report.json'
+            report.write(path)
+            self.assertIn('"reused": 1', path.read_text())
+        self.assertEqual(report.to_dict(), {"stages": {"compress": {"files": 2, "reused": 1}},
+                                            "errors": ['broken link']})
+
+
+if __name__ == '__main__':
+    unittest.main()
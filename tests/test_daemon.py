@@ -0,0 +1,113 @@
+import threading
+import time
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from daemon import BuildCoalescer, BuildDaemon, send_request, snapshot_tree
+from main import main, parse_args
+from render_cache import RenderCache
+
+
+def make_project(root: Path):
+    (root / 'static').mkdir(parents=True)
+    (root / 'static' / 'index.css').write_text('body {}')
+    (root / 'content').mkdir()
+    (root / 'content' / 'index.md').write_text('# Home\n\nWelcome.')
+    (root / 'template.html').write_text('<html><body>{{ Content }}</body></html>')
+
+
+class TestBuildCoalescer(unittest.TestCase):
+    def test_concurrent_requests_share_builds(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.05)
+            return {"ok": True}
+
+        coalescer = BuildCoalescer(build)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(coalescer.request())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result["ok"] for result in results))
+        # The first request builds; everyone arriving meanwhile waits for one more
+        self.assertLessEqual(len(calls), 2)
+        self.assertEqual(coalescer.builds, len(calls))
+
+    def test_build_errors_become_results(self):
+        def build():
+            raise RuntimeError("boom")
+
+        result = BuildCoalescer(build).request()
+        self.assertFalse(result["ok"])
+        self.assertIn("boom", result["errors"][0])
+
+
+class TestRenderCacheMemory(unittest.TestCase):
+    def test_memory_tier_is_bounded(self):
+        with TemporaryDirectory() as temp_dir:
+            cache = RenderCache(temp_dir, memory_entries=2)
+            for text in ('a', 'b', 'c'):
+                cache.put(text, f'<p>{text}</p>')
+            self.assertEqual(len(cache.memory), 2)
+            self.assertEqual(cache.get('a'), '<p>a</p>')
+            self.assertIn(cache.key('a'), cache.memory)
+
+
+class TestBuildDaemon(unittest.TestCase):
+    def test_round_trip(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_project(root)
+            render_cache = RenderCache(root / '.cache' / 'render', memory_entries=100)
+            socket_path = root / 'd.sock'
+            watch_paths = [root / 'content', root / 'static', root / 'template.html']
+            daemon = BuildDaemon(socket_path, lambda: main(root, render_cache=render_cache, workers=1),
+                                 watch_paths)
+            thread = threading.Thread(target=daemon.serve_forever, args=(0.05,), daemon=True)
+            thread.start()
+            try:
+                first = send_request(socket_path, timeout=30)
+                self.assertTrue(first["ok"])
+                self.assertFalse(first["skipped"])
+                self.assertIn('render', first["stages"])
+                self.assertTrue((root / 'public' / 'index.html').exists())
+
+                self.assertTrue(send_request(socket_path, timeout=30)["skipped"])
+
+                (root / 'content' / 'index.md').write_text('# Home\n\nChanged.')
+                rebuilt = send_request(socket_path, timeout=30)
+                self.assertFalse(rebuilt["skipped"])
+                self.assertIn('Changed.', (root / 'public' / 'index.html').read_text())
+
+                status = send_request(socket_path, 'status', timeout=30)
+                self.assertEqual(status["builds"], 3)
+                self.assertFalse(send_request(socket_path, 'restart', timeout=30)["ok"])
+                self.assertTrue(send_request(socket_path, 'stop', timeout=30)["ok"])
+                thread.join(5)
+                self.assertFalse(thread.is_alive())
+            finally:
+                if thread.is_alive():
+                    daemon.shutdown()
+                daemon.server_close()
+            self.assertFalse(socket_path.exists())
+
+    def test_snapshot_tree(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_project(root)
+            snapshot = snapshot_tree([root / 'content', root / 'template.html', root / 'missing'])
+            self.assertEqual(set(snapshot), {str(root / 'content' / 'index.md'), str(root / 'template.html')})
+
+    def test_command_line(self):
+        args = parse_args(['daemon', '--socket', '/tmp/s.sock', '--minify'])
+        self.assertEqual((args.command, args.socket, args.minify), ('daemon', '/tmp/s.sock', True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from deploy import DEPLOY_DELTA_NAME, DEPLOY_MANIFEST_NAME, diff_manifests, load_deploy_manifest
+from main import main
+
+
+def make_project(root: Path):
+    (root / 'static').mkdir(parents=True)
+    (root / 'static' / 'index.css').write_text('body { color: black; }\n' * 100)
+    (root / 'content' / 'blog').mkdir(parents=True)
+    (root / 'content' / 'index.md').write_text('# Home\n\n' + 'Welcome to the site. ' * 100)
+    (root / 'content' / 'blog' / 'first.md').write_text('# First\n\nHello.')
+    (root / 'content' / 'blog' / 'second.md').write_text('# Second\n\nAgain.')
+    (root / 'template.html').write_text('<html><body>{{ Content }}</body></html>')
+
+
+def hash_tree(root: Path) -> dict:
+    return {path.relative_to(root).as_posix(): {"size": path.stat().st_size,
+                                                 "sha256": hashlib.sha256(path.read_bytes()).hexdigest()}
+            for path in sorted(root.rglob('*')) if path.is_file()}
+
+
+class TestDiffManifests(unittest.TestCase):
+    def test_diff(self):
+        previous = {'a': {"size": 1, "sha256": 'x'}, 'b': {"size": 1, "sha256": 'y'}}
+        current = {'a': {"size": 1, "sha256": 'x'}, 'b': {"size": 2, "sha256": 'z'}, 'c': {"size": 1, "sha256": 'w'}}
+        self.assertEqual(diff_manifests(previous, current), {"added": ['c'], "changed": ['b'], "removed": []})
+        self.assertEqual(diff_manifests(current, {})["removed"], ['a', 'b', 'c'])
+
+
+class TestDeployManifest(unittest.TestCase):
+    def test_manifest_and_delta_between_builds(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_project(root)
+            report = main(root, deploy_manifest=True, workers=1)
+            self.assertEqual(load_deploy_manifest(root / '.cache' / DEPLOY_MANIFEST_NAME), hash_tree(root / 'public'))
+            self.assertEqual(report.stages['deploy']['added'], 4)
+            self.assertEqual(report.stages['deploy']['rehashed'], 0)
+
+            (root / 'content' / 'blog' / 'first.md').write_text('# First\n\nEdited.')
+            (root / 'content' / 'blog' / 'second.md').unlink()
+            (root / 'content' / 'blog' / 'third.md').write_text('# Third')
+            main(root, deploy_manifest=True, workers=1)
+            delta = json.loads((root / '.cache' / DEPLOY_DELTA_NAME).read_text())
+            self.assertEqual((delta["added"], delta["changed"], delta["removed"]),
+                             (['blog/third.html'], ['blog/first.html'], ['blog/second.html']))
+
+    def test_only_files_rewritten_in_place_are_rehashed(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_project(root)
+            report = main(root, deploy_manifest=True, compress=True, workers=1)
+            manifest = load_deploy_manifest(root / '.cache' / DEPLOY_MANIFEST_NAME)
+            self.assertEqual(manifest, hash_tree(root / 'public'))
+            compressed = [path for path in manifest if path.endswith(('.gz', '.zst'))]
+            self.assertTrue(compressed)
+            self.assertEqual(report.stages['deploy']['rehashed'], len(compressed))
+
+    def test_manifest_of_an_archive(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_project(root)
+            main(root, workers=1)
+            expected = hash_tree(root / 'public')
+            main(root, deploy_manifest=True, output=root / 'site.zip', workers=1)
+            self.assertEqual(load_deploy_manifest(root / '.cache' / DEPLOY_MANIFEST_NAME), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+import os
+import shutil
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from feed import generate_feed
+from main import main
+from render_cache import RenderCache
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class TestFeed(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.content_dir = self.root / 'content'
+        self.dest_dir = self.root / 'public'
+        self.state_path = self.root / '.cache' / 'feeds' / 'blog.json'
+        (self.content_dir / 'blog').mkdir(parents=True)
+        for i in range(4):
+            self.write_post(i, f'# Post {i}\n\nSummary of post {i}.')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_post(self, i, text):
+        path = self.content_dir / 'blog' / f'post{i}.md'
+        path.write_text(text)
+        os.utime(path, ns=(i * 10**9 + 10**12, i * 10**9 + 10**12))
+
+    def generate(self, **kwargs):
+        return generate_feed(self.content_dir, 'blog', self.dest_dir, 'https://example.com/',
+                             max_entries=3, state_path=self.state_path, **kwargs)
+
+    def entry_titles(self):
+        feed = ET.parse(self.dest_dir / 'blog' / 'feed.xml').getroot()
+        return [entry.find(f'{ATOM}title').text for entry in feed.iter(f'{ATOM}entry')]
+
+    def test_newest_entries_first(self):
+        stats = self.generate()
+        self.assertEqual(stats, {"entries": 3, "reused": 0, "rendered": 3})
+        self.assertEqual(self.entry_titles(), ['Post 3', 'Post 2', 'Post 1'])
+
+        feed = (self.dest_dir / 'blog' / 'feed.xml').read_text()
+        self.assertIn('<id>https://example.com/blog/post3.html</id>', feed)
+        self.assertIn('<summary>Summary of post 3.</summary>', feed)
+        self.assertIn('&lt;h1&gt;Post 3&lt;/h1&gt;', feed)
+
+    def test_incremental_rebuild(self):
+        self.generate()
+        self.write_post(9, '# Post 9\n\nBrand new.')
+        stats = self.generate()
+        self.assertEqual(stats, {"entries": 3, "reused": 2, "rendered": 1})
+        self.assertEqual(self.entry_titles(), ['Post 9', 'Post 3', 'Post 2'])
+
+    def test_changed_entry_is_rendered_again(self):
+        self.generate()
+        self.write_post(3, '# Post 3 (edited)\n\nChanged.')
+        stats = self.generate()
+        self.assertEqual(stats["rendered"], 1)
+        self.assertEqual(self.entry_titles()[0], 'Post 3 (edited)')
+
+    def test_state_discarded_for_other_site_url(self):
+        self.generate()
+        stats = generate_feed(self.content_dir, 'blog', self.dest_dir, 'https://other.example',
+                              max_entries=3, state_path=self.state_path)
+        self.assertEqual(stats["reused"], 0)
+
+    def test_rss_format(self):
+        self.generate(feed_format='rss')
+        rss = ET.parse(self.dest_dir / 'blog' / 'rss.xml').getroot()
+        self.assertEqual([item.find('title').text for item in rss.iter('item')],
+                         ['Post 3', 'Post 2', 'Post 1'])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.generate(feed_format='json')
+
+    def test_uses_render_cache(self):
+        cache = RenderCache(self.root / '.cache' / 'render')
+        cache.render('# Post 3\n\nSummary of post 3.')
+        self.generate(cache=cache)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 3)
+
+
+class TestRenderCache(unittest.TestCase):
+    def test_render_hits_after_first_miss(self):
+        with TemporaryDirectory() as temp_dir:
+            cache = RenderCache(temp_dir)
+            self.assertIsNone(cache.get('# Hi'))
+            first = cache.render('# Hi')
+            second = cache.render('# Hi')
+            self.assertEqual(first, '<div><h1>Hi</h1></div>')
+            self.assertEqual(first, second)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            self.assertEqual(RenderCache(temp_dir).get('# Hi'), first)
+
+    def test_prune_deletes_unused_entries(self):
+        with TemporaryDirectory() as temp_dir:
+            cache = RenderCache(temp_dir)
+            cache.render('# Kept')
+            cache.render('# Edited')
+            self.assertEqual(cache.prune(), 0)
+
+            # The next build only uses one of them, and adds another
+            cache = RenderCache(temp_dir)
+            cache.render('# Kept')
+            cache.render('# Edited, again')
+            self.assertEqual(cache.prune(), 1)
+            self.assertEqual(len(list(Path(temp_dir).rglob('*.html'))), 2)
+            self.assertIsNone(cache.get('# Edited'))
+            self.assertIsNotNone(cache.get('# Kept'))
+
+    def test_feeds_share_page_renders(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'content' / 'blog').mkdir(parents=True)
+            (root / 'content' / 'index.md').write_text('# Home')
+            (root / 'content' / 'blog' / 'first.md').write_text('# First\n\nHello   there.')
+            (root / 'content' / 'blog' / 'second.md').write_text('# Second\n\n[First](/blog/first.html)')
+            (root / 'template.html').write_text('<html><body>{{ Content }}</body></html>')
+            for options in ({'minify': True}, {'minify': True, 'image_dimensions': True}):
+                shutil.rmtree(root / '.cache', ignore_errors=True)
+                report = main(root, workers=1, feeds=['blog'], **options)
+                self.assertEqual(report.stages['feed:blog']['rendered'], 2, options)
+                self.assertEqual(report.stages['feed:blog']['cache_hits'], 2, options)
+                self.assertEqual(report.stages['render']['cache_misses'], 3, options)
+
+    def test_full_builds_prune_partial_builds_keep(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'content').mkdir()
+            (root / 'content' / 'index.md').write_text('# Home')
+            (root / 'content' / 'about.md').write_text('# About')
+            (root / 'template.html').write_text('<html><body>{{ Content }}</body></html>')
+            main(root, workers=1)
+            (root / 'content' / 'about.md').write_text('# About, edited')
+
+            report = main(root, workers=1, only=['about.md'])
+            self.assertNotIn('pruned', report.stages['render'])
+            self.assertEqual(len(list((root / '.cache' / 'render').rglob('*.html'))), 3)
+
+            report = main(root, workers=1)
+            self.assertEqual(report.stages['render']['pruned'], 1)
+            self.assertEqual(len(list((root / '.cache' / 'render').rglob('*.html'))), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import json
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from fingerprint import AssetFingerprints, fingerprint_assets, fingerprinted_name, rewrite_url
+from main import main
+from render_cache import RenderCache
+from utils import generate_page
+
+
+class TestFingerprintAssets(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.public = Path(self.temp_dir.name)
+        (self.public / 'images').mkdir()
+        (self.public / 'images' / 'logo.png').write_bytes(b'png-v1')
+        (self.public / 'index.css').write_text('body { background: url("images/logo.png"); }')
+        (self.public / 'favicon.ico').write_bytes(b'ico')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_copies_assets_and_writes_manifest(self):
+        manifest = fingerprint_assets(self.public)
+
+        logo = manifest['/images/logo.png']
+        self.assertEqual(logo, '/images/' + fingerprinted_name('logo.png', b'png-v1'))
+        self.assertTrue((self.public / logo.lstrip('/')).exists())
+        self.assertEqual((self.public / 'images' / 'logo.png').read_bytes(), b'png-v1')
+        self.assertTrue((self.public / 'favicon.ico').exists())
+        self.assertNotIn('/favicon.ico', manifest)
+
+        self.assertEqual(json.loads((self.public / 'asset-manifest.json').read_text()), manifest)
+        headers = (self.public / '_headers').read_text()
+        self.assertIn(f"{logo}\n  Cache-Control: public, max-age=31536000, immutable\n", headers)
+
+    def test_rewrites_css_references_before_hashing(self):
+        manifest = fingerprint_assets(self.public)
+        css = (self.public / manifest['/index.css'].lstrip('/')).read_text()
+        self.assertEqual(css, f'body {{ background: url("{manifest["/images/logo.png"]}"); }}')
+        self.assertEqual((self.public / 'index.css').read_text(), 'body { background: url("images/logo.png"); }')
+
+    def test_changed_image_changes_stylesheet_hash(self):
+        first = fingerprint_assets(self.public)['/index.css']
+        self.tearDown()
+        self.setUp()
+        (self.public / 'images' / 'logo.png').write_bytes(b'png-v2')
+        self.assertNotEqual(fingerprint_assets(self.public)['/index.css'], first)
+
+
+class TestAssetFingerprints(unittest.TestCase):
+    manifest = {'/index.css': '/index.0123abcd.css', '/images/logo.png': '/images/logo.89abcdef.png'}
+
+    def test_rewrite_url(self):
+        self.assertEqual(rewrite_url('../images/logo.png', '/blog/post.html', self.manifest),
+                         '/images/logo.89abcdef.png')
+        self.assertEqual(rewrite_url('/index.css?v=2#top', '/', self.manifest), '/index.0123abcd.css?v=2#top')
+        self.assertEqual(rewrite_url('https://example.com/index.css', '/', self.manifest),
+                         'https://example.com/index.css')
+        self.assertEqual(rewrite_url('/other.css', '/', self.manifest), '/other.css')
+
+    def test_rewrites_pages_and_template(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'page.md').write_text('# Title\n\n![logo](/images/logo.png) [home](/)')
+            (root / 'template.html').write_text('<link href="/index.css"><body>{{ Content }}</body>')
+            transforms = (AssetFingerprints(self.manifest),)
+            cache = RenderCache(root / 'cache')
+            generate_page(root / 'page.md', root / 'template.html', root / 'page.html', cache,
+                          transforms=transforms)
+
+            html = (root / 'page.html').read_text()
+            self.assertIn('<link href="/index.0123abcd.css">', html)
+            self.assertIn('src="/images/logo.89abcdef.png"', html)
+            self.assertIn('href="/"', html)
+
+            # A different manifest must not be served from the same cache entry
+            other = (AssetFingerprints({'/images/logo.png': '/images/logo.00000000.png'}),)
+            generate_page(root / 'page.md', root / 'template.html', root / 'page.html', cache,
+                          transforms=other)
+            self.assertIn('src="/images/logo.00000000.png"', (root / 'page.html').read_text())
+            self.assertEqual(cache.hits, 0)
+
+
+class TestFingerprintBuild(unittest.TestCase):
+    def test_build_serves_hashed_assets(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'static' / 'images').mkdir(parents=True)
+            (root / 'static' / 'images' / 'logo.png').write_bytes(b'png')
+            (root / 'static' / 'index.css').write_text('h1 { color: red; }')
+            (root / 'content' / 'blog').mkdir(parents=True)
+            (root / 'content' / 'blog' / 'post.md').write_text('# Post\n\n![logo](../images/logo.png)')
+            (root / 'template.html').write_text('<link href="/index.css" rel="stylesheet">{{ Content }}')
+
+            report = main(root, fingerprint=True, check_links=True, workers=1)
+
+            self.assertFalse(report.failed)
+            manifest = json.loads((root / 'public' / 'asset-manifest.json').read_text())
+            html = (root / 'public' / 'blog' / 'post.html').read_text()
+            self.assertIn(f'href="{manifest["/index.css"]}"', html)
+            self.assertIn(f'src="{manifest["/images/logo.png"]}"', html)
+            self.assertEqual(report.stages['fingerprint'], {'assets': 2})
+
+    def test_feed_links_resolve_with_fingerprinting(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'static' / 'images').mkdir(parents=True)
+            (root / 'static' / 'images' / 'rivendell.png').write_bytes(b'png')
+            (root / 'content').mkdir()
+            (root / 'content' / 'index.md').write_text('# Home')
+            (root / 'content' / 'rivendell.md').write_text('# Rivendell\n\n![valley](images/rivendell.png)')
+            (root / 'template.html').write_text('{{ Content }}')
+
+            main(root, feeds=[''], fingerprint=True, service_worker=True, workers=1)
+
+            public = root / 'public'
+            self.assertIn('images/rivendell.png', (public / 'feed.xml').read_text())
+            self.assertEqual((public / 'images' / 'rivendell.png').read_bytes(), b'png')
+            manifest = json.loads((public / 'asset-manifest.json').read_text())
+            self.assertTrue((public / manifest['/images/rivendell.png'].lstrip('/')).exists())
+            precached = json.loads((public / 'precache-manifest.json').read_text())['entries']
+            self.assertNotIn('/images/rivendell.png', [entry['url'] for entry in precached])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import struct
+import unittest
+import zlib
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from image_optimize import (exif_orientation, optimize_image_file, optimize_images, optimize_jpeg,
+                            optimize_png, PNG_SIGNATURE)
+from image_probe import probe_image
+
+
+def chunk(chunk_type, body):
+    return struct.pack('>I', len(body)) + chunk_type + body + struct.pack('>I', zlib.crc32(chunk_type + body))
+
+
+def read_chunks(data):
+    chunks = []
+    position = len(PNG_SIGNATURE)
+    while position < len(data):
+        (length,) = struct.unpack('>I', data[position:position + 4])
+        chunks.append((data[position + 4:position + 8], data[position + 8:position + 8 + length]))
+        position += length + 12
+    return chunks
+
+
+def png_bytes(width=64, height=64, extra_chunks=()):
+    pixels = b''.join(b'\0' + bytes((x * 3 + y) % 256 for x in range(width * 3)) for y in range(height))
+    idat = zlib.compress(pixels, 1)
+    half = len(idat) // 2
+    return (PNG_SIGNATURE + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + b''.join(chunk(t, b) for t, b in extra_chunks)
+            + chunk(b'IDAT', idat[:half]) + chunk(b'IDAT', idat[half:]) + chunk(b'IEND', b''))
+
+
+def exif_payload(orientation):
+    ifd = struct.pack('<H', 1) + struct.pack('<HHIHH', 0x0112, 3, 1, orientation, 0) + b'\0\0\0\0'
+    return b'Exif\0\0' + b'II' + struct.pack('<HI', 42, 8) + ifd
+
+
+def segment(marker, payload):
+    return bytes((0xFF, marker)) + struct.pack('>H', len(payload) + 2) + payload
+
+
+def jpeg_bytes(*segments):
+    sof = segment(0xC0, struct.pack('>BHHB', 8, 16, 32, 1) + b'\x01\x11\0')
+    scan = segment(0xDA, b'\x01\x01\0\0\x3f\0') + b'\x12\x34\xff\x00\x56'
+    return b'\xff\xd8' + b''.join(segments) + sof + scan + b'\xff\xd9'
+
+
+def probe_image_bytes(data):
+    with TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / 'image.png'
+        path.write_bytes(data)
+        return probe_image(path)
+
+
+class TestOptimizePng(unittest.TestCase):
+    def test_strips_metadata_and_keeps_pixels(self):
+        original = png_bytes(extra_chunks=[(b'tEXt', b'Comment\0hello' * 20), (b'gAMA', struct.pack('>I', 45455)),
+                                           (b'tIME', b'\x07\xe6\x01\x01\0\0\0')])
+        optimized = optimize_png(original)
+
+        self.assertLess(len(optimized), len(original))
+        chunks = read_chunks(optimized)
+        self.assertEqual([t for t, _ in chunks], [b'IHDR', b'gAMA', b'IDAT', b'IEND'])
+        original_pixels = zlib.decompress(b''.join(b for t, b in read_chunks(original) if t == b'IDAT'))
+        self.assertEqual(zlib.decompress(chunks[2][1]), original_pixels)
+        self.assertEqual(probe_image_bytes(optimized), (64, 64))
+
+    def test_leaves_unparseable_and_animated_images(self):
+        self.assertEqual(optimize_png(b'not a png'), b'not a png')
+        truncated = png_bytes()[:-20]
+        self.assertIs(optimize_png(truncated), truncated)
+        animated = png_bytes(extra_chunks=[(b'acTL', b'\0' * 8)])
+        self.assertIs(optimize_png(animated), animated)
+
+    def test_repository_image_shrinks(self):
+        original = (Path(__file__).parent.parent / 'static' / 'images' / 'rivendell.png').read_bytes()
+        self.assertLessEqual(len(optimize_png(original)), len(original))
+
+
+class TestOptimizeJpeg(unittest.TestCase):
+    def test_strips_metadata_segments(self):
+        jfif = segment(0xE0, b'JFIF\0\x01\x01\0\0\x01\0\x01\0\0')
+        comment = segment(0xFE, b'made with love')
+        xmp = segment(0xE1, b'http://ns.adobe.com/xap/1.0/\0' + b'x' * 100)
+        icc = segment(0xE2, b'ICC_PROFILE\0\x01\x01profile')
+        exif = segment(0xE1, exif_payload(1))
+        optimized = optimize_jpeg(jpeg_bytes(jfif, comment, xmp, exif, icc))
+        self.assertEqual(optimized, jpeg_bytes(jfif, icc))
+
+    def test_keeps_exif_with_rotation(self):
+        rotated = segment(0xE1, exif_payload(6))
+        self.assertEqual(exif_orientation(exif_payload(6)), 6)
+        self.assertEqual(optimize_jpeg(jpeg_bytes(rotated)), jpeg_bytes(rotated))
+
+    def test_leaves_malformed_files(self):
+        malformed = b'\xff\xd8\x00\x00garbage'
+        self.assertIs(optimize_jpeg(malformed), malformed)
+
+
+class TestOptimizeImages(unittest.TestCase):
+    def test_optimizes_in_place_and_reuses_cache(self):
+        with TemporaryDirectory() as temp_dir:
+            public = Path(temp_dir) / 'public'
+            (public / 'images').mkdir(parents=True)
+            original = png_bytes(extra_chunks=[(b'tEXt', b'Comment\0' + b'x' * 500)])
+            (public / 'images' / 'a.png').write_bytes(original)
+            (public / 'images' / 'b.JPG').write_bytes(jpeg_bytes(segment(0xFE, b'comment')))
+            (public / 'index.css').write_text('body {}')
+            cache = Path(temp_dir) / 'cache'
+
+            stats = optimize_images(public, cache, workers=1)
+            optimized = (public / 'images' / 'a.png').read_bytes()
+            self.assertEqual(optimized, optimize_png(original))
+            self.assertEqual((public / 'images' / 'b.JPG').read_bytes(), jpeg_bytes())
+            self.assertEqual(stats['images'], 2)
+            self.assertEqual(stats['reused'], 0)
+            self.assertEqual(stats['optimized_bytes'], len(optimized) + len(jpeg_bytes()))
+
+            (public / 'images' / 'a.png').write_bytes(original)
+            _, _, size, reused = optimize_image_file((str(public / 'images' / 'a.png'), str(cache)))
+            self.assertTrue(reused)
+            self.assertEqual((public / 'images' / 'a.png').read_bytes(), optimized)
+            self.assertEqual(size, len(optimized))
+
+    def test_replaces_symlinks_instead_of_writing_through(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            original = png_bytes(extra_chunks=[(b'tEXt', b'Comment\0' + b'x' * 500)])
+            (root / 'static').mkdir()
+            (root / 'static' / 'a.png').write_bytes(original)
+            (root / 'static' / 'b.png').write_bytes(original)
+            (root / 'public').mkdir()
+            (root / 'public' / 'a.png').symlink_to(root / 'static' / 'a.png')
+            (root / 'public' / 'b.png').symlink_to(root / 'static' / 'b.png')
+            cache = root / 'cache'
+
+            # a.png is optimized, b.png then comes from the cache
+            for name, reused in (('a.png', False), ('b.png', True)):
+                path = root / 'public' / name
+                self.assertEqual(optimize_image_file((str(path), str(cache)))[3], reused)
+                self.assertFalse(path.is_symlink())
+                self.assertEqual(path.read_bytes(), optimize_png(original))
+                self.assertEqual((root / 'static' / name).read_bytes(), original)
+
+
+if __name__ == '__main__':
+    unittest.main()
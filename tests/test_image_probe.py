@@ -0,0 +1,102 @@
+import json
+import struct
+import unittest
+import zlib
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from image_probe import ImageDimensions, probe_image, probe_static_images
+from utils import render_content
+
+
+def png_bytes(width, height):
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    chunk = struct.pack('>I', len(ihdr)) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+    return b'\x89PNG\r\n\x1a\n' + chunk + b'\0' * 64
+
+
+def jpeg_bytes(width, height):
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\0\x01\x01\0\0\x01\0\x01\0\0'
+    dht = b'\xff\xc4' + struct.pack('>H', 5) + b'\0\0\0'
+    sof = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\0'
+    return b'\xff\xd8' + app0 + dht + sof + b'\xff\xd9'
+
+
+def webp_bytes(chunk, payload):
+    body = b'WEBP' + chunk + struct.pack('<I', len(payload)) + payload
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+class TestProbeImage(unittest.TestCase):
+    def probe(self, data):
+        with TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / 'image'
+            path.write_bytes(data)
+            return probe_image(path)
+
+    def test_png(self):
+        self.assertEqual(self.probe(png_bytes(1344, 896)), (1344, 896))
+
+    def test_jpeg_skips_segments_before_frame(self):
+        self.assertEqual(self.probe(jpeg_bytes(640, 480)), (640, 480))
+
+    def test_gif(self):
+        self.assertEqual(self.probe(b'GIF89a' + struct.pack('<HH', 32, 16) + b'\0' * 8), (32, 16))
+
+    def test_webp_variants(self):
+        lossy = b'\0\0\0\x9d\x01\x2a' + struct.pack('<HH', 400, 300) + b'\0' * 4
+        self.assertEqual(self.probe(webp_bytes(b'VP8 ', lossy)), (400, 300))
+        bits = (400 - 1) | ((300 - 1) << 14)
+        lossless = b'\x2f' + bits.to_bytes(4, 'little') + b'\0' * 4
+        self.assertEqual(self.probe(webp_bytes(b'VP8L', lossless)), (400, 300))
+        extended = b'\0' * 4 + (400 - 1).to_bytes(3, 'little') + (300 - 1).to_bytes(3, 'little')
+        self.assertEqual(self.probe(webp_bytes(b'VP8X', extended)), (400, 300))
+
+    def test_unknown_and_truncated(self):
+        self.assertIsNone(self.probe(b'not an image'))
+        self.assertIsNone(self.probe(jpeg_bytes(640, 480)[:30]))
+        self.assertIsNone(self.probe(b'\x89PNG\r\n\x1a\n'))
+
+    def test_repository_image(self):
+        image = Path(__file__).parent.parent / 'static' / 'images' / 'rivendell.png'
+        self.assertEqual(probe_image(image), (1344, 896))
+
+
+class TestProbeStaticImages(unittest.TestCase):
+    def test_caches_by_size_and_mtime(self):
+        with TemporaryDirectory() as temp_dir:
+            static = Path(temp_dir) / 'static'
+            (static / 'images').mkdir(parents=True)
+            (static / 'images' / 'a.png').write_bytes(png_bytes(10, 20))
+            (static / 'index.css').write_text('body {}')
+            cache_path = Path(temp_dir) / 'cache' / 'images.json'
+
+            self.assertEqual(probe_static_images(static, cache_path), {'/images/a.png': (10, 20)})
+
+            # A cached entry is trusted while size and mtime match
+            cache = json.loads(cache_path.read_text())
+            cache['images']['/images/a.png'][2:] = [1, 2]
+            cache_path.write_text(json.dumps(cache))
+            self.assertEqual(probe_static_images(static, cache_path), {'/images/a.png': (1, 2)})
+
+            (static / 'images' / 'a.png').write_bytes(png_bytes(30, 40) + b'changed')
+            self.assertEqual(probe_static_images(static, cache_path), {'/images/a.png': (30, 40)})
+
+
+class TestImageDimensions(unittest.TestCase):
+    def test_adds_size_and_lazy_loading_below_the_first_image(self):
+        transform = ImageDimensions({'/images/a.png': (10, 20)})
+        html = render_content('![a](../images/a.png)\n\n![b](https://example.com/b.png)',
+                              transforms=(transform,), page_url='/blog/post.html')
+        self.assertEqual(html, '<div><img alt="a" src="../images/a.png" width="10" height="20" '
+                               'decoding="async"/><img alt="b" src="https://example.com/b.png" '
+                               'loading="lazy" decoding="async"/></div>')
+
+    def test_cache_key_follows_dimensions(self):
+        self.assertEqual(ImageDimensions({'/a.png': (1, 2)}).cache_key,
+                         ImageDimensions({'/a.png': (1, 2)}).cache_key)
+        self.assertNotEqual(ImageDimensions({'/a.png': (1, 2)}).cache_key,
+                            ImageDimensions({'/a.png': (2, 2)}).cache_key)
+
+
+if __name__ == '__main__':
+    unittest.main()
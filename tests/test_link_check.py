@@ -0,0 +1,100 @@
+import threading
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from link_check import (BrokenReference, LinkChecker, build_output_index, collect_references,
+                        is_known_output, resolve_reference)
+from page_guard import PageGuard
+from page_index import iter_page_paths
+from workers import parallel_map, process_context
+
+
+def held_back(release: threading.Event, items):
+    """Yield `items` once `release` is set, like a scan still listing pages."""
+    release.wait(30)
+    yield from items
+
+
+class TestLinkCheck(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.content_dir = self.root / 'content'
+        self.static_dir = self.root / 'static'
+        (self.content_dir / 'majesty').mkdir(parents=True)
+        (self.static_dir / 'images').mkdir(parents=True)
+        (self.static_dir / 'images' / 'rivendell.png').write_bytes(b'png')
+        (self.content_dir / 'index.md').write_text(
+            '# Home\n\nRead [this](/majesty) and [that](/missing.html).\n')
+        (self.content_dir / 'majesty' / 'index.md').write_text(
+            '# Majesty\n\n[Back](/)\n\n![ok](/images/rivendell.png)\n'
+            '![relative](../images/gone.png)\n[wiki](https://example.com/x)\n'
+            '```\n[not a link](/nowhere)\n```\n[sibling](notes.html#top)\n')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_output_index(self):
+        index = build_output_index(self.content_dir, self.static_dir, ['/page/1.html'])
+        self.assertEqual(index, {'/', '/index.html', '/majesty/', '/majesty/index.html',
+                                 '/images/rivendell.png', '/page/1.html'})
+
+    def test_resolve_reference(self):
+        self.assertEqual(resolve_reference('/majesty/', '../images/a.png'), '/images/a.png')
+        self.assertEqual(resolve_reference('/majesty/', 'notes.html#top'), '/majesty/notes.html')
+        self.assertEqual(resolve_reference('/', '/a%20b.html?x=1'), '/a b.html')
+        self.assertIsNone(resolve_reference('/', 'https://example.com/'))
+        self.assertIsNone(resolve_reference('/', 'mailto:me@example.com'))
+        self.assertIsNone(resolve_reference('/', '#section'))
+
+    def test_is_known_output(self):
+        index = {'/majesty/', '/majesty/index.html', '/sub/index.html'}
+        self.assertTrue(is_known_output('/majesty', index))
+        self.assertTrue(is_known_output('/sub/', index))
+        self.assertFalse(is_known_output('/other', index))
+
+    def test_collect_references_skips_code_blocks(self):
+        md_path = str(self.content_dir / 'majesty' / 'index.md')
+        source, references = collect_references((str(self.content_dir), md_path))
+        self.assertEqual(source, md_path)
+        self.assertEqual(references, [
+            (3, 'link', '/', '/'),
+            (5, 'image', '/images/rivendell.png', '/images/rivendell.png'),
+            (6, 'image', '/images/gone.png', '../images/gone.png'),
+            (11, 'link', '/majesty/notes.html', 'notes.html#top'),
+        ])
+
+    def test_checker_reports_broken_references(self):
+        index = build_output_index(self.content_dir, self.static_dir)
+        checker = LinkChecker(self.content_dir, index, workers=2).start()
+        checker.add_outputs(['/majesty/notes.html'])
+        broken = sorted(checker.wait())
+        self.assertEqual(broken, [
+            BrokenReference(str(self.content_dir / 'index.md'), 3, 'link', '/missing.html'),
+            BrokenReference(str(self.content_dir / 'majesty' / 'index.md'), 6, 'image', '../images/gone.png'),
+        ])
+        self.assertTrue(str(broken[0]).endswith('index.md:3: broken link /missing.html'))
+
+    def test_no_process_is_forked_while_the_checker_runs(self):
+        index = build_output_index(self.content_dir, self.static_dir)
+        release = threading.Event()
+        md_paths = held_back(release, iter_page_paths(self.content_dir, include_section_index=True))
+        checker = LinkChecker(self.content_dir, index, workers=2, md_paths=md_paths).start()
+        try:
+            # What the build starts while the scan runs
+            self.assertIn(process_context().get_start_method(), ('forkserver', 'spawn'))
+            self.assertEqual(list(parallel_map(str.upper, ['a', 'b'], workers=2)), ['A', 'B'])
+            with PageGuard(wall_time=30) as guard:
+                self.assertIn('<h1>Hi</h1>', guard.parse('# Hi').to_html())
+        finally:
+            release.set()
+        self.assertEqual(len(checker.wait()), 3)
+
+    def test_checker_without_start(self):
+        index = build_output_index(self.content_dir, self.static_dir)
+        broken = LinkChecker(self.content_dir, index, workers=1).wait()
+        self.assertEqual(len(broken), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import re
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from page_index import extract_summary, iter_page_records, sort_records
+from listing import generate_listing_pages, listing_page_url
+
+
+class TestPageIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.content_dir = Path(self.temp_dir.name) / 'content'
+        self.section_dir = self.content_dir / 'posts'
+        self.section_dir.mkdir(parents=True)
+        (self.section_dir / 'index.md').write_text('# Posts')
+        for i in range(5):
+            (self.section_dir / f'post{i}.md').write_text(f'# Post {4 - i}\n\nBody {i}')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_records_skip_section_index(self):
+        records = list(iter_page_records(self.content_dir, 'posts'))
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]["url"], '/posts/post0.html')
+        self.assertEqual(records[0]["title"], 'Post 4')
+        self.assertEqual(records[0]["summary"], 'Body 0')
+
+    def test_missing_section(self):
+        with self.assertRaises(ValueError):
+            list(iter_page_records(self.content_dir, 'nope'))
+
+    def test_extract_summary(self):
+        markdown = "# Title\n\nSome **bold** and [a link](/x) here.\n\nSecond paragraph"
+        self.assertEqual(extract_summary(markdown), 'Some bold and a link here.')
+        self.assertEqual(extract_summary("# Only a title"), '')
+
+    def test_sort_in_memory(self):
+        records = [{"url": f"/{i}", "title": t} for i, t in enumerate("cab")]
+        total, ordered = sort_records(records, "title")
+        self.assertEqual(total, 3)
+        self.assertEqual([r["title"] for r in ordered], ["a", "b", "c"])
+
+    def test_sort_spills_and_merges(self):
+        records = [{"url": f"/{i:03}", "title": f"t{(i * 37) % 101:03}"} for i in range(101)]
+        total, ordered = sort_records(iter(records), "title", reverse=True, memory_budget=7)
+        ordered = list(ordered)
+        self.assertEqual(total, 101)
+        self.assertEqual(ordered, sorted(records, key=lambda r: (r["title"], r["url"]), reverse=True))
+
+    def test_sort_invalid_budget(self):
+        with self.assertRaises(ValueError):
+            sort_records([], "title", memory_budget=0)
+
+
+class TestListing(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.content_dir = self.root / 'content'
+        self.dest_dir = self.root / 'public'
+        self.template = self.root / 'template.html'
+        self.template.write_text('<title>{{ Title }}</title>{{ Content }}')
+        (self.content_dir / 'majesty').mkdir(parents=True)
+        for i in range(7):
+            (self.content_dir / 'majesty' / f'p{i}.md').write_text(f'# Page {i}')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_listing_page_url(self):
+        self.assertEqual(listing_page_url('/majesty/', 2), '/majesty/page/2.html')
+        self.assertEqual(listing_page_url('', 1), '/page/1.html')
+
+    def test_pagination(self):
+        page_count = generate_listing_pages(self.content_dir, 'majesty', self.template,
+                                            self.dest_dir, per_page=3, memory_budget=2)
+        self.assertEqual(page_count, 3)
+
+        first = (self.dest_dir / 'majesty' / 'page' / '1.html').read_text()
+        last = (self.dest_dir / 'majesty' / 'page' / '3.html').read_text()
+        self.assertIn('<title>majesty (page 1 of 3)</title>', first)
+        self.assertEqual(re.findall(r'>(Page \d)<', first), ['Page 0', 'Page 1', 'Page 2'])
+        self.assertIn('href="/majesty/page/2.html" rel="next"', first)
+        self.assertNotIn('rel="prev"', first)
+        self.assertEqual(re.findall(r'>(Page \d)<', last), ['Page 6'])
+        self.assertIn('href="/majesty/page/2.html" rel="prev"', last)
+        self.assertNotIn('rel="next"', last)
+
+    def test_empty_section(self):
+        (self.content_dir / 'empty').mkdir()
+        page_count = generate_listing_pages(self.content_dir, 'empty', self.template, self.dest_dir)
+        self.assertEqual(page_count, 1)
+        self.assertIn('No pages yet.', (self.dest_dir / 'empty' / 'page' / '1.html').read_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from leafnode import LeafNode
+from parentnode import ParentNode
+from minify import Minifier, minify_template
+from render_cache import RenderCache
+from utils import generate_page, markdown_to_html_node
+
+
+class TestMinifyTemplate(unittest.TestCase):
+    def test_strips_whitespace_around_block_tags(self):
+        template = """<!DOCTYPE html>
+<html>
+<head>
+    <title> {{ Title }} </title>
+</head>
+<body>
+    <!-- main content -->
+    <article>
+        {{ Content }}
+    </article>
+</body>
+</html>
+"""
+        self.assertEqual(minify_template(template),
+                         '<!DOCTYPE html><html><head><title>{{ Title }}</title></head>'
+                         '<body><article>{{ Content }}</article></body></html>')
+
+    def test_keeps_inline_spacing(self):
+        self.assertEqual(minify_template('<p>a <b>b</b>\n   <i>c</i></p>'),
+                         '<p>a <b>b</b> <i>c</i></p>')
+
+    def test_preserves_pre_and_code(self):
+        template = '<div>\n<pre>\n  keep   this\n</pre>\n<code>  and  this </code>\n</div>'
+        self.assertEqual(minify_template(template),
+                         '<div><pre>\n  keep   this\n</pre><code>  and  this </code></div>')
+
+
+class TestStreamingMinify(unittest.TestCase):
+    def test_iter_html_matches_to_html(self):
+        node = markdown_to_html_node("# Title\n\nSome *text*\nover lines")
+        self.assertEqual("".join(node.iter_html()), node.to_html())
+
+    def test_collapses_text_but_not_code(self):
+        node = ParentNode("div", [
+            ParentNode("p", [LeafNode(None, "two\n  lines", None, None),
+                             LeafNode("code", "a  b", None, None)]),
+            ParentNode("pre", [LeafNode(None, "  keep\n  me", None, None)]),
+        ])
+        minifier = Minifier()
+        self.assertEqual("".join(node.iter_html(minifier)),
+                         '<div><p>two lines<code>a  b</code></p><pre>  keep\n  me</pre></div>')
+        self.assertEqual(minifier.saved, 2)
+
+    def test_generate_page_reports_bytes_saved(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'page.md').write_text('# Title\n\n> quoted\n>   lines\n\n```\n  code  block\n```')
+            (root / 'template.html').write_text('<html>\n  <body>\n    {{ Content }}\n  </body>\n</html>\n')
+            minifier = Minifier()
+            cache = RenderCache(root / 'cache')
+            for _ in range(2):
+                generate_page(root / 'page.md', root / 'template.html', root / 'page.html', cache,
+                              minifier=minifier)
+
+            html = (root / 'page.html').read_text()
+            self.assertEqual(html, '<html><body><div><h1>Title</h1><blockquote>quoted lines</blockquote>'
+                                   '<code>code  block</code></div></body></html>')
+
+            generate_page(root / 'page.md', root / 'template.html', root / 'plain.html')
+            saved = len((root / 'plain.html').read_text()) - len(html)
+            self.assertEqual(minifier.pages, {str(root / 'page.html'): saved})
+            self.assertEqual(cache.hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
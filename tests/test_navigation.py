@@ -0,0 +1,70 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from navigation import NavTree, build_nav_tree
+from utils import generate_pages_recursive
+
+
+class TestNavigation(unittest.TestCase):
+    def setUp(self):
+        self.tree = NavTree.from_paths([
+            'index.md',
+            'about.md',
+            'majesty/index.md',
+            'majesty/rings.md',
+            'majesty/elves/lorien.md',
+        ])
+
+    def test_sections(self):
+        self.assertEqual(len(self.tree), 3)
+        majesty = self.tree.section('majesty')
+        self.assertEqual(majesty.url, '/majesty/')
+        self.assertEqual([s.path for s in majesty.sections], ['majesty/elves'])
+        self.assertEqual(majesty.pages, [('rings', '/majesty/rings.html')])
+
+    def test_unknown_section_falls_back_to_root(self):
+        self.assertIs(self.tree.section('nope'), self.tree.root)
+        self.assertIs(self.tree.section('.'), self.tree.root)
+
+    def test_nav_html(self):
+        self.assertEqual(
+            self.tree.section('majesty').nav_html(),
+            '<ul class="nav"><li><a href="/majesty/elves/">elves</a></li>'
+            '<li><a href="/majesty/rings.html">rings</a></li></ul>')
+        self.assertEqual(self.tree.section('majesty/elves').nav_html(),
+                         '<ul class="nav"><li><a href="/majesty/elves/lorien.html">lorien</a></li></ul>')
+
+    def test_breadcrumbs_html(self):
+        self.assertEqual(
+            self.tree.section('majesty/elves').breadcrumbs_html(),
+            '<a href="/">Home</a> / <a href="/majesty/">majesty</a> / '
+            '<a href="/majesty/elves/">elves</a>')
+
+    def test_fragments_rendered_once(self):
+        section = self.tree.section('majesty')
+        self.assertIs(section.nav_html(), section.nav_html())
+
+    def test_pages_splice_section_fragments(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            content = root / 'content'
+            (content / 'majesty').mkdir(parents=True)
+            (content / 'index.md').write_text('# Home')
+            (content / 'majesty' / 'index.md').write_text('# Majesty')
+            (content / 'majesty' / 'rings.md').write_text('# Rings')
+            template = root / 'template.html'
+            template.write_text('<nav>{{ Breadcrumbs }}</nav><aside>{{ Nav }}</aside>{{ Content }}')
+
+            tree = build_nav_tree(content)
+            generate_pages_recursive(content, template, root / 'public', nav=tree)
+
+            rings = (root / 'public' / 'majesty' / 'rings.html').read_text()
+            self.assertIn('<nav><a href="/">Home</a> / <a href="/majesty/">majesty</a></nav>', rings)
+            self.assertIn('<a href="/majesty/rings.html">rings</a>', rings)
+            home = (root / 'public' / 'index.html').read_text()
+            self.assertIn('<nav><a href="/">Home</a></nav>', home)
+            self.assertIn('<a href="/majesty/">majesty</a>', home)
+
+
+if __name__ == '__main__':
+    unittest.main()
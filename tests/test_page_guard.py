@@ -0,0 +1,118 @@
+import time
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from main import main, parse_args
+from page_guard import PageBudgetExceeded, PageGuard
+from utils import PLACEHOLDER_CONTENT, markdown_to_html_node, render_pages
+
+
+def stalling_parse(markdown: str):
+    """Stands in for a parser stuck on a pathological page."""
+    if 'SLEEP' in markdown:
+        time.sleep(60)
+    if 'SPIN' in markdown:
+        while True:
+            pass
+    if 'RAISE' in markdown:
+        raise ValueError("unparseable")
+    return markdown_to_html_node(markdown)
+
+
+class TestPageGuard(unittest.TestCase):
+    def test_parses_in_worker(self):
+        with PageGuard(wall_time=10) as guard:
+            node = guard.parse('# Title\n\nSome **bold** text.')
+            self.assertEqual(node.to_html(), markdown_to_html_node('# Title\n\nSome **bold** text.').to_html())
+
+    def test_wall_time_kills_and_replaces_worker(self):
+        with PageGuard(wall_time=0.5, parse=stalling_parse) as guard:
+            start = time.monotonic()
+            with self.assertRaisesRegex(PageBudgetExceeded, 'took over 0.5s'):
+                guard.parse('SLEEP')
+            self.assertLess(time.monotonic() - start, 10)
+            self.assertEqual(guard.killed, 1)
+            self.assertIn('<h1>Fine</h1>', guard.parse('# Fine').to_html())
+
+    def test_cpu_time(self):
+        with PageGuard(cpu_time=0.2, parse=stalling_parse) as guard:
+            with self.assertRaisesRegex(PageBudgetExceeded, 'CPU time'):
+                guard.parse('SPIN')
+            self.assertIn('<h1>Fine</h1>', guard.parse('# Fine').to_html())
+
+    def test_input_size(self):
+        with PageGuard(max_bytes=10) as guard:
+            with self.assertRaisesRegex(PageBudgetExceeded, '11 bytes'):
+                guard.parse('é' * 5 + 'x')
+            self.assertIsNone(guard._process)
+
+    def test_parser_errors_are_raised(self):
+        with PageGuard(wall_time=10, parse=stalling_parse) as guard:
+            with self.assertRaisesRegex(ValueError, 'unparseable'):
+                guard.parse('RAISE')
+            self.assertEqual(guard.killed, 0)
+
+    def test_render_pages_leaves_out_or_replaces_slow_pages(self):
+        sources = {'index.md': '# Home', 'slow.md': '# Slow\n\nSLEEP', 'about.md': '# About'}
+        template = '<title>{{ Title }}</title>{{ Content }}'
+        with PageGuard(wall_time=0.5, parse=stalling_parse) as guard:
+            pages = dict((path, document) for path, document, _ in render_pages(sources, template, guard=guard))
+        self.assertEqual(list(pages), ['index.html', 'about.html'])
+        self.assertEqual(guard.offending, [('slow.md', 'parsing took over 0.5s')])
+
+        with PageGuard(wall_time=0.5, placeholder=True, parse=stalling_parse) as guard:
+            pages = dict((path, document) for path, document, _ in render_pages(sources, template, guard=guard))
+        self.assertEqual(pages['slow.html'], '<title>Slow</title>' + PLACEHOLDER_CONTENT)
+        self.assertIn('<h1>About</h1>', pages['about.html'])
+
+
+class TestPageBudgetBuild(unittest.TestCase):
+    def make_project(self, root: Path):
+        (root / 'content').mkdir()
+        (root / 'content' / 'index.md').write_text('# Home')
+        (root / 'content' / 'huge.md').write_text('# Huge\n\n' + 'word ' * 1000)
+        (root / 'template.html').write_text('<html><body>{{ Content }}</body></html>')
+
+    def test_fail_or_placeholder(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            self.make_project(root)
+            report = main(root, workers=1, max_page_bytes=1000, page_wall_time=30)
+            self.assertTrue(report.failed)
+            self.assertEqual(list(report.stages['budget']['over_budget']), ['huge.md'])
+            self.assertIn('huge.md', report.errors[0])
+            self.assertTrue((root / 'public' / 'index.html').exists())
+            self.assertFalse((root / 'public' / 'huge.html').exists())
+
+            report = main(root, workers=1, max_page_bytes=1000, on_page_error='placeholder')
+            self.assertFalse(report.failed)
+            self.assertEqual(report.stages['budget']['placeholders'], 1)
+            self.assertIn(PLACEHOLDER_CONTENT.encode(), (root / 'public' / 'huge.html').read_bytes())
+
+    def test_budgets_apply_to_cached_pages(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            self.make_project(root)
+            self.assertFalse(main(root, workers=1).failed)
+
+            report = main(root, workers=1, max_page_bytes=1000)
+            self.assertTrue(report.failed)
+            self.assertEqual(list(report.stages['budget']['over_budget']), ['huge.md'])
+
+            # Rendered without a time budget, so parsed again under one
+            report = main(root, workers=1, page_wall_time=30)
+            self.assertEqual(report.stages['render']['cache_misses'], 2)
+            report = main(root, workers=1, page_wall_time=30)
+            self.assertEqual(report.stages['render']['cache_misses'], 0)
+
+    def test_command_line(self):
+        args = parse_args(['--page-timeout', '2.5', '--page-cpu-time', '1', '--max-page-bytes', '1000000',
+                           '--on-page-error', 'placeholder'])
+        self.assertEqual((args.page_timeout, args.page_cpu_time, args.max_page_bytes, args.on_page_error),
+                         (2.5, 1.0, 1_000_000, 'placeholder'))
+        with self.assertRaises(SystemExit):
+            parse_args(['--on-page-error', 'ignore'])
+
+
+if __name__ == '__main__':
+    unittest.main()
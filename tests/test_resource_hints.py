@@ -0,0 +1,98 @@
+import json
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from assets import AssetCache, AssetInliner
+from image_probe import ImageDimensions
+from leafnode import LeafNode
+from main import main
+from render_cache import RenderCache
+from resource_hints import ResourceHints
+from utils import render_content, render_markdown
+
+
+class TestResourceHints(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.graph_path = Path(self.temp_dir.name) / 'link-graph.json'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_preloads_first_image_and_prefetches_linked_pages(self):
+        hints = ResourceHints(self.graph_path)
+        markdown = ('![hero](/images/hero.png)\n\n![second](/images/second.png)\n\n'
+                    '[a](/a.html) [self](/post.html) [css](/index.css) [b](b/) [external](https://example.com/)')
+        html = render_content(markdown, transforms=(hints,), page_url='/post.html')
+        self.assertTrue(html.startswith('<div><link rel="preload" as="image" href="/images/hero.png"/>'
+                                        '<link rel="prefetch" href="/a.html"/><link rel="prefetch" href="/b/"/>'
+                                        '<img alt="hero"'))
+        self.assertEqual(hints.graph, {'/post.html': ['/a.html', '/b/']})
+        self.assertEqual((hints.preloads, hints.prefetches), (1, 2))
+
+    def test_preloaded_image_is_not_lazy(self):
+        dimensions = ImageDimensions({'/images/hero.png': (800, 400), '/images/second.png': (10, 10)})
+        # The first image is inlined, so the second is the one preloaded
+        public = Path(self.temp_dir.name) / 'public'
+        (public / 'images').mkdir(parents=True)
+        (public / 'images' / 'tiny.png').write_bytes(b'\x89PNG')
+        (public / 'images' / 'hero.png').write_bytes(b'\x89PNG' + bytes(100_000))
+        inliner = AssetInliner(public, AssetCache(), inline_css=False, inline_images=True)
+        markdown = '![tiny](/images/tiny.png)\n\n![hero](/images/hero.png)\n\n![second](/images/second.png)'
+        html = render_content(markdown, transforms=(dimensions, inliner, ResourceHints(self.graph_path)),
+                              page_url='/post.html')
+        self.assertIn('<link rel="preload" as="image" href="/images/hero.png"/>', html)
+        self.assertIn('<img alt="hero" src="/images/hero.png" width="800" height="400" decoding="async"/>', html)
+        self.assertIn('<img alt="second" src="/images/second.png" width="10" height="10" loading="lazy" ', html)
+
+    def test_ranks_prefetches_by_previous_link_graph(self):
+        self.graph_path.write_text(json.dumps({"version": 1, "pages": {
+            '/x.html': ['/c.html'], '/y.html': ['/c.html', '/b.html'], '/z.html': ['/c.html'],
+        }}))
+        hints = ResourceHints(self.graph_path)
+        html = render_content('[a](/a.html) [b](/b.html) [c](/c.html)', transforms=(hints,), page_url='/')
+        self.assertTrue(html.startswith('<div><link rel="prefetch" href="/c.html"/>'
+                                        '<link rel="prefetch" href="/b.html"/><p>'))
+
+    def test_save_keeps_cached_pages_and_drops_removed_ones(self):
+        self.graph_path.write_text(json.dumps({"version": 1, "pages": {
+            '/cached.html': ['/a.html'], '/removed.html': ['/a.html'],
+        }}))
+        hints = ResourceHints(self.graph_path)
+        render_content('[b](/b.html)', transforms=(hints,), page_url='/new.html')
+        hints.save(['/cached.html', '/new.html'])
+        self.assertEqual(json.loads(self.graph_path.read_text())['pages'],
+                         {'/cached.html': ['/a.html'], '/new.html': ['/b.html']})
+
+    def test_cache_key_follows_link_graph(self):
+        cache = RenderCache(Path(self.temp_dir.name) / 'cache')
+        first = ResourceHints(self.graph_path)
+        render_markdown('[a](/a.html)', cache, transforms=(first,), page_url='/')
+        first.save(['/'])
+        self.assertNotEqual(ResourceHints(self.graph_path).cache_key, first.cache_key)
+
+    def test_link_is_a_void_element(self):
+        self.assertEqual(LeafNode("link", "", None, {"rel": "prefetch", "href": "/a.html"}).to_html(),
+                         '<link rel="prefetch" href="/a.html"/>')
+
+
+class TestResourceHintsBuild(unittest.TestCase):
+    def test_build_writes_link_graph(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'content' / 'blog').mkdir(parents=True)
+            (root / 'content' / 'index.md').write_text('# Home\n\n[post](/blog/post.html)')
+            (root / 'content' / 'blog' / 'post.md').write_text('# Post\n\n![hero](/images/hero.png)\n\n[home](/)')
+            (root / 'template.html').write_text('{{ Content }}')
+
+            report = main(root, resource_hints=True, workers=1)
+
+            self.assertEqual(report.stages['hints'], {'preloads': 1, 'prefetches': 2})
+            graph = json.loads((root / '.cache' / 'link-graph.json').read_text())['pages']
+            self.assertEqual(graph, {'/': ['/blog/post.html'], '/blog/post.html': ['/']})
+            self.assertIn('<link rel="prefetch" href="/blog/post.html"/>',
+                          (root / 'public' / 'index.html').read_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
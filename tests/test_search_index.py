@@ -0,0 +1,79 @@
+import unittest
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from search_index import (build_search_index, delta_decode, delta_encode, extract_terms,
+                          shard_name)
+from workers import parallel_map
+
+
+def square(x):
+    return x * x
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.content_dir = self.root / 'content'
+        self.dest_dir = self.root / 'public'
+        (self.content_dir / 'majesty').mkdir(parents=True)
+        (self.content_dir / 'index.md').write_text('# Tolkien Fan Club\n\nI like **Tolkien**.')
+        (self.content_dir / 'majesty' / 'index.md').write_text(
+            '# Majesty\n\nThe [Silmarillion](/x) by Tolkien\n\n```\nsecretcode\n```')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def load(self, name):
+        return json.loads((self.dest_dir / 'search' / name).read_text())
+
+    def test_extract_terms(self):
+        terms = extract_terms('# A Title\n\nSome *italic* and `code` and ![alt](/img.png)\n\n```\nskipped\n```')
+        self.assertEqual(terms, ['alt', 'and', 'code', 'italic', 'some', 'title'])
+
+    def test_delta_round_trip(self):
+        self.assertEqual(delta_encode([3, 5, 9]), [3, 2, 4])
+        self.assertEqual(delta_decode([3, 2, 4]), [3, 5, 9])
+
+    def test_shard_name(self):
+        self.assertEqual(shard_name('tolkien'), 'to')
+        self.assertEqual(shard_name('é'), 'xc3a9')
+
+    def check_index(self, **kwargs):
+        stats = build_search_index(self.content_dir, self.dest_dir, workers=1, **kwargs)
+        self.assertEqual(stats["documents"], 2)
+
+        manifest = self.load('manifest.json')
+        self.assertIn('to', manifest["shards"])
+        self.assertEqual(self.load('docs-0.json'),
+                         [['/', 'Tolkien Fan Club'], ['/majesty/', 'Majesty']])
+
+        shard = self.load('terms/to.json')
+        self.assertEqual(delta_decode(shard['tolkien']), [0, 1])
+        self.assertEqual(delta_decode(self.load('terms/si.json')['silmarillion']), [1])
+        self.assertNotIn('se', manifest["shards"])
+
+    def test_build_in_memory(self):
+        self.check_index()
+
+    def test_build_with_spills(self):
+        self.check_index(postings_budget=1)
+
+    def test_build_in_worker_pool(self):
+        stats = build_search_index(self.content_dir, self.dest_dir, workers=2)
+        self.assertEqual(stats["documents"], 2)
+        self.assertEqual(delta_decode(self.load('terms/to.json')['tolkien']), [0, 1])
+
+
+class TestParallelMap(unittest.TestCase):
+    def test_preserves_order(self):
+        self.assertEqual(list(parallel_map(square, range(100), workers=2, batch_size=7)),
+                         [x * x for x in range(100)])
+
+    def test_inline(self):
+        self.assertEqual(list(parallel_map(square, [1, 2, 3], workers=1)), [1, 4, 9])
+
+
+if __name__ == '__main__':
+    unittest.main()
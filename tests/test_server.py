@@ -0,0 +1,258 @@
+import unittest
+import gzip
+import http.client
+import threading
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from main import parse_args
+from server import FileCache, PackServer, PreviewServer, StaticServer, parse_range
+from sinks import PackSink
+
+
+class TestParseRange(unittest.TestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=50-500', 100), (50, 99))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range('items=0-1', 100))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=100-', 100)
+        with self.assertRaises(ValueError):
+            parse_range('bytes=abc', 100)
+
+
+class TestStaticServer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        (self.root / 'majesty').mkdir()
+        (self.root / 'index.html').write_text('<p>home</p>')
+        (self.root / 'majesty' / 'index.html').write_text('<p>majesty</p>')
+        (self.root / 'index.css').write_text('body{}' * 100)
+        (self.root / 'index.css.gz').write_bytes(gzip.compress(b'body{}' * 100))
+        self.big = bytes(range(256)) * 64
+        (self.root / 'big.bin').write_bytes(self.big)
+        self.server = StaticServer(('127.0.0.1', 0), self.root, max_cached_file=1024, quiet=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.connection = http.client.HTTPConnection('127.0.0.1', self.server.server_address[1])
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def get(self, path, headers=None):
+        self.connection.request('GET', path, headers=headers or {})
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_serves_index_and_keeps_alive(self):
+        response, body = self.get('/')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b'<p>home</p>')
+        self.assertEqual(response.getheader('Content-Type'), 'text/html')
+        response, body = self.get('/majesty/')
+        self.assertEqual(body, b'<p>majesty</p>')
+        self.assertEqual(self.server.file_cache.misses, 2)
+        self.get('/')
+        self.assertEqual(self.server.file_cache.hits, 1)
+
+    def test_directory_redirect_and_missing(self):
+        response, _ = self.get('/majesty')
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader('Location'), '/majesty/')
+        response, _ = self.get('/nope.html')
+        self.assertEqual(response.status, 404)
+        response, _ = self.get('/../../etc/passwd')
+        self.assertEqual(response.status, 404)
+
+    def test_conditional_requests(self):
+        response, _ = self.get('/')
+        etag = response.getheader('ETag')
+        response, body = self.get('/', {'If-None-Match': etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b'')
+        response, _ = self.get('/', {'If-Modified-Since': response.getheader('Last-Modified')})
+        self.assertEqual(response.status, 304)
+        response, _ = self.get('/', {'If-None-Match': '"other"'})
+        self.assertEqual(response.status, 200)
+
+    def test_precompressed_sibling(self):
+        response, body = self.get('/index.css', {'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(response.getheader('Content-Encoding'), 'gzip')
+        self.assertEqual(response.getheader('Content-Type'), 'text/css')
+        self.assertEqual(gzip.decompress(body), b'body{}' * 100)
+        response, body = self.get('/index.css')
+        self.assertIsNone(response.getheader('Content-Encoding'))
+        self.assertEqual(body, b'body{}' * 100)
+
+    def test_range_requests_large_file(self):
+        response, body = self.get('/big.bin', {'Range': 'bytes=1000-1999'})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.getheader('Content-Range'), f'bytes 1000-1999/{len(self.big)}')
+        self.assertEqual(body, self.big[1000:2000])
+        response, body = self.get('/big.bin')
+        self.assertEqual(body, self.big)
+        response, _ = self.get('/big.bin', {'Range': f'bytes={len(self.big)}-'})
+        self.assertEqual(response.status, 416)
+
+
+class TestFileCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        with TemporaryDirectory() as temp_dir:
+            paths = []
+            for name in 'abc':
+                path = Path(temp_dir) / name
+                path.write_bytes(b'x' * 10)
+                paths.append(str(path))
+            cache = FileCache(max_bytes=25)
+            for path in paths:
+                cache.get(path, Path(path).stat())
+            self.assertEqual(cache.size, 20)
+            cache.get(paths[0], Path(paths[0]).stat())
+            self.assertEqual(cache.misses, 4)
+
+
+class TestCommandLine(unittest.TestCase):
+    def test_project_dir_before_or_after_command(self):
+        for argv in (['--project-dir', 'site', 'serve', '--port', '9000'],
+                     ['--project-dir=site', 'serve', '--port', '9000'],
+                     ['serve', '--project-dir', 'site', '--port', '9000']):
+            args = parse_args(argv)
+            self.assertEqual((args.command, args.project_dir, args.port), ('serve', 'site', 9000), argv)
+        args = parse_args(['--project-dir', 'site', 'cache', 'export', 'cache.tar.gz'])
+        self.assertEqual((args.command, args.project_dir, args.action), ('cache', 'site', 'export'))
+        args = parse_args(['--project-dir', 'site', '--minify'])
+        self.assertEqual((args.command, args.project_dir, args.minify), ('build', 'site', True))
+        self.assertEqual(parse_args([]).command, 'build')
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestPreviewServer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.project = Path(self.temp_dir.name)
+        content = self.project / 'content'
+        (content / 'majesty').mkdir(parents=True)
+        (self.project / 'static' / 'images').mkdir(parents=True)
+        (self.project / 'static' / 'images' / 'a.png').write_bytes(b'png')
+        (self.project / 'template.html').write_text('<nav>{{ Breadcrumbs }}</nav>{{ Content }}')
+        (content / 'index.md').write_text('# Home')
+        (content / 'majesty' / 'index.md').write_text('# Majesty')
+        self.notes = content / 'majesty' / 'notes.md'
+        self.notes.write_text('# Notes')
+        self.server = PreviewServer(('127.0.0.1', 0), self.project, quiet=True)
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.connection = http.client.HTTPConnection('127.0.0.1', self.server.server_address[1])
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def get(self, path, headers=None):
+        self.connection.request('GET', path, headers=headers or {})
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_renders_pages_on_demand(self):
+        response, body = self.get('/majesty/notes.html')
+        self.assertEqual(response.status, 200)
+        self.assertIn(b'<h1>Notes</h1>', body)
+        self.assertIn(b'<a href="/majesty/">majesty</a>', body)
+        response, body = self.get('/')
+        self.assertIn(b'<h1>Home</h1>', body)
+        self.assertEqual(self.server.renders, 2)
+
+    def test_caches_until_source_changes(self):
+        response, _ = self.get('/majesty/notes.html')
+        etag = response.getheader('ETag')
+        response, _ = self.get('/majesty/notes.html', {'If-None-Match': etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(self.server.renders, 1)
+
+        self.notes.write_text('# Edited notes')
+        response, body = self.get('/majesty/notes.html')
+        self.assertIn(b'Edited notes', body)
+        self.assertEqual(self.server.renders, 2)
+
+    def test_static_files_and_redirects(self):
+        response, body = self.get('/images/a.png')
+        self.assertEqual(body, b'png')
+        response, _ = self.get('/majesty')
+        self.assertEqual(response.status, 301)
+        response, _ = self.get('/missing.html')
+        self.assertEqual(response.status, 404)
+
+
+class TestPackServer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.pack_path = Path(self.temp_dir.name) / 'site.pack'
+        self.big = bytes(range(256)) * 64
+        with PackSink(self.pack_path) as sink:
+            sink.write('index.html', b'<p>home</p>')
+            sink.write('majesty/index.html', b'<p>majesty</p>')
+            sink.write('index.css', b'body{}' * 100)
+            sink.write('index.css.gz', gzip.compress(b'body{}' * 100))
+            sink.write('big.bin', self.big)
+        self.server = PackServer(('127.0.0.1', 0), self.pack_path, max_cached_file=1024, quiet=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.connection = http.client.HTTPConnection('127.0.0.1', self.server.server_address[1])
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def get(self, path, headers=None):
+        self.connection.request('GET', path, headers=headers or {})
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_serves_files_from_pack(self):
+        response, body = self.get('/')
+        self.assertEqual((response.status, body), (200, b'<p>home</p>'))
+        self.assertEqual(self.get('/majesty/')[1], b'<p>majesty</p>')
+        response, _ = self.get('/majesty')
+        self.assertEqual((response.status, response.getheader('Location')), (301, '/majesty/'))
+        self.assertEqual(self.get('/nope.html')[0].status, 404)
+        self.assertEqual(self.get('/../index.css')[1], b'body{}' * 100)
+
+    def test_conditional_gzip_and_ranges(self):
+        response, _ = self.get('/')
+        response, _ = self.get('/', {'If-None-Match': response.getheader('ETag')})
+        self.assertEqual(response.status, 304)
+
+        response, body = self.get('/index.css', {'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.getheader('Content-Encoding'), 'gzip')
+        self.assertEqual(gzip.decompress(body), b'body{}' * 100)
+
+        response, body = self.get('/big.bin', {'Range': 'bytes=1000-9999'})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, self.big[1000:10000])
+        self.assertEqual(self.get('/big.bin')[1], self.big)
+
+    def test_request_uses_one_pack_throughout(self):
+        # A rebuild lands between reading the index and sending a large body
+        old_pack = self.server.current_pack()
+        self.server.current_pack = lambda: old_pack
+        with PackSink(self.pack_path) as sink:
+            sink.write('other.bin', b'x' * 1000)
+            sink.write('big.bin', bytes(reversed(self.big)))
+        self.assertEqual(self.get('/big.bin')[1], self.big)
+
+    def test_picks_up_rebuilt_pack(self):
+        with PackSink(self.pack_path) as sink:
+            sink.write('index.html', b'<p>rebuilt</p>')
+        self.assertEqual(self.get('/')[1], b'<p>rebuilt</p>')
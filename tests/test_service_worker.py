@@ -0,0 +1,127 @@
+import hashlib
+import json
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from main import main
+from service_worker import (ServiceWorkerRegistration, load_page_ranking, page_file, precache_entries,
+                            write_service_worker)
+
+
+class TestPrecacheEntries(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.public = Path(self.temp_dir.name)
+        (self.public / 'images').mkdir()
+        (self.public / 'blog').mkdir()
+        (self.public / 'index.css').write_text('c' * 100)
+        (self.public / 'index.html').write_text('h' * 200)
+        (self.public / 'blog' / 'index.html').write_text('b' * 300)
+        (self.public / 'blog' / 'post.html').write_text('p' * 400)
+        (self.public / 'images' / 'big.png').write_bytes(b'i' * 1000)
+        (self.public / 'images' / 'small.png').write_bytes(b'i' * 50)
+        (self.public / 'search.json').write_text('{}')
+        self.pages = ['/', '/blog/', '/blog/post.html']
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_orders_stylesheets_pages_then_images(self):
+        entries = precache_entries(self.public, self.pages, ['/blog/post.html', '/blog/'], budget=10_000)
+        self.assertEqual([entry['url'] for entry in entries],
+                         ['/index.css', '/', '/blog/post.html', '/blog/', '/images/small.png', '/images/big.png'])
+        self.assertEqual(entries[0], {'url': '/index.css', 'size': 100,
+                                      'hash': hashlib.sha256(b'c' * 100).hexdigest()[:16]})
+
+    def test_respects_budget(self):
+        entries = precache_entries(self.public, self.pages, ['/blog/post.html'], budget=800)
+        self.assertEqual([entry['url'] for entry in entries], ['/index.css', '/', '/blog/post.html', '/images/small.png'])
+        self.assertLessEqual(sum(entry['size'] for entry in entries), 800)
+
+    def test_ranking_from_link_graph(self):
+        graph_path = self.public / 'graph.json'
+        graph_path.write_text(json.dumps({"version": 1, "pages": {
+            '/': ['/blog/', '/blog/post.html'], '/blog/': ['/blog/post.html'], '/blog/post.html': ['/'],
+        }}))
+        self.assertEqual(load_page_ranking(graph_path), ['/blog/post.html', '/', '/blog/'])
+        self.assertEqual(load_page_ranking(self.public / 'missing.json'), [])
+
+    def test_page_file(self):
+        self.assertEqual(page_file(self.public, '/'), self.public / 'index.html')
+        self.assertEqual(page_file(self.public, '/blog/'), self.public / 'blog' / 'index.html')
+        self.assertEqual(page_file(self.public, '/blog/post.html'), self.public / 'blog' / 'post.html')
+
+
+class TestServiceWorker(unittest.TestCase):
+    def test_writes_manifest_and_script(self):
+        with TemporaryDirectory() as temp_dir:
+            public = Path(temp_dir)
+            entries = [{'url': '/index.css', 'hash': 'abc', 'size': 10}]
+            self.assertEqual(write_service_worker(public, entries), {'entries': 1, 'bytes': 10})
+            manifest = json.loads((public / 'precache-manifest.json').read_text())
+            self.assertEqual(manifest['entries'], entries)
+            script = (public / 'sw.js').read_text()
+            self.assertIn("fetch('/precache-manifest.json?v=' + VERSION", script)
+            self.assertIn(f"const VERSION = '{manifest['version']}';", script)
+            self.assertIn('oldHashes[entry.url] === entry.hash', script)
+
+            # The version, and with it the script, changes whenever any entry's hash does
+            write_service_worker(public, [{'url': '/index.css', 'hash': 'def', 'size': 10}])
+            self.assertNotEqual(json.loads((public / 'precache-manifest.json').read_text())['version'],
+                                manifest['version'])
+            self.assertNotEqual((public / 'sw.js').read_text(), script)
+
+    def test_registration_in_template(self):
+        registration = ServiceWorkerRegistration()
+        self.assertEqual(registration.apply_template('<body>{{ Content }}</body>'),
+                         "<body>{{ Content }}<script>if ('serviceWorker' in navigator) "
+                         "navigator.serviceWorker.register('/sw.js');</script></body>")
+
+
+class TestServiceWorkerBuild(unittest.TestCase):
+    def test_build_precaches_within_budget(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'static' / 'images').mkdir(parents=True)
+            (root / 'static' / 'index.css').write_text('body {}')
+            (root / 'static' / 'images' / 'huge.png').write_bytes(b'\0' * 5000)
+            (root / 'content').mkdir()
+            (root / 'content' / 'index.md').write_text('# Home\n\n[about](/about.html)')
+            (root / 'content' / 'about.md').write_text('# About')
+            (root / 'template.html').write_text('<body>{{ Content }}</body>')
+
+            report = main(root, service_worker=True, resource_hints=True, precache_budget=4096, workers=1)
+
+            manifest = json.loads((root / 'public' / 'precache-manifest.json').read_text())
+            self.assertEqual([entry['url'] for entry in manifest['entries']], ['/index.css', '/', '/about.html'])
+            self.assertEqual(report.stages['service_worker']['budget'], 4096)
+            self.assertIn("register('/sw.js')", (root / 'public' / 'about.html').read_text())
+            script = (root / 'public' / 'sw.js').read_text()
+
+            # Editing one precached asset gives a new service worker for browsers to install
+            main(root, service_worker=True, resource_hints=True, precache_budget=4096, workers=1)
+            self.assertEqual((root / 'public' / 'sw.js').read_text(), script)
+            (root / 'static' / 'index.css').write_text('body { color: red; }')
+            main(root, service_worker=True, resource_hints=True, precache_budget=4096, workers=1)
+            self.assertNotEqual((root / 'public' / 'sw.js').read_text(), script)
+
+    def test_ranks_pages_without_resource_hints(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'content' / 'blog').mkdir(parents=True)
+            (root / 'content' / 'index.md').write_text('# Home\n\n[post](/blog/post.html)')
+            (root / 'content' / 'about.md').write_text('# About\n\n[post](/blog/post.html) [home](/)')
+            (root / 'content' / 'blog' / 'post.md').write_text('# Post\n\n[about](/about.html)')
+            (root / 'content' / 'blog' / 'other.md').write_text('# Other')
+            (root / 'template.html').write_text('<body>{{ Content }}</body>')
+
+            main(root, service_worker=True, precache_budget=4096, workers=1)
+            manifest = json.loads((root / 'public' / 'precache-manifest.json').read_text())
+            self.assertEqual([entry['url'] for entry in manifest['entries']][:3],
+                             ['/', '/blog/post.html', '/about.html'])
+            self.assertEqual(load_page_ranking(root / '.cache' / 'link-graph.json'),
+                             ['/blog/post.html', '/', '/about.html'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from main import main, merge, parse_args
+from shard import load_shard_manifests, parse_shard, partition_pages
+
+BUILD_OPTIONS = dict(listings={'blog': 2}, feeds=['blog'], search=True, check_links=True, compress=True,
+                     minify=True, fingerprint=True, minify_css=True, service_worker=True, workers=1)
+
+
+def make_project(root: Path):
+    (root / 'static' / 'images').mkdir(parents=True)
+    (root / 'static' / 'index.css').write_text('body {\n    background: url(images/bg.png);\n}\n' * 40)
+    (root / 'static' / 'images' / 'bg.png').write_bytes(b'\x89PNG' + bytes(range(256)) * 8)
+    (root / 'content' / 'blog' / 'archive').mkdir(parents=True)
+    (root / 'content' / 'index.md').write_text('# Home\n\n[blog](/blog/) and [the page list](/blog/page/1.html)')
+    (root / 'content' / 'blog' / 'index.md').write_text('# Blog\n\n![bg](/images/bg.png)')
+    for number in range(7):
+        (root / 'content' / 'blog' / f'post-{number}.md').write_text(
+            f'# Post {number}\n\n' + f'Words about topic{number} and shared terms.\n\n' * (number + 1)
+            + f'[next](post-{(number + 1) % 7}.html) [home](/)')
+    (root / 'content' / 'blog' / 'archive' / 'old.md').write_text('# Old\n\n[missing](/nowhere.html)')
+    (root / 'template.html').write_text(
+        '<html>\n<head><link href="/index.css" rel="stylesheet"></head>\n<body>{{ Content }}</body>\n</html>')
+    # Feeds date entries by modification time; keep it the same in every copy
+    for md_path in (root / 'content').rglob('*.md'):
+        os.utime(md_path, ns=(1_700_000_000_000_000_000, 1_700_000_000_000_000_000))
+
+
+def read_tree(root: Path) -> dict:
+    return {path.relative_to(root).as_posix(): path.read_bytes()
+            for path in sorted(root.rglob('*')) if path.is_file()}
+
+
+class TestPartition(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard('2/4'), (2, 4))
+        for value in ('0/4', '5/4', 'a/b', '3'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_shard(value)
+
+    def test_partition_is_disjoint_balanced_and_stable(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_project(root)
+            assignment = partition_pages(root / 'content', 3)
+            self.assertEqual(len(assignment), 10)
+            self.assertEqual(set(assignment.values()), {1, 2, 3})
+            self.assertEqual(partition_pages(root / 'content', 3), assignment)
+
+            loads = {shard: 0 for shard in (1, 2, 3)}
+            for relative, shard in assignment.items():
+                loads[shard] += (root / 'content' / relative).stat().st_size
+            largest_page = max((root / 'content' / relative).stat().st_size for relative in assignment)
+            self.assertLessEqual(max(loads.values()) - min(loads.values()), largest_page)
+
+
+class TestShardedBuild(unittest.TestCase):
+    def test_merged_output_is_identical_to_single_build(self):
+        with TemporaryDirectory() as temp_dir:
+            temp_path = Path(temp_dir)
+            single = temp_path / 'single'
+            make_project(single)
+            single_report = main(single, **BUILD_OPTIONS)
+
+            shard_dirs = []
+            for index in (1, 2, 3):
+                shard_root = temp_path / f'shard-{index}'
+                shutil.copytree(single, shard_root, ignore=shutil.ignore_patterns('public', '.cache'))
+                main(shard_root, shard=(index, 3), **BUILD_OPTIONS)
+                shard_dirs.append(shard_root / 'public')
+
+            merged = temp_path / 'merged'
+            shutil.copytree(single, merged, ignore=shutil.ignore_patterns('public', '.cache'))
+            merged_report = merge(reversed(shard_dirs), merged)
+
+            self.assertEqual(read_tree(merged / 'public'), read_tree(single / 'public'))
+            self.assertEqual([error.replace(str(merged), '') for error in merged_report.errors],
+                             [error.replace(str(single), '') for error in single_report.errors])
+            self.assertEqual(len(merged_report.errors), 1)
+            self.assertIn('/nowhere.html', merged_report.errors[0])
+            self.assertEqual(merged_report.stages['search'], single_report.stages['search'])
+
+    def test_merge_rejects_incomplete_or_mismatched_shards(self):
+        with TemporaryDirectory() as temp_dir:
+            temp_path = Path(temp_dir)
+            shard_dirs = []
+            for index in (1, 2):
+                shard_root = temp_path / f'shard-{index}'
+                make_project(shard_root)
+                main(shard_root, shard=(index, 2), workers=1)
+                shard_dirs.append(shard_root / 'public')
+
+            with self.assertRaisesRegex(ValueError, 'expected shards 1/2 to 2/2'):
+                load_shard_manifests(shard_dirs[:1])
+            with self.assertRaisesRegex(ValueError, 'not a shard build'):
+                load_shard_manifests([temp_path])
+
+            manifest_path = shard_dirs[1] / '.shard' / 'manifest.json'
+            manifest = json.loads(manifest_path.read_text())
+            manifest['files']['index.css'] = 'f' * 64
+            manifest_path.write_text(json.dumps(manifest))
+            with self.assertRaisesRegex(ValueError, 'index.css differs between shards 1 and 2'):
+                merge(shard_dirs, temp_path / 'merged')
+
+    def test_command_line(self):
+        args = parse_args(['merge', 'a/public', 'b/public'])
+        self.assertEqual((args.command, args.shard_dirs), ('merge', ['a/public', 'b/public']))
+        self.assertEqual(parse_args(['--shard', '1/2']).shard, (1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+import os
+import tarfile
+import unittest
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from main import main, parse_args
+from sinks import ChangedFilesSink, DirectorySink, PackReader, PackSink, open_sink
+
+
+def make_project(root: Path):
+    (root / 'static' / 'images').mkdir(parents=True)
+    (root / 'static' / 'index.css').write_text('body { color: black; }')
+    (root / 'static' / 'images' / 'logo.png').write_bytes(b'\x89PNG' + bytes(range(256)))
+    (root / 'content' / 'blog').mkdir(parents=True)
+    (root / 'content' / 'index.md').write_text('# Home\n\n[blog](/blog/)')
+    (root / 'content' / 'blog' / 'index.md').write_text('# Blog')
+    (root / 'content' / 'blog' / 'first.md').write_text('# First\n\nHello.')
+    (root / 'template.html').write_text('<html><body>{{ Content }}</body></html>')
+
+
+def read_tree(root: Path) -> dict:
+    return {path.relative_to(root).as_posix(): path.read_bytes()
+            for path in sorted(root.rglob('*')) if path.is_file()}
+
+
+def read_archive(path: Path) -> dict:
+    if path.suffix == '.zip':
+        with zipfile.ZipFile(path) as archive:
+            return {name: archive.read(name) for name in archive.namelist()}
+    if path.suffix == '.pack':
+        reader = PackReader(path)
+        try:
+            return {name: reader.read(name) for name in reader.files}
+        finally:
+            reader.close()
+    with tarfile.open(path) as archive:
+        return {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+
+
+class TestSinks(unittest.TestCase):
+    def test_streamed_archives_match_directory_build(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_project(root)
+            main(root, listings={'blog': 1}, feeds=['blog'], workers=1)
+            expected = read_tree(root / 'public')
+            (root / 'public').rename(root / 'reference')
+
+            for name in ('site.tar', 'site.tar.gz', 'site.zip', 'site.pack'):
+                report = main(root, listings={'blog': 1}, feeds=['blog'], workers=1, output=root / name)
+                self.assertFalse((root / 'public').exists())
+                self.assertTrue(report.stages['output']['streamed'])
+                self.assertEqual(report.stages['output']['files'], len(expected))
+                self.assertEqual(read_archive(root / name), expected, name)
+
+    def test_in_place_stages_archive_public(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_project(root)
+            report = main(root, compress=True, workers=1, output=root / 'site.pack')
+            self.assertFalse(report.stages['output']['streamed'])
+            self.assertEqual(read_archive(root / 'site.pack'), read_tree(root / 'public'))
+
+    def test_failed_build_leaves_no_archive(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            with self.assertRaises(RuntimeError):
+                with PackSink(root / 'site.pack') as sink:
+                    sink.write('index.html', b'<p>home</p>')
+                    raise RuntimeError("build failed")
+            self.assertEqual(list(root.iterdir()), [])
+
+    def test_build_failing_part_way_removes_archive(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_project(root)
+            # Static files are streamed before the template is read
+            (root / 'template.html').unlink()
+            for name in ('site.tar.gz', 'site.zip', 'site.pack'):
+                with self.assertRaises(FileNotFoundError):
+                    main(root, workers=1, output=root / 'dist' / name)
+                self.assertEqual(list((root / 'dist').iterdir()), [], name)
+
+    def test_pack_reader(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            with PackSink(root / 'site.pack') as sink:
+                sink.write('a.txt', b'alpha')
+                sink.write('b.txt', b'bravo')
+            reader = PackReader(root / 'site.pack')
+            self.assertIn('b.txt', reader)
+            self.assertEqual(reader.read('b.txt', 1, 3), b'rav')
+            self.assertIsNone(reader.entry('c.txt'))
+            reader.close()
+
+            (root / 'other.pack').write_bytes(b'not a pack at all, just some bytes')
+            with self.assertRaisesRegex(ValueError, 'not a pack'):
+                PackReader(root / 'other.pack')
+
+    def test_repeated_paths(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            for name in ('site.tar', 'site.zip', 'site.pack'):
+                with open_sink(root / name) as sink:
+                    sink.write('index.html', b'first')
+                    with self.assertRaisesRegex(ValueError, 'index.html is already in'):
+                        sink.write('index.html', b'second')
+                    with self.assertRaises(ValueError):
+                        sink.copy('./index.html', __file__)
+                self.assertEqual(read_archive(root / name), {'index.html': b'first'}, name)
+
+            # A directory simply gets the newer file
+            sink = DirectorySink(root / 'public')
+            sink.write('index.html', b'first')
+            sink.write('index.html', b'second')
+            self.assertEqual((root / 'public' / 'index.html').read_bytes(), b'second')
+
+    def test_dangling_links(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_project(root)
+            (root / 'static' / 'gone.css').symlink_to('missing.css')
+
+            main(root, workers=1, output=root / 'site.tar')
+            with tarfile.open(root / 'site.tar') as archive:
+                self.assertEqual(archive.getmember('gone.css').linkname, 'missing.css')
+
+            main(root, workers=1, output=root / 'site.zip')
+            with zipfile.ZipFile(root / 'site.zip') as archive:
+                self.assertEqual(archive.getinfo('gone.css').external_attr >> 16, 0o120777)
+                self.assertEqual(archive.read('gone.css'), b'missing.css')
+
+            report = main(root, workers=1, output=root / 'site.pack')
+            self.assertNotIn('gone.css', read_archive(root / 'site.pack'))
+            self.assertEqual(report.stages['output']['skipped'], ['gone.css'])
+
+            for options in ({}, {'write_if_changed': True}):
+                main(root, workers=1, **options)
+                self.assertEqual(os.readlink(root / 'public' / 'gone.css'), 'missing.css')
+
+    def test_unknown_formats_are_rejected(self):
+        with self.assertRaises(ValueError):
+            open_sink('site.rar')
+        with self.assertRaises(SystemExit):
+            parse_args(['--output', 'site.rar'])
+        self.assertEqual(parse_args(['--output', 'site.tgz']).output, 'site.tgz')
+
+
+class TestChangedFilesSink(unittest.TestCase):
+    def test_writes_only_changed_files(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'stale' / 'deep').mkdir(parents=True)
+            (root / 'stale' / 'deep' / 'old.html').write_bytes(b'old')
+            (root / 'same.html').write_bytes(b'same')
+            (root / 'edited.html').write_bytes(b'abcd')
+            os.utime(root / 'same.html', ns=(1, 1))
+
+            with ChangedFilesSink(root) as sink:
+                sink.write('same.html', b'same')
+                sink.write('edited.html', b'abce')
+                sink.write('new/page.html', b'new')
+            self.assertEqual(sink.stats(), {"unchanged": 1, "changed": 2, "removed": 1, "bytes_written": 7})
+            self.assertEqual(read_tree(root), {'same.html': b'same', 'edited.html': b'abce',
+                                               'new/page.html': b'new'})
+            self.assertEqual((root / 'same.html').stat().st_mtime_ns, 1)
+            self.assertFalse((root / 'stale').exists())
+
+    def test_rebuilds_keep_mtimes_of_unchanged_files(self):
+        for options in ({}, {'compress': True}):
+            with TemporaryDirectory() as temp_dir:
+                root = Path(temp_dir)
+                make_project(root)
+                main(root, workers=1, **options)
+                expected = read_tree(root / 'public')
+
+                report = main(root, workers=1, write_if_changed=True, **options)
+                self.assertEqual(read_tree(root / 'public'), expected)
+                self.assertEqual(report.stages['output']['changed'], 0, options)
+                self.assertFalse((root / '.cache' / 'staging').exists())
+
+                for path in (root / 'public').rglob('*'):
+                    os.utime(path, ns=(1, 1))
+                (root / 'content' / 'blog' / 'first.md').write_text('# First\n\nEdited.')
+                (root / 'content' / 'blog' / 'index.md').unlink()
+                report = main(root, workers=1, write_if_changed=True, **options)
+                self.assertEqual(report.stages['output']['changed'], 1, options)
+                self.assertEqual(report.stages['output']['removed'], 1, options)
+                self.assertIn(b'Edited.', (root / 'public' / 'blog' / 'first.html').read_bytes())
+                self.assertFalse((root / 'public' / 'blog' / 'index.html').exists())
+                self.assertEqual((root / 'public' / 'index.html').stat().st_mtime_ns, 1)
+
+    def test_failed_build_keeps_previous_output(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_project(root)
+            main(root, workers=1)
+            expected = read_tree(root / 'public')
+            (root / 'template.html').unlink()
+            with self.assertRaises(FileNotFoundError):
+                main(root, workers=1, write_if_changed=True)
+            self.assertEqual(read_tree(root / 'public'), expected)
+
+    def test_cannot_combine_with_an_archive(self):
+        with self.assertRaises(SystemExit):
+            parse_args(['--write-if-changed', '--output', 'site.pack'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from main import main
+from site_build import build
+
+SOURCES = {
+    'index.md': '# Home\n\n[Majesty](/majesty/)',
+    'majesty/index.md': '# Majesty\n\nAll about it.',
+    'majesty/rings.md': '# Rings\n\n```\n  code  stays\n```',
+    'majesty/_drafts/sauron.md': '# Sauron\n\nNot yet.',
+    'majesty/elves.draft.md': '# Elves',
+}
+STATIC = {'index.css': b'body {}', 'index.css.swp': b'swap'}
+TEMPLATE = ('<html>\n  <head><title>{{ Title }}</title></head>\n'
+            '  <body><nav>{{ Breadcrumbs }}</nav>{{ Content }}</body>\n</html>')
+
+
+class TestBuild(unittest.TestCase):
+    def test_outputs(self):
+        outputs = build(SOURCES, TEMPLATE, static=STATIC)
+        self.assertEqual(set(outputs), {'index.html', 'majesty/index.html', 'majesty/rings.html', 'index.css'})
+        self.assertEqual(outputs['index.css'], b'body {}')
+        rings = outputs['majesty/rings.html'].decode()
+        self.assertIn('<title>Rings</title>', rings)
+        self.assertIn('<a href="/majesty/">majesty</a>', rings)
+        self.assertIn('<code>code  stays</code>', rings)
+
+    def test_matches_disk_build(self):
+        for minify in (False, True):
+            with TemporaryDirectory() as temp_dir:
+                root = Path(temp_dir)
+                for path, markdown in SOURCES.items():
+                    (root / 'content' / path).parent.mkdir(parents=True, exist_ok=True)
+                    (root / 'content' / path).write_text(markdown)
+                (root / 'static').mkdir()
+                for path, data in STATIC.items():
+                    (root / 'static' / path).write_bytes(data)
+                (root / 'template.html').write_text(TEMPLATE)
+                main(root, minify=minify, workers=1)
+
+                on_disk = {path.relative_to(root / 'public').as_posix(): path.read_bytes()
+                           for path in (root / 'public').rglob('*') if path.is_file()}
+                outputs = build(SOURCES, TEMPLATE, static=STATIC, minify=minify)
+                self.assertEqual(outputs, on_disk)
+
+    def test_ignores_other_sources(self):
+        self.assertEqual(set(build({'notes.txt': 'x', 'a.md': '# A'}, '{{ Content }}')), {'a.html'})
+
+
+if __name__ == '__main__':
+    unittest.main()
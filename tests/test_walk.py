@@ -0,0 +1,138 @@
+import os
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from main import main, parse_args
+from walk import DEFAULT_IGNORE, WalkEntry, is_ignored, is_selected, walk_tree
+
+
+def make_tree(root: Path):
+    for directory in ('b/d', 'a', '.git/objects', 'blog/_drafts'):
+        (root / directory).mkdir(parents=True)
+    for file_name in ('z.md', 'a.md', 'b/c.md', 'b/d/e.md', 'b/a.md', 'a/x.md', 'a/x.md.swp',
+                      '.git/objects/1', 'blog/post.md', 'blog/_drafts/wip.md', 'blog/next.draft.md'):
+        (root / file_name).write_text(file_name)
+
+
+class TestWalkTree(unittest.TestCase):
+    def test_order_matches_sorted_os_walk(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_tree(root)
+            expected = []
+            for dir_path, dir_names, file_names in os.walk(root):
+                dir_names.sort()
+                relative_dir = Path(dir_path).relative_to(root).as_posix()
+                for file_name in sorted(file_names):
+                    expected.append(file_name if relative_dir == '.' else f'{relative_dir}/{file_name}')
+            walked = [entry.relative for entry in walk_tree(root, ignore=()) if not entry.is_dir]
+            self.assertEqual(walked, expected)
+
+    def test_default_ignore(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_tree(root)
+            self.assertEqual([entry.relative for entry in walk_tree(root)],
+                             ['a.md', 'z.md', 'a', 'a/x.md', 'b', 'b/a.md', 'b/c.md', 'b/d', 'b/d/e.md',
+                              'blog', 'blog/post.md'])
+
+    def test_is_ignored_matches_walk(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_tree(root)
+            for ignore in ((), ('b/d', '*.md'), DEFAULT_IGNORE):
+                walked = {entry.relative for entry in walk_tree(root, ignore=())}
+                kept = {entry.relative for entry in walk_tree(root, ignore=ignore)}
+                self.assertEqual({path for path in walked if not is_ignored(path, ignore)}, kept)
+        self.assertTrue(is_ignored('blog/_drafts/wip.md'))
+        self.assertFalse(is_ignored('blog/post.md'))
+
+    def test_path_patterns(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_tree(root)
+            walked = [entry.relative for entry in walk_tree(root, ignore=('b/d', '*.md'))]
+            self.assertEqual(walked, ['.git', '.git/objects', '.git/objects/1', 'a', 'a/x.md.swp', 'b',
+                                      'blog', 'blog/_drafts'])
+
+    def test_typed_entries_follow_symlinked_directories(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            make_tree(root)
+            (root / 'link').symlink_to(root / 'b' / 'd', target_is_directory=True)
+            (root / 'alias.md').symlink_to(root / 'a.md')
+            entries = {entry.relative: entry for entry in walk_tree(root)}
+            self.assertEqual(entries['link'], WalkEntry(str(root / 'link'), 'link', True, True))
+            self.assertEqual(entries['link/e.md'], WalkEntry(str(root / 'link' / 'e.md'), 'link/e.md', False, False))
+            self.assertEqual(entries['alias.md'].is_symlink, True)
+            self.assertEqual(entries['a'].is_dir, True)
+
+    def test_build_skips_ignored_files(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / 'static').mkdir()
+            (root / 'static' / 'index.css').write_text('body {}')
+            (root / 'static' / 'index.css.swp').write_text('swap')
+            (root / 'content' / '_drafts').mkdir(parents=True)
+            (root / 'content' / 'index.md').write_text('# Home')
+            (root / 'content' / '_drafts' / 'wip.md').write_text('# Work in progress')
+            (root / 'template.html').write_text('<html><body>{{ Nav }}{{ Content }}</body></html>')
+            main(root, search=True, workers=1)
+            published = sorted(path.relative_to(root / 'public').as_posix()
+                               for path in (root / 'public').rglob('*') if path.is_file())
+            self.assertNotIn('index.css.swp', published)
+            self.assertFalse(any('_drafts' in path for path in published))
+            self.assertNotIn(b'wip', (root / 'public' / 'index.html').read_bytes())
+
+
+class TestPartialBuild(unittest.TestCase):
+    def make_project(self, root: Path):
+        (root / 'static').mkdir()
+        (root / 'static' / 'index.css').write_text('body {}')
+        (root / 'content' / 'majesty' / 'elves').mkdir(parents=True)
+        (root / 'content' / 'index.md').write_text('# Home')
+        (root / 'content' / 'majesty' / 'index.md').write_text('# Majesty')
+        (root / 'content' / 'majesty' / 'elves' / 'lorien.md').write_text('# Lorien')
+        (root / 'template.html').write_text('<html><body>{{ Content }}</body></html>')
+
+    def test_is_selected(self):
+        self.assertTrue(is_selected('majesty/elves/lorien.md', only=['majesty/**']))
+        self.assertFalse(is_selected('index.md', only=['majesty/**']))
+        self.assertFalse(is_selected('majesty/elves/lorien.md', only=['majesty/*'], exclude=['*/elves/*']))
+        self.assertTrue(is_selected('index.md', exclude=['majesty/*']))
+
+    def test_only_rebuilds_the_selection(self):
+        with TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            self.make_project(root)
+            main(root, workers=1)
+            public = root / 'public'
+            for path in public.rglob('*'):
+                os.utime(path, ns=(1, 1))
+            (root / 'content' / 'index.md').write_text('# Home, edited')
+            (root / 'content' / 'majesty' / 'index.md').write_text('# Majesty, edited')
+            (root / 'static' / 'index.css').write_text('body { color: red; }')
+
+            report = main(root, workers=1, only=['majesty/**'], copy_static=False)
+            self.assertEqual(report.stages['selection']['pages'], 2)
+            self.assertIn(b'Majesty, edited', (public / 'majesty' / 'index.html').read_bytes())
+            self.assertNotIn(b'edited', (public / 'index.html').read_bytes())
+            self.assertEqual((public / 'index.html').stat().st_mtime_ns, 1)
+            self.assertEqual((public / 'index.css').read_text(), 'body {}')
+
+            os.utime(public / 'majesty' / 'elves' / 'lorien.html', ns=(1, 1))
+            main(root, workers=1, exclude=['majesty/**'])
+            self.assertIn(b'Home, edited', (public / 'index.html').read_bytes())
+            self.assertEqual((public / 'majesty' / 'elves' / 'lorien.html').stat().st_mtime_ns, 1)
+            self.assertEqual((public / 'index.css').read_text(), 'body { color: red; }')
+
+    def test_rejects_whole_site_outputs(self):
+        with TemporaryDirectory() as temp_dir:
+            with self.assertRaises(ValueError):
+                main(Path(temp_dir), only=['majesty/**'], fingerprint=True)
+        args = parse_args(['--only', 'majesty/**', '--exclude', '*/drafts/*', '--skip-static'])
+        self.assertEqual((args.only, args.exclude, args.skip_static), (['majesty/**'], ['*/drafts/*'], True))
+
+
+if __name__ == '__main__':
+    unittest.main()